@@ -3,11 +3,16 @@ from dependency_injector import containers, providers
 from gmail_helper.api.email_service.orchestrator import GmailOrchestrator
 from gmail_helper.api.email_service.router import EmailRouter
 from gmail_helper.api.email_service.rules_processor import RulesProcessor
-from gmail_helper.api.email_service.service import EmailService
+from gmail_helper.api.email_service.service import AsyncEmailService, EmailService
 from gmail_helper.common.config import Config
-from gmail_helper.common.contracts.emails_interface import EmailsInterface
+from gmail_helper.common.contracts.emails_interface import AsyncEmailsInterface, EmailsInterface
+from gmail_helper.common.services.async_gmail_service import AsyncGmailClient
 from gmail_helper.common.services.gmail_service import GmailClient
+from gmail_helper.common.services.rate_limiter import RateLimiter
+from gmail_helper.stores.async_emails_store import AsyncEmailsStore
+from gmail_helper.stores.cached_emails_store import CachedEmailsStore
 from gmail_helper.stores.emails_store import EmailsStore
+from gmail_helper.stores.partitioned_emails_store import PartitionedEmailsStore
 
 
 class ApiContainer(containers.DeclarativeContainer):
@@ -23,22 +28,89 @@ class ApiContainer(containers.DeclarativeContainer):
     config = providers.Singleton(Config)
 
     # Stores
-    emails_store = providers.Singleton(
-        EmailsStore,
-        db_path=providers.Callable(lambda c: c.DB_PATH, config),
+    # DB_PARTITIONED splits storage into one SQLite file per month
+    sqlite_emails_store = providers.Selector(
+        providers.Callable(lambda c: "partitioned" if c.DB_PARTITIONED else "single", config),
+        single=providers.Singleton(
+            EmailsStore,
+            db_path=providers.Callable(lambda c: c.DB_PATH, config),
+            cache_size_kib=providers.Callable(lambda c: c.SQLITE_CACHE_SIZE_KIB, config),
+            mmap_size=providers.Callable(lambda c: c.SQLITE_MMAP_SIZE, config),
+            busy_timeout_ms=providers.Callable(lambda c: c.SQLITE_BUSY_TIMEOUT_MS, config),
+            synchronous=providers.Callable(lambda c: c.SQLITE_SYNCHRONOUS, config),
+        ),
+        partitioned=providers.Singleton(
+            PartitionedEmailsStore,
+            db_path=providers.Callable(lambda c: c.DB_PATH, config),
+            partition_dir=providers.Callable(lambda c: c.DB_PARTITION_DIR, config),
+            retention_months=providers.Callable(lambda c: c.DB_RETENTION_MONTHS, config),
+            archive_dir=providers.Callable(lambda c: c.DB_ARCHIVE_DIR, config),
+            maintenance_interval_sec=providers.Callable(lambda c: c.DB_MAINTENANCE_INTERVAL_SEC, config),
+            cache_size_kib=providers.Callable(lambda c: c.SQLITE_CACHE_SIZE_KIB, config),
+            mmap_size=providers.Callable(lambda c: c.SQLITE_MMAP_SIZE, config),
+            busy_timeout_ms=providers.Callable(lambda c: c.SQLITE_BUSY_TIMEOUT_MS, config),
+            synchronous=providers.Callable(lambda c: c.SQLITE_SYNCHRONOUS, config),
+        ),
+    )
+
+    # EMAILS_CACHE_SIZE > 0 puts an LRU cache in front of the SQLite store
+    emails_store = providers.Selector(
+        providers.Callable(lambda c: "cached" if c.EMAILS_CACHE_SIZE > 0 else "direct", config),
+        cached=providers.Singleton(
+            CachedEmailsStore,
+            store=sqlite_emails_store,
+            max_size=providers.Callable(lambda c: c.EMAILS_CACHE_SIZE, config),
+        ),
+        direct=sqlite_emails_store,
     )  # type: providers.Provider[EmailsInterface]
 
+    # The same store behind dedicated reader/writer threads, for async routes
+    async_emails_store = providers.Singleton(
+        AsyncEmailsStore,
+        store=emails_store,
+        max_readers=providers.Callable(lambda c: c.DB_READ_WORKERS, config),
+    )  # type: providers.Provider[AsyncEmailsInterface]
+
     # Services
     email_service = providers.Factory(
         EmailService,
         store=emails_store,
     )
 
+    async_email_service = providers.Factory(
+        AsyncEmailService,
+        store=async_emails_store,
+    )
+
+    rate_limiter = providers.Singleton(
+        RateLimiter,
+        units_per_second=providers.Callable(lambda c: c.GMAIL_QUOTA_UNITS_PER_SEC, config),
+        backoff_base=providers.Callable(lambda c: c.GMAIL_BACKOFF_BASE, config),
+        backoff_max=providers.Callable(lambda c: c.GMAIL_BACKOFF_MAX, config),
+    )
+
     gmail_client = providers.Singleton(
         GmailClient,
         credentials_file=providers.Callable(lambda c: c.CREDENTIALS_FILE, config),
         token_file=providers.Callable(lambda c: c.TOKEN_FILE, config),
         scopes=providers.Callable(lambda c: c.SCOPES, config),
+        rate_limiter=rate_limiter,
+        max_retries=providers.Callable(lambda c: c.GMAIL_MAX_RETRIES, config),
+        base_url=providers.Callable(lambda c: c.GMAIL_API_BASE_URL, config),
+        auth_disabled=providers.Callable(lambda c: c.GMAIL_AUTH_DISABLED, config),
+    )
+
+    async_gmail_client = providers.Singleton(
+        AsyncGmailClient,
+        credentials_file=providers.Callable(lambda c: c.CREDENTIALS_FILE, config),
+        token_file=providers.Callable(lambda c: c.TOKEN_FILE, config),
+        scopes=providers.Callable(lambda c: c.SCOPES, config),
+        rate_limiter=rate_limiter,
+        max_retries=providers.Callable(lambda c: c.GMAIL_MAX_RETRIES, config),
+        base_url=providers.Callable(lambda c: c.GMAIL_API_BASE_URL, config),
+        auth_disabled=providers.Callable(lambda c: c.GMAIL_AUTH_DISABLED, config),
+        max_concurrency=providers.Callable(lambda c: c.GMAIL_ASYNC_MAX_CONCURRENCY, config),
+        http2=providers.Callable(lambda c: c.GMAIL_HTTP2, config),
     )
 
     rp = providers.Singleton(
@@ -46,10 +118,14 @@ class ApiContainer(containers.DeclarativeContainer):
         store=emails_store,
         rules_file=providers.Callable(lambda c: c.RULES_FILE, config),
         gmail_client=gmail_client,  # pass the shared client
+        async_gmail_client=async_gmail_client,
+        columnar=providers.Callable(lambda c: c.RULES_COLUMNAR, config),
+        pushdown=providers.Callable(lambda c: c.RULES_PUSHDOWN, config),
     )
     orchestrator = providers.Factory(
         GmailOrchestrator,
         gmail_client=gmail_client,
+        async_gmail_client=async_gmail_client,
         store=emails_store,
         rules_processor=rp,
     )
@@ -57,5 +133,6 @@ class ApiContainer(containers.DeclarativeContainer):
     # Routers
     email_router = providers.Factory(
         EmailRouter,
-        email_service=email_service,
+        email_service=async_email_service,
+        rules_service=rp,
     )
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional, Union
 
 from pydantic import BaseModel
 
@@ -7,6 +7,7 @@ class EmailResponse(BaseModel):
     id: str
     thread_id: str
     sender: str
+    recipient: str = ""
     subject: str
     snippet: str
     received_datetime: str
@@ -14,3 +15,35 @@ class EmailResponse(BaseModel):
 
 class EmailsListResponse(BaseModel):
     emails: List[EmailResponse]
+    next_cursor: Optional[str] = None
+
+
+class EmailsSearchResponse(BaseModel):
+    emails: List[EmailResponse]
+    next_cursor: Optional[str] = None
+
+
+class ConditionStatsResponse(BaseModel):
+    field: str
+    predicate: str
+    value: Union[str, int, float]
+    evaluations: int
+    matches: int
+    match_rate: Optional[float] = None
+    seconds: float
+    mean_seconds: Optional[float] = None
+
+
+class RuleStatsResponse(BaseModel):
+    description: str
+    match: str
+    evaluations: int
+    matches: int
+    match_rate: Optional[float] = None
+    seconds: float
+    mean_seconds: Optional[float] = None
+    conditions: List[ConditionStatsResponse]
+
+
+class RulesStatsResponse(BaseModel):
+    rules: List[RuleStatsResponse]
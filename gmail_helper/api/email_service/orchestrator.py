@@ -6,12 +6,18 @@ from gmail_helper.stores.emails_store import EmailsStore
 LOG = get_logger(__name__)
 
 
-from typing import List, Optional
+import asyncio
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
 from gmail_helper.api.email_service.rules_processor import RulesProcessor
 from gmail_helper.common.config import config
+from gmail_helper.common.contracts.email_record import EmailRecord
 from gmail_helper.common.contracts.emails_interface import EmailsInterface
-from gmail_helper.common.services.gmail_service import GmailClient
+from gmail_helper.common.services.async_gmail_service import AsyncGmailClient
+from gmail_helper.common.services.gmail_service import MAX_BATCH_SIZE, GmailClient, HistoryExpiredError
 from gmail_helper.common.utils.dateutils import parse_rfc2822_to_iso
 from gmail_helper.common.utils.logger import get_logger
 
@@ -29,41 +35,285 @@ class GmailOrchestrator:
         store: EmailsInterface,
         rules_processor: RulesProcessor,
         gmail_client: Optional[GmailClient] = None,
+        async_gmail_client: Optional[AsyncGmailClient] = None,
     ):
         self.store = store
         self.gmail = gmail_client
+        self.async_gmail = async_gmail_client
         self.rules_processor = rules_processor
 
     def fetch_and_store(
         self,
         max_results: int = None,
         label_ids: Optional[List[str]] = None,
+        query: Optional[str] = None,
+        page_size: int = None,
+        workers: int = None,
     ) -> int:
         max_results = max_results or config.FETCH_BATCH_SIZE
+        LOG.info("Fetching up to %d messages with labels=%s...", max_results, label_ids)
+        return self._list_and_store(max_results, label_ids, query, page_size, workers)[0]
+
+    def _list_and_store(
+        self,
+        max_results: Optional[int],
+        label_ids: Optional[List[str]] = None,
+        query: Optional[str] = None,
+        page_size: int = None,
+        workers: int = None,
+    ) -> Tuple[int, int]:
+        """
+        List up to `max_results` messages (None for every match) and store the new
+        ones; returns (stored, listed).
+        """
         label_ids = label_ids or list(config.DEFAULT_LABELS)
+        page_size = page_size or config.LIST_PAGE_SIZE
+        workers = workers or config.FETCH_WORKERS
+        listed = 0
 
-        LOG.info("Fetching up to %d messages with labels=%s...", max_results, label_ids)
-        msgs = self.gmail.list_messages(label_ids=label_ids, max_results=max_results)
-        LOG.info("Found %d messages", len(msgs))
+        def _counted(pages: Iterable[List[dict]]) -> Iterator[List[dict]]:
+            nonlocal listed
+            for page in pages:
+                listed += len(page)
+                yield page
+
+        pages = _counted(
+            self.gmail.iter_messages(
+                label_ids=label_ids,
+                query=query,
+                page_size=page_size,
+                max_results=max_results,
+            )
+        )
+        if workers > 1:
+            return self._fetch_and_store_parallel(pages, workers), listed
+
+        stored = 0
+        for page in pages:
+            LOG.info("Found %d messages in page", len(page))
+            ids = self._new_ids(page)
+            if ids:
+                stored += self._store_all(self.gmail.get_messages_metadata(ids))
+
+        LOG.info("Stored %d messages into DB at %s", stored, config.DB_PATH)
+        return stored, listed
+
+    def _fetch_and_store_parallel(self, pages: Iterable[List[dict]], workers: int) -> int:
+        """
+        Fetch metadata in a ThreadPoolExecutor (each worker thread gets its own
+        Gmail service) and hand results through a bounded queue to a single
+        writer thread that inserts them into the store.
+        """
+        results: "queue.Queue[Optional[List[dict]]]" = queue.Queue(maxsize=workers * 2)
+        writer_state = {"stored": 0, "error": None}
+        fetch_error: Optional[BaseException] = None
+
+        def _writer():
+            while True:
+                batch = results.get()
+                if batch is None:
+                    return
+                try:
+                    writer_state["stored"] += self._store_all(batch)
+                except Exception as e:  # keep draining so workers never block on a full queue
+                    LOG.error("Failed to store %d messages: %s", len(batch), e)
+                    writer_state["error"] = writer_state["error"] or e
+
+        def _fetch(ids: List[str]) -> None:
+            results.put(self.gmail.get_messages_metadata(ids))
+
+        writer = threading.Thread(target=_writer, name="gmail-store-writer", daemon=True)
+        writer.start()
+        try:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmail-fetch") as pool:
+                futures = []
+                for page in pages:
+                    LOG.info("Found %d messages in page", len(page))
+                    ids = self._new_ids(page)
+                    for start in range(0, len(ids), MAX_BATCH_SIZE):
+                        futures.append(pool.submit(_fetch, ids[start : start + MAX_BATCH_SIZE]))
+                for future in as_completed(futures):
+                    if future.exception() is not None:
+                        LOG.error("Metadata fetch failed: %s", future.exception())
+                        fetch_error = fetch_error or future.exception()
+        finally:
+            results.put(None)
+            writer.join()
+
+        if fetch_error is not None:
+            raise fetch_error
+        if writer_state["error"] is not None:
+            raise writer_state["error"]
+        LOG.info("Stored %d messages into DB at %s using %d workers", writer_state["stored"], config.DB_PATH, workers)
+        return writer_state["stored"]
+
+    async def fetch_and_store_async(
+        self,
+        max_results: int = None,
+        label_ids: Optional[List[str]] = None,
+        query: Optional[str] = None,
+        page_size: int = None,
+    ) -> int:
+        """
+        fetch_and_store on AsyncGmailClient: metadata for a page is fetched
+        concurrently while the next page is being listed.
+        """
+        max_results = max_results or config.FETCH_BATCH_SIZE
+        label_ids = label_ids or list(config.DEFAULT_LABELS)
+        page_size = page_size or config.LIST_PAGE_SIZE
 
+        LOG.info("Fetching up to %d messages with labels=%s (async)...", max_results, label_ids)
         stored = 0
-        for item in msgs:
-            full = self.gmail.get_message_metadata(item["id"])
-            headers = {h["name"]: h["value"] for h in full.get("payload", {}).get("headers", [])}
-
-            email = {
-                "id": full.get("id", ""),
-                "thread_id": full.get("threadId", ""),
-                "sender": headers.get("From", "") or "",
-                "subject": headers.get("Subject", "") or "",
-                "snippet": full.get("snippet", "") or "",
-                "received_datetime": parse_rfc2822_to_iso(headers.get("Date", "")),
-            }
-            self.store.insert_email(email)
-            stored += 1
+        inflight: Optional[asyncio.Task] = None
+        async for page in self.async_gmail.iter_messages(
+            label_ids=label_ids,
+            query=query,
+            page_size=page_size,
+            max_results=max_results,
+        ):
+            LOG.info("Found %d messages in page", len(page))
+            if inflight is not None:
+                stored += self._store_all(await inflight)
+            inflight = asyncio.create_task(self.async_gmail.get_messages_metadata(self._new_ids(page)))
+        if inflight is not None:
+            stored += self._store_all(await inflight)
 
         LOG.info("Stored %d messages into DB at %s", stored, config.DB_PATH)
         return stored
 
-    def run_rules(self, limit: int = 20) -> int:
+    def _new_ids(self, page: List[dict]) -> List[str]:
+        """Drop ids already in the store so their metadata is not downloaded again."""
+        ids = [m["id"] for m in page]
+        known = self.store.existing_ids(ids)
+        if known:
+            LOG.info("Skipping %d of %d already stored messages", len(known), len(ids))
+        return [i for i in ids if i not in known]
+
+    def _store_all(self, messages: List[dict]) -> int:
+        """Write a page of fetched messages in one transaction; returns the number of new rows."""
+        if not messages:
+            return 0
+        result = self.store.insert_emails(self._to_email(full) for full in messages)
+        if result.duplicates:
+            LOG.info("Ignored %d already stored messages", result.duplicates)
+        return result.inserted
+
+    @staticmethod
+    def _to_email(full: dict) -> EmailRecord:
+        headers = {h["name"]: h["value"] for h in full.get("payload", {}).get("headers", [])}
+        return EmailRecord(
+            id=full.get("id", ""),
+            thread_id=full.get("threadId", ""),
+            sender=headers.get("From", ""),
+            recipient=headers.get("To", ""),
+            subject=headers.get("Subject", ""),
+            snippet=full.get("snippet", ""),
+            received_datetime=parse_rfc2822_to_iso(headers.get("Date", "")),
+            label_ids=full.get("labelIds", []) or [],
+        )
+
+    def sync(
+        self,
+        max_results: int = None,
+        label_ids: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Incremental sync driven by the Gmail History API.
+        Uses the historyId checkpoint stored for the account; without one, or when
+        it has expired, lists every message in `label_ids` (only unknown ones are
+        downloaded) and checkpoints the historyId observed before listing. With
+        `max_results` the listing may stop early, and then no checkpoint is written,
+        so the next sync lists again instead of skipping what was left out.
+        """
+        label_ids = label_ids or list(config.DEFAULT_LABELS)
+        profile = self.gmail.get_profile()
+        account = profile.get("emailAddress", "me")
+        checkpoint = self.store.get_history_id(account)
+
+        if checkpoint is not None:
+            try:
+                return self._sync_history(account, checkpoint, label_ids)
+            except HistoryExpiredError:
+                LOG.warning("History checkpoint %s for %s expired, running full resync", checkpoint, account)
+        else:
+            LOG.info("No history checkpoint for %s, running full sync", account)
+
+        stored, listed = self._list_and_store(max_results, label_ids)
+        if max_results is not None and listed >= max_results:
+            LOG.warning("Full sync for %s stopped at %d messages, not checkpointing historyId", account, listed)
+        else:
+            self.store.set_history_id(account, profile["historyId"])
+        return stored
+
+    def _sync_history(self, account: str, checkpoint: str, label_ids: List[str]) -> int:
+        wanted = set(label_ids)
+        added: Dict[str, None] = {}
+        deleted = set()
+        relabelled: Dict[str, List[str]] = {}
+        history_id = checkpoint
+
+        for page in self.gmail.iter_history(checkpoint):
+            history_id = page.get("historyId", history_id)
+            for record in page.get("history", []) or []:
+                for item in record.get("messagesAdded", []) or []:
+                    msg = item["message"]
+                    if wanted.intersection(msg.get("labelIds") or []):
+                        added[msg["id"]] = None
+                        deleted.discard(msg["id"])
+                for item in record.get("messagesDeleted", []) or []:
+                    msg_id = item["message"]["id"]
+                    added.pop(msg_id, None)
+                    relabelled.pop(msg_id, None)
+                    deleted.add(msg_id)
+                for key in ("labelsAdded", "labelsRemoved"):
+                    for item in record.get(key, []) or []:
+                        msg = item["message"]
+                        if msg["id"] not in deleted:
+                            relabelled[msg["id"]] = msg.get("labelIds") or []
+
+        # A message relabelled into a synced label may never have been stored (e.g. moved back to INBOX).
+        relabelled = {k: v for k, v in relabelled.items() if k not in added}
+        known = self.store.existing_ids(relabelled) if relabelled else set()
+        for msg_id in [k for k in relabelled if k not in known]:
+            if wanted.intersection(relabelled.pop(msg_id)):
+                added[msg_id] = None
+
+        stored, missing = 0, []
+        if added:
+            new_ids = self._new_ids([{"id": i} for i in added])
+            if new_ids:
+                messages = self.gmail.get_messages_metadata(new_ids)
+                stored = self._store_all(messages)
+                fetched = {m.get("id") for m in messages}
+                missing = [i for i in new_ids if i not in fetched]
+        removed = self.store.delete_emails(deleted) if deleted else 0
+        for msg_id, labels in relabelled.items():
+            self.store.update_labels(msg_id, labels)
+
+        if missing:
+            # Keep the old checkpoint so the next sync replays this history and retries them.
+            LOG.warning(
+                "Incremental sync for %s: %d new messages could not be fetched, keeping historyId %s",
+                account,
+                len(missing),
+                checkpoint,
+            )
+        else:
+            self.store.set_history_id(account, history_id)
+        LOG.info(
+            "Incremental sync for %s: %d stored, %d deleted, %d relabelled (historyId %s -> %s)",
+            account,
+            stored,
+            removed,
+            len(relabelled),
+            checkpoint,
+            history_id if not missing else checkpoint,
+        )
+        return stored + removed + len(relabelled)
+
+    def run_rules(self, limit: Optional[int] = 20) -> int:
+        """Apply rules to the newest `limit` emails; None streams the whole mailbox."""
         return self.rules_processor.apply_rules(limit=limit)
+
+    async def run_rules_async(self, limit: Optional[int] = 20) -> int:
+        return await self.rules_processor.apply_rules_async(limit=limit)
@@ -1,8 +1,15 @@
 from typing import Optional
 
-from gmail_helper.api.email_service.models import EmailResponse, EmailsListResponse
+from fastapi import Query
+
+from gmail_helper.api.email_service.models import (
+    EmailResponse,
+    EmailsListResponse,
+    EmailsSearchResponse,
+    RulesStatsResponse,
+)
 from gmail_helper.api.email_service.rules_processor import RulesProcessor
-from gmail_helper.api.email_service.service import EmailService
+from gmail_helper.api.email_service.service import AsyncEmailService
 from gmail_helper.common.utils.api_framework import api_get, api_router
 
 
@@ -10,24 +17,32 @@ from gmail_helper.common.utils.api_framework import api_get, api_router
 class EmailRouter:
     """
     Thin router (controller) — only orchestration & IO concerns.
-    Service depends on EmailsInterface (contract).
+    Service depends on AsyncEmailsInterface (contract); store calls run off the event loop.
     """
 
-    def __init__(self, email_service: EmailService, rules_service: RulesProcessor = None):
+    def __init__(self, email_service: AsyncEmailService, rules_service: RulesProcessor = None):
         self.email_service = email_service
         self.rules_service = rules_service
 
     @api_get("/last", response_model=EmailsListResponse, summary="Get last N stored emails")
-    def last(self, n: int = 10):
-        return self.email_service.get_last_emails(n)
+    async def last(self, n: int = Query(10, ge=1), before: Optional[str] = None):
+        return await self.email_service.get_last_emails(n, before=before)
+
+    @api_get("/search", response_model=EmailsSearchResponse, summary="Full-text search over stored emails")
+    async def search(self, q: str, limit: int = Query(20, ge=1, le=100), cursor: Optional[str] = None):
+        return await self.email_service.search_emails(q, limit=limit, cursor=cursor)
+
+    @api_get("/rules/stats", response_model=RulesStatsResponse, summary="Rule evaluation stats, slowest first")
+    def rule_stats(self):
+        return RulesStatsResponse(rules=self.rules_service.rule_stats())
 
     @api_get(
         "/{email_id}",
         response_model=Optional[EmailResponse],
         summary="Get a single email by ID",
     )
-    def get_by_id(self, email_id: str):
-        return self.email_service.get_email_by_id(email_id)
+    async def get_by_id(self, email_id: str):
+        return await self.email_service.get_email_by_id(email_id)
 
     @api_get("/rules", response_model=dict, summary="List Rules")
     def list_rules(self, limit=10):
@@ -0,0 +1,408 @@
+import operator
+import time
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.rules_contract import (
+    DATE_UNITS,
+    DAY_SECONDS,
+    FieldName,
+    Rule,
+    StringPredicate,
+)
+from gmail_helper.common.utils.aho_corasick import AhoCorasick
+
+# Rule fields backed by a text column of the emails table (full-text index, columnar snapshot).
+FIELD_COLUMNS = {
+    FieldName.From_: "sender",
+    FieldName.To: "recipient",
+    FieldName.Subject: "subject",
+    FieldName.Message: "snippet",
+}
+
+# Layout of the per-email view the compiled predicates read: lowercased text fields, received_ts, then
+# for each text field the needles its automaton found (CompiledRuleSet only).
+VIEW_ATTRS = ("sender", "recipient", "subject", "snippet", "received_datetime")
+VIEW_INDEX = {
+    FieldName.From_: 0,
+    FieldName.To: 1,
+    FieldName.Subject: 2,
+    FieldName.Message: 3,
+    FieldName.DateReceived: 4,
+}
+TS_INDEX = len(VIEW_ATTRS)
+FOUND_BASE = TS_INDEX + 1
+
+EmailView = Tuple
+Predicate = Callable[[EmailView], bool]
+# (predicate, view index, lowercased value) of a condition CompiledRuleSet.postings() can answer.
+PostingKey = Tuple[StringPredicate, int, str]
+
+# Cost guesses (seconds per evaluation) used to order conditions until they have been measured.
+PRIOR_SECONDS = {
+    "scanned": 4e-8,
+    "date": 5e-8,
+    StringPredicate.equals: 6e-8,
+    StringPredicate.does_not_equal: 6e-8,
+    StringPredicate.contains: 1.2e-7,
+    StringPredicate.does_not_contain: 1.2e-7,
+}
+PRIOR_MATCH_RATE = 0.5
+# Profiled evaluations a condition needs before its measured cost and match rate replace the priors.
+MIN_PROFILED = 100
+# Distinct substring needles a field needs before one automaton scan beats a `in` test per needle.
+AC_MIN_NEEDLES = 32
+SCANNED_PREDICATES = (StringPredicate.contains, StringPredicate.does_not_contain)
+
+
+def _never(view: EmailView) -> bool:
+    return False
+
+
+def _timer_overhead(samples: int = 2000) -> float:
+    """Seconds a perf_counter() pair adds to a profiled evaluation, subtracted from measurements."""
+    clock = time.perf_counter
+    start = clock()
+    for _ in range(samples):
+        clock() - clock()
+    return (clock() - start) / samples
+
+
+TIMER_OVERHEAD = _timer_overhead()
+
+
+class EvalStats:
+    """Evaluation counters for a rule or condition."""
+
+    __slots__ = ("evaluations", "matches", "seconds")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.matches = 0
+        self.seconds = 0.0
+
+    def record(self, evaluations: int, matches: int, seconds: float) -> None:
+        self.evaluations += evaluations
+        self.matches += matches
+        self.seconds += seconds
+
+    @property
+    def match_rate(self) -> Optional[float]:
+        return self.matches / self.evaluations if self.evaluations else None
+
+    @property
+    def mean_seconds(self) -> Optional[float]:
+        return self.seconds / self.evaluations if self.evaluations else None
+
+    def as_dict(self) -> Dict:
+        return {
+            "evaluations": self.evaluations,
+            "matches": self.matches,
+            "match_rate": self.match_rate,
+            "seconds": self.seconds,
+            "mean_seconds": self.mean_seconds,
+        }
+
+
+class CompiledCondition:
+    """
+    A Condition reduced to what evaluation needs: the view slot to read, the
+    lowercased needle (string predicates) or the age in seconds (date predicates).
+    """
+
+    __slots__ = ("condition", "field", "predicate", "index", "needle", "seconds", "scanned", "stats", "_test")
+
+    def __init__(self, condition):
+        self.condition = condition
+        self.field = condition.field
+        self.predicate = condition.predicate
+        self.index = VIEW_INDEX.get(condition.field)
+        self.needle: Optional[str] = None
+        self.seconds: Optional[int] = None
+        # Answered from the field's automaton scan rather than a substring test (see CompiledRuleSet).
+        self.scanned = False
+        # Filled from profiled evaluations only (see CompiledRule.bind), so counts are a sample.
+        self.stats = EvalStats()
+        self._test: Optional[Predicate] = None
+
+        if isinstance(self.predicate, StringPredicate):
+            self.needle = str(condition.value).lower()
+            self._test = self._string_test()
+        elif self.predicate in DATE_UNITS and self.field == FieldName.DateReceived:
+            # Date predicates only read DateReceived; on any other field they never match.
+            days, _ = DATE_UNITS[self.predicate]
+            self.seconds = int(condition.value) * days * DAY_SECONDS
+        else:
+            self._test = _never
+
+    @property
+    def is_date(self) -> bool:
+        return self.seconds is not None
+
+    def _string_test(self) -> Predicate:
+        needle, index = self.needle, self.index
+        if index is None:
+            return _never
+        if self.predicate == StringPredicate.contains:
+            return lambda view: needle in view[index]
+        if self.predicate == StringPredicate.does_not_contain:
+            return lambda view: needle not in view[index]
+        if self.predicate == StringPredicate.equals:
+            return lambda view: view[index] == needle
+        if self.predicate == StringPredicate.does_not_equal:
+            return lambda view: view[index] != needle
+        return _never
+
+    def use_scan(self) -> None:
+        """Read the needles found in this field from the view instead of searching the field again."""
+        needle, slot = self.needle, FOUND_BASE + self.index
+        if self.predicate == StringPredicate.contains:
+            self._test = lambda view: needle in view[slot]
+        else:
+            self._test = lambda view: needle not in view[slot]
+        self.scanned = True
+
+    @property
+    def posting_key(self) -> Optional[PostingKey]:
+        """Key of this condition in CompiledRuleSet.postings(), None when it needs evaluating per email."""
+        if self.scanned and self.predicate == StringPredicate.contains:
+            return StringPredicate.contains, self.index, self.needle
+        if self.predicate == StringPredicate.equals and self.index is not None:
+            return StringPredicate.equals, self.index, self.needle
+        return None
+
+    def cost(self) -> float:
+        """Measured seconds per evaluation, or a guess by predicate kind until enough samples exist."""
+        if self.stats.evaluations >= MIN_PROFILED:
+            return self.stats.mean_seconds
+        if self.scanned:
+            return PRIOR_SECONDS["scanned"]
+        return PRIOR_SECONDS.get("date" if self.is_date else self.predicate, PRIOR_SECONDS["date"])
+
+    def match_rate(self) -> float:
+        if self.stats.evaluations >= MIN_PROFILED:
+            return self.stats.match_rate
+        return PRIOR_MATCH_RATE
+
+    def rank(self, match_all: bool) -> float:
+        """
+        Expected cost of reaching a decision with this condition first: for `all`
+        cheap conditions that usually fail go first, for `any` cheap ones that
+        usually pass.
+        """
+        decisive = 1.0 - self.match_rate() if match_all else self.match_rate()
+        return self.cost() / max(decisive, 1e-3)
+
+    def bind(self, now: float, profile: bool = False) -> Predicate:
+        """
+        The predicate for a run at epoch `now`; date cutoffs are fixed here, once
+        per run. With `profile` every call is timed into `stats`.
+        """
+        test = self._test if self._test is not None else self._date_test(now)
+        if not profile:
+            return test
+        stats, clock = self.stats, time.perf_counter
+
+        def profiled(view: EmailView) -> bool:
+            start = clock()
+            result = test(view)
+            stats.record(1, result, max(clock() - start - TIMER_OVERHEAD, 0.0))
+            return result
+
+        return profiled
+
+    def _date_test(self, now: float) -> Predicate:
+        cutoff = now - self.seconds
+        _, less_than = DATE_UNITS[self.predicate]
+        # received_ts 0 marks an unparseable date, which never matches.
+        if less_than:
+            return lambda view: view[TS_INDEX] > cutoff and view[TS_INDEX] != 0
+        return lambda view: 0 != view[TS_INDEX] < cutoff
+
+    def as_dict(self) -> Dict:
+        return {
+            "field": self.field.value if hasattr(self.field, "value") else str(self.field),
+            "predicate": self.predicate.value if hasattr(self.predicate, "value") else str(self.predicate),
+            "value": self.condition.value,
+            **self.stats.as_dict(),
+        }
+
+
+class CompiledRule:
+    """
+    A Rule with its conditions compiled; actions and description are read from `rule`.
+    Conditions are evaluated cheapest-decisive first (see CompiledCondition.rank),
+    re-ranked on every bind from the stats gathered so far.
+    """
+
+    __slots__ = ("rule", "conditions", "match_all", "stats")
+
+    def __init__(self, rule: Rule):
+        self.rule = rule
+        self.conditions = [CompiledCondition(c) for c in rule.conditions]
+        self.match_all = rule.match == "all"
+        self.stats = EvalStats()
+
+    @property
+    def description(self) -> str:
+        return self.rule.description
+
+    @property
+    def actions(self):
+        return self.rule.actions
+
+    def ordered_conditions(self) -> List[CompiledCondition]:
+        return sorted(self.conditions, key=lambda c: c.rank(self.match_all))
+
+    def bind(self, now: float, profile: bool = False) -> Predicate:
+        """Short-circuiting match over the conditions in rank order; `profile` times each condition."""
+        tests = [c.bind(now, profile) for c in self.ordered_conditions()]
+        if len(tests) == 1:
+            return tests[0]
+        if self.match_all:
+            if len(tests) == 2:
+                first, second = tests
+                return lambda view: first(view) and second(view)
+            return lambda view: all(t(view) for t in tests)
+        return lambda view: any(t(view) for t in tests)
+
+    def as_dict(self) -> Dict:
+        return {
+            "description": self.description,
+            "match": "all" if self.match_all else "any",
+            **self.stats.as_dict(),
+            "conditions": [c.as_dict() for c in self.ordered_conditions()],
+        }
+
+
+def compile_rules(rules: Iterable[Rule]) -> List[CompiledRule]:
+    return [r if isinstance(r, CompiledRule) else CompiledRule(r) for r in rules]
+
+
+def rule_conditions(rules: Iterable[CompiledRule]) -> Iterator[CompiledCondition]:
+    return (c for r in rules for c in r.conditions)
+
+
+def view_builder(
+    conditions: Iterable[CompiledCondition], matchers: Optional[Dict[int, AhoCorasick]] = None
+) -> Callable[[EmailRecord], EmailView]:
+    """
+    Build the function turning an EmailRecord into the tuple the predicates of
+    `conditions` read. Only fields some condition looks at are lowercased; the
+    rest are left empty. With `matchers` (view index -> automaton) the tuple also
+    carries the needles found in each field, empty for fields without one.
+    """
+    used = {c.index for c in conditions if c.needle is not None}
+    lower_sender, lower_recipient, lower_subject, lower_snippet, lower_date = (i in used for i in range(TS_INDEX))
+    fields = operator.attrgetter(*VIEW_ATTRS, "received_ts")
+
+    def view(email: EmailRecord) -> EmailView:
+        sender, recipient, subject, snippet, received, ts = fields(email)
+        return (
+            sender.lower() if lower_sender else "",
+            recipient.lower() if lower_recipient else "",
+            subject.lower() if lower_subject else "",
+            snippet.lower() if lower_snippet else "",
+            received.lower() if lower_date else "",
+            ts,
+        )
+
+    if not matchers:
+        return view
+    nothing = frozenset()
+    searches = [matchers[i].search if i in matchers else None for i in range(TS_INDEX)]
+
+    def scanned_view(email: EmailRecord) -> EmailView:
+        base = view(email)
+        return base + tuple(search(base[i]) if search else nothing for i, search in enumerate(searches))
+
+    return scanned_view
+
+
+class CompiledRuleSet:
+    """
+    Compiled rules plus the indexes they share, built once per rules file (see
+    RulesProcessor.load_rules):
+
+    - one Aho–Corasick automaton per text field over every `contains`/`does_not_contain`
+      needle on it, so each field of an email is scanned once however many rules
+      look into it (fields with fewer than AC_MIN_NEEDLES needles keep substring tests);
+    - per field, the set of `equals` values, so an email's field is looked up once
+      instead of compared with every rule.
+
+    postings() turns a batch of views into (predicate, field, value) -> positions,
+    and candidates() narrows each rule to the positions that can match it.
+    """
+
+    def __init__(self, rules: Iterable[Rule], min_needles: int = AC_MIN_NEEDLES):
+        self.rules: List[CompiledRule] = compile_rules(rules)
+        needles: Dict[int, Set[str]] = defaultdict(set)
+        for cond in self._scannable():
+            needles[cond.index].add(cond.needle)
+        self.matchers: Dict[int, AhoCorasick] = {
+            index: AhoCorasick(sorted(found)) for index, found in needles.items() if len(found) >= min_needles
+        }
+        for cond in self._scannable():
+            if cond.index in self.matchers:
+                cond.use_scan()
+        # view index -> lowercased values some `equals` condition compares that field with.
+        self.values: Dict[int, Set[str]] = defaultdict(set)
+        for cond in rule_conditions(self.rules):
+            if cond.predicate == StringPredicate.equals and cond.index is not None:
+                self.values[cond.index].add(cond.needle)
+        self.view = view_builder(rule_conditions(self.rules), self.matchers)
+
+    def _scannable(self) -> Iterator[CompiledCondition]:
+        return (
+            c
+            for c in rule_conditions(self.rules)
+            if c.predicate in SCANNED_PREDICATES and c.index is not None and c.needle
+        )
+
+    def __iter__(self) -> Iterator[CompiledRule]:
+        return iter(self.rules)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def __getitem__(self, i):
+        return self.rules[i]
+
+    @property
+    def indexed(self) -> bool:
+        return bool(self.matchers or self.values)
+
+    def postings(self, views: Sequence[EmailView]) -> Dict[PostingKey, List[int]]:
+        """
+        Ascending positions in `views` per (contains, field, needle) the automaton
+        found and per (equals, field, value) an indexed field holds.
+        """
+        found: Dict[PostingKey, List[int]] = defaultdict(list)
+        contains, equals = StringPredicate.contains, StringPredicate.equals
+        scanned = [(index, FOUND_BASE + index) for index in self.matchers]
+        values = list(self.values.items())
+        for pos, view in enumerate(views):
+            for index, slot in scanned:
+                for needle in view[slot]:
+                    found[(contains, index, needle)].append(pos)
+            for index, wanted in values:
+                if view[index] in wanted:
+                    found[(equals, index, view[index])].append(pos)
+        return found
+
+    @staticmethod
+    def candidates(rule: CompiledRule, postings: Dict[PostingKey, List[int]]) -> Optional[List[int]]:
+        """
+        Positions that may match `rule` according to `postings`, or None when they
+        cannot narrow it: an `all` rule needs one indexed condition, an `any` rule
+        needs every condition to be one.
+        """
+        keys = [c.posting_key for c in rule.conditions if c.posting_key is not None]
+        if rule.match_all:
+            if not keys:
+                return None
+            return min((postings.get(k, []) for k in keys), key=len)
+        if not keys or len(keys) < len(rule.conditions):
+            return None
+        return sorted(set().union(*(postings.get(k, ()) for k in keys)))
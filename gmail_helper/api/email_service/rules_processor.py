@@ -1,116 +1,438 @@
+import asyncio
+import functools
+import itertools
 import json
-from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional
+import operator
+import os
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
-from gmail_helper.common.contracts.rules_contract import ActionType, DatePredicate, FieldName, Rule, StringPredicate
-from gmail_helper.common.services.gmail_service import GmailClient
+from gmail_helper.api.email_service.rules_engine import (
+    DATE_UNITS,
+    FIELD_COLUMNS,
+    CompiledCondition,
+    CompiledRule,
+    CompiledRuleSet,
+    PostingKey,
+    rule_conditions,
+)
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.rules_contract import ActionType, FieldName, Rule, StringPredicate
+from gmail_helper.common.services.async_gmail_service import AsyncGmailClient
+from gmail_helper.common.services.gmail_service import MAX_BATCH_MODIFY_IDS, GmailClient
 from gmail_helper.common.utils.logger import get_logger
+from gmail_helper.stores.columnar import NUMPY_AVAILABLE, ColumnarSnapshot
 
 LOG = get_logger(__name__)
 
 
+class LabelDelta:
+    """Net label change for one message across all matched rules and actions."""
+
+    __slots__ = ("add", "remove", "actions")
+
+    def __init__(self):
+        self.add = set()
+        self.remove = set()
+        self.actions = 0
+
+    def record(self, add: List[str] = (), remove: List[str] = ()) -> None:
+        # Later actions win over earlier ones touching the same label.
+        for label in add:
+            self.remove.discard(label)
+            self.add.add(label)
+        for label in remove:
+            self.add.discard(label)
+            self.remove.add(label)
+        self.actions += 1
+
+    def is_noop(self) -> bool:
+        return not self.add and not self.remove
+
+    def key(self) -> tuple:
+        return tuple(sorted(self.add)), tuple(sorted(self.remove))
+
+
 class RulesProcessor:
     """
     Loads rules from JSON and applies them to emails from the store.
     Uses GmailClient for real actions (mark_as_read/unread, move via labels).
     """
 
-    def __init__(self, store, rules_file: str, gmail_client: GmailClient):
+    # Below this many emails a Python scan is cheaper than querying the full-text index.
+    SEARCH_MIN_EMAILS = 500
+    # Shortest `contains` value the trigram index can look up.
+    SEARCH_MIN_TERM = 3
+    # Emails read per store round trip when streaming a large run.
+    STREAM_BATCH_SIZE = 1000
+    # Candidates per rule and batch evaluated with per-condition timing, to keep condition ranks current.
+    PROFILE_SAMPLE = 64
+
+    def __init__(
+        self,
+        store,
+        rules_file: str,
+        gmail_client: GmailClient,
+        async_gmail_client: Optional[AsyncGmailClient] = None,
+        columnar: bool = False,
+        pushdown: bool = False,
+    ):
         self.store = store
         self.rules_file = rules_file
         self.gmail = gmail_client
+        self.async_gmail = async_gmail_client
         self._label_cache: Dict[str, str] = {}
         self._labels_loaded = False
+        self.last_batches: List[dict] = []
+        # (rules file (mtime_ns, size), validated rules, compiled rules); replaced as a whole on reload.
+        self._loaded: Optional[Tuple[Tuple[int, int], List[Rule], CompiledRuleSet]] = None
+        if columnar and not NUMPY_AVAILABLE:
+            LOG.warning("numpy is not installed, whole-mailbox rule runs fall back to row-by-row evaluation")
+        # Evaluate whole-mailbox runs column-wise over the store's columnar snapshot.
+        self.columnar = columnar and NUMPY_AVAILABLE
+        # Let the store evaluate rules in SQL for runs over SEARCH_MIN_EMAILS or more emails.
+        self.pushdown = pushdown
 
     def load_rules(self) -> List[Rule]:
+        """Rules from rules_file; the file is only re-read and re-validated after it changes."""
+        stat = os.stat(self.rules_file)
+        key = (stat.st_mtime_ns, stat.st_size)
+        loaded = self._loaded
+        if loaded is not None and loaded[0] == key:
+            return loaded[1]
         with open(self.rules_file, "r") as f:
             data = json.load(f)
         rules_raw = data.get("rules", data) if isinstance(data, dict) else data
-        return [Rule(**r) for r in rules_raw]
+        rules = [Rule(**r) for r in rules_raw]
+        self._loaded = (key, rules, CompiledRuleSet(rules))
+        LOG.info("Loaded and compiled %d rules from %s", len(rules), self.rules_file)
+        return rules
 
-    def apply_rules(self, limit: int = 20) -> int:
-        rules = self.load_rules()
-        emails = self.store.get_last_n_emails(limit)
-        total_actions = 0
+    def _compile(self, rules: Iterable[Rule]) -> CompiledRuleSet:
+        """Compiled form of `rules`, reusing the cached compilation for the rules load_rules returned."""
+        loaded = self._loaded
+        if loaded is not None and rules is loaded[1]:
+            return loaded[2]
+        if isinstance(rules, CompiledRuleSet):
+            return rules
+        return CompiledRuleSet(rules)
+
+    def apply_rules(self, limit: Optional[int] = 20) -> int:
+        """Run the rules over the newest `limit` emails, or the whole mailbox when `limit` is None."""
+        rules = self._compile(self.load_rules())
+        now = time.time()
+        # Without a Gmail client actions are only logged.
+        pending: Optional[Dict[str, LabelDelta]] = None
 
         if self.gmail is not None:
             self._warm_labels_cache()
+            pending = {}
 
-        for rule in rules:
-            LOG.info("Evaluating rule: %s", rule.description)
-            for email in emails:
-                if self._matches(rule, email):
-                    LOG.info(
-                        "  ✓ Matched email %s (%s)",
-                        email["id"],
-                        email.get("subject", ""),
-                    )
-                    total_actions += self._execute_actions(email, rule)
+        self.last_batches = []
+        total_actions = 0
+        if self._use_columnar(rules, limit):
+            total_actions += self._evaluate_columnar(rules, pending, now=now)
+        elif self._use_pushdown(limit):
+            total_actions += self._evaluate_pushdown(rules, pending, limit, now=now)
+        else:
+            hits = self._search_hits(rules, limit)
+            for emails in self._email_batches(limit):
+                total_actions += self._evaluate(rules, emails, pending, hits, now=now)
+                if pending and len(pending) >= MAX_BATCH_MODIFY_IDS:
+                    total_actions += self._flush_label_changes(pending)
+                    pending.clear()
+        if pending:
+            total_actions += self._flush_label_changes(pending)
 
         LOG.info("Completed rules run: %d actions executed/logged", total_actions)
         return total_actions
 
-    def _matches(self, rule: Rule, email: dict) -> bool:
-        results = [self._eval_condition(c, email) for c in rule.conditions]
-        return all(results) if rule.match == "all" else any(results)
-
-    def _eval_condition(self, cond, email) -> bool:
-        if cond.field == FieldName.From_:
-            field_val = email.get("sender", "")
-        elif cond.field == FieldName.To:
-            field_val = ""  # not captured in this demo
-        elif cond.field == FieldName.Subject:
-            field_val = email.get("subject", "")
-        elif cond.field == FieldName.Message:
-            field_val = email.get("snippet", "")
-        elif cond.field == FieldName.DateReceived:
-            field_val = email.get("received_datetime", "")
+    async def apply_rules_async(self, limit: Optional[int] = 20) -> int:
+        """apply_rules on AsyncGmailClient; batchModify calls are sent concurrently."""
+        if self.async_gmail is None:
+            return self.apply_rules(limit=limit)
+
+        rules = self._compile(self.load_rules())
+        now = time.time()
+        await self._warm_labels_cache_async()
+        await self._ensure_labels_async(rules)
+
+        self.last_batches = []
+        pending: Dict[str, LabelDelta] = {}
+        total_actions = 0
+        if self._use_columnar(rules, limit):
+            total_actions += self._evaluate_columnar(rules, pending, now=now)
+        elif self._use_pushdown(limit):
+            total_actions += self._evaluate_pushdown(rules, pending, limit, now=now)
         else:
-            field_val = ""
+            hits = self._search_hits(rules, limit)
+            for emails in self._email_batches(limit):
+                total_actions += self._evaluate(rules, emails, pending, hits, now=now)
+                if len(pending) >= MAX_BATCH_MODIFY_IDS:
+                    total_actions += await self._flush_label_changes_async(pending)
+                    pending.clear()
+        if pending:
+            total_actions += await self._flush_label_changes_async(pending)
+
+        LOG.info("Completed rules run: %d actions executed/logged", total_actions)
+        return total_actions
+
+    def _email_batches(self, limit: Optional[int]) -> Iterator[List[EmailRecord]]:
+        """Newest-first emails in lists of at most STREAM_BATCH_SIZE, streamed from the store."""
+        if limit is not None and limit <= self.STREAM_BATCH_SIZE:
+            yield self.store.get_last_n_emails(limit)
+            return
+        stream = itertools.islice(self.store.iter_emails(batch_size=self.STREAM_BATCH_SIZE), limit)
+        while True:
+            batch = list(itertools.islice(stream, self.STREAM_BATCH_SIZE))
+            if not batch:
+                return
+            yield batch
+
+    def _evaluate(
+        self,
+        rules: Sequence[Rule],
+        emails: List[EmailRecord],
+        pending: Optional[Dict[str, LabelDelta]],
+        hits: Optional[Dict[Tuple[FieldName, str], Set[str]]] = None,
+        now: Optional[float] = None,
+    ) -> int:
+        """
+        Apply `rules` to one batch of emails. Every field a rule reads is lowercased,
+        and scanned by its automaton if it has one, once per email; each rule is then
+        only evaluated on the emails its indexed conditions leave (see _candidates).
+        """
+        total_actions = 0
+        for rule, matched in self._match_batch(self._compile(rules), emails, hits, now):
+            for email in matched:
+                LOG.info("  ✓ Matched email %s (%s)", email.id, email.subject)
+                total_actions += self._execute_actions(email, rule, pending)
+        return total_actions
+
+    def _match_batch(
+        self,
+        rules: CompiledRuleSet,
+        emails: List[EmailRecord],
+        hits: Optional[Dict[Tuple[FieldName, str], Set[str]]] = None,
+        now: Optional[float] = None,
+        only: Optional[Sequence[CompiledRule]] = None,
+    ) -> Iterator[Tuple[CompiledRule, List[EmailRecord]]]:
+        """(rule, emails it matches) for each rule in order, or for the rules in `only`."""
+        now = time.time() if now is None else now
+        emails = [e if isinstance(e, EmailRecord) else EmailRecord.from_mapping(e) for e in emails]
+        views = [rules.view(e) for e in emails]
+        postings = rules.postings(views) if rules.indexed else None
+        if hits is None:
+            floor = min(((e.received_ts, e.id) for e in emails), default=None)
+            hits = self._search_hits(rules, len(emails), floor=floor)
+        for rule in rules if only is None else only:
+            LOG.info("Evaluating rule: %s", rule.description)
+            candidates = self._candidates(rule, emails, hits, postings)
+            if not candidates:
+                continue
+            start = time.perf_counter()
+            profiled, fast = rule.bind(now, profile=True), rule.bind(now)
+            matched = [i for i in candidates[: self.PROFILE_SAMPLE] if profiled(views[i])]
+            matched += [i for i in candidates[self.PROFILE_SAMPLE :] if fast(views[i])]
+            rule.stats.record(len(candidates), len(matched), time.perf_counter() - start)
+            yield rule, [emails[i] for i in matched]
+
+    def _use_pushdown(self, limit: Optional[int]) -> bool:
+        return self.pushdown and (limit is None or limit >= self.SEARCH_MIN_EMAILS)
+
+    def _evaluate_pushdown(
+        self,
+        rules: Sequence[Rule],
+        pending: Optional[Dict[str, LabelDelta]],
+        limit: Optional[int],
+        now: Optional[float] = None,
+    ) -> int:
+        """
+        Run over the newest `limit` emails (all when None) with each rule answered
+        by the store in SQL (see EmailsStore.rule_ids). Rules the store cannot
+        translate are evaluated in Python over the same window. Actions are
+        executed rule by rule afterwards, so each email still sees them in rule order.
+        """
+        rules = self._compile(rules)
+        now = time.time() if now is None else now
+        size = self.store.count()
+        floor = self.store.window_floor(limit) if limit is not None and limit < size else None
+        window = size if floor is None else limit
+
+        matches: Dict[int, List[EmailRecord]] = {}
+        fallback: List[CompiledRule] = []
+        # Actions only read the id; one stand-in record per email, shared by every rule matching it.
+        records: Dict[str, EmailRecord] = {}
+        for rule in rules:
+            start = time.perf_counter()
+            ids = self.store.rule_ids(rule.rule, now, floor=floor)
+            if ids is None:
+                fallback.append(rule)
+                continue
+            rule.stats.record(window, len(ids), time.perf_counter() - start)
+            for email_id in ids:
+                if email_id not in records:
+                    records[email_id] = EmailRecord(email_id, received_ts=0)
+            matches[id(rule)] = [records[email_id] for email_id in ids]
+        if fallback:
+            LOG.info("%d rules cannot be evaluated in SQL, scanning %d emails for them", len(fallback), window)
+            for emails in self._email_batches(limit):
+                for rule, matched in self._match_batch(rules, emails, {}, now, only=fallback):
+                    matches.setdefault(id(rule), []).extend(matched)
+
+        total_actions = 0
+        for rule in rules:
+            matched = matches.get(id(rule), [])
+            LOG.info("Evaluating rule: %s (%d of %d emails matched)", rule.description, len(matched), window)
+            for email in matched:
+                total_actions += self._execute_actions(email, rule, pending)
+        return total_actions
 
-        if isinstance(cond.predicate, StringPredicate):
-            fv = (field_val or "").lower()
-            ev = str(cond.value).lower()
+    def _use_columnar(self, rules: Sequence[Rule], limit: Optional[int]) -> bool:
+        # Mixing columnar and row-wise rules would reorder actions, so it is all or nothing.
+        return self.columnar and limit is None and all(self._columnar_supported(r) for r in self._compile(rules))
+
+    @staticmethod
+    def _columnar_supported(rule: CompiledRule) -> bool:
+        for cond in rule.conditions:
+            if cond.needle is not None and cond.field in FIELD_COLUMNS:
+                continue
+            if cond.predicate in DATE_UNITS:
+                # Off DateReceived a date predicate is a constant False mask.
+                continue
+            return False
+        return True
+
+    def _evaluate_columnar(
+        self, rules: Sequence[Rule], pending: Optional[Dict[str, LabelDelta]], now: Optional[float] = None
+    ) -> int:
+        """_evaluate over the whole mailbox, with each condition computed for all emails at once."""
+        rules = self._compile(rules)
+        snapshot = self.store.columnar_snapshot()
+        now = time.time() if now is None else now
+        total_actions = 0
+        for rule in rules:
+            start = time.perf_counter()
+            ids = snapshot.ids_for(self._rule_mask(rule, snapshot, now))
+            # Rule totals only: per-row condition costs here are not comparable with row-wise ones.
+            rule.stats.record(len(snapshot), len(ids), time.perf_counter() - start)
+            LOG.info("Evaluating rule: %s (%d of %d emails matched)", rule.description, len(ids), len(snapshot))
+            for email_id in ids:
+                total_actions += self._execute_actions(EmailRecord(email_id, received_ts=0), rule, pending)
+        return total_actions
+
+    def _rule_mask(self, rule: CompiledRule, snapshot: ColumnarSnapshot, now: float):
+        masks = [self._condition_mask(c, snapshot, now) for c in rule.conditions]
+        if rule.match_all:
+            return functools.reduce(operator.and_, masks, snapshot.constant(True))
+        return functools.reduce(operator.or_, masks, snapshot.constant(False))
+
+    @staticmethod
+    def _condition_mask(cond: CompiledCondition, snapshot: ColumnarSnapshot, now: float):
+        """Vectorised CompiledCondition: a boolean mask over every email in the snapshot."""
+        if cond.needle is not None:
+            column = FIELD_COLUMNS[cond.field]
             if cond.predicate == StringPredicate.contains:
-                return ev in fv
+                return snapshot.contains(column, cond.needle)
             if cond.predicate == StringPredicate.does_not_contain:
-                return ev not in fv
+                return ~snapshot.contains(column, cond.needle)
             if cond.predicate == StringPredicate.equals:
-                return fv == ev
+                return snapshot.equals(column, cond.needle)
             if cond.predicate == StringPredicate.does_not_equal:
-                return fv != ev
-            return False
+                return ~snapshot.equals(column, cond.needle)
+            return snapshot.constant(False)
+        if not cond.is_date:
+            # Unknown predicates, and date predicates on a field other than DateReceived.
+            return snapshot.constant(False)
 
-        if isinstance(cond.predicate, DatePredicate):
-            try:
-                received = datetime.fromisoformat(field_val.replace("Z", "+00:00"))
-            except Exception:
-                return False
-            now = datetime.now(timezone.utc)
-            delta = now - received
-            v = int(cond.value)
-            if cond.predicate == DatePredicate.less_than_days:
-                return delta < timedelta(days=v)
-            if cond.predicate == DatePredicate.greater_than_days:
-                return delta > timedelta(days=v)
-            if cond.predicate == DatePredicate.less_than_months:
-                return delta < timedelta(days=30 * v)
-            if cond.predicate == DatePredicate.greater_than_months:
-                return delta > timedelta(days=30 * v)
-            return False
+        cutoff = now - cond.seconds
+        _, less_than = DATE_UNITS[cond.predicate]
+        mask = snapshot.received_ts > cutoff if less_than else snapshot.received_ts < cutoff
+        # received_ts 0 marks an unparseable date, which never matches (as in CompiledCondition).
+        return mask & (snapshot.received_ts != 0)
+
+    def _search_hits(
+        self, rules: Sequence[Rule], count: Optional[int], floor: Optional[Tuple[int, str]] = None
+    ) -> Dict[Tuple[FieldName, str], Set[str]]:
+        """
+        Ids matching each indexable `contains` condition, looked up once per run of
+        `count` emails (None for the whole mailbox). Only emails at or after `floor`
+        are looked up, by default the oldest of the newest `count`.
+        """
+        if count is not None and count < self.SEARCH_MIN_EMAILS:
+            return {}
+        if floor is None and count is not None:
+            floor = self.store.window_floor(count)
+        hits: Dict[Tuple[FieldName, str], Set[str]] = {}
+        for cond in rule_conditions(self._compile(rules)):
+            # The automaton scan already answers these exactly, without a query.
+            key = None if cond.scanned else self._search_key(cond)
+            if key is not None and key not in hits:
+                hits[key] = self.store.search_ids(key[1], FIELD_COLUMNS[key[0]], floor=floor)
+        return hits
 
-        return False
+    @classmethod
+    def _search_key(cls, cond: CompiledCondition) -> Optional[Tuple[FieldName, str]]:
+        if cond.predicate != StringPredicate.contains or cond.field not in FIELD_COLUMNS:
+            return None
+        return (cond.field, cond.needle) if len(cond.needle) >= cls.SEARCH_MIN_TERM else None
 
-    def _execute_actions(self, email: dict, rule: Rule) -> int:
+    def _candidates(
+        self,
+        rule: CompiledRule,
+        emails: List[EmailRecord],
+        hits: Dict[Tuple[FieldName, str], Set[str]],
+        postings: Optional[Dict[PostingKey, List[int]]] = None,
+    ) -> Sequence[int]:
+        """
+        Positions in `emails` that may match `rule`, narrowed by the batch's automaton
+        scan and `equals` index (`postings`) or else the full-text `hits`; the
+        compiled predicate still has the final say.
+        """
+        if postings is not None:
+            narrowed = CompiledRuleSet.candidates(rule, postings)
+            if narrowed is not None:
+                return narrowed
+        if not hits:
+            return range(len(emails))
+        keys = [self._search_key(c) for c in rule.conditions]
+        if rule.match_all:
+            found = [hits[k] for k in keys if k in hits]
+            if not found:
+                return range(len(emails))
+            ids = min(found, key=len)
+        else:
+            if not keys or any(k not in hits for k in keys):
+                return range(len(emails))
+            ids = set().union(*(hits[k] for k in keys))
+        return [i for i, e in enumerate(emails) if e.id in ids]
+
+    def rule_stats(self) -> List[Dict]:
+        """
+        Per-rule evaluation counts, match rate and time for the currently loaded
+        rules since they were (re)loaded, with per-condition figures in evaluation
+        order. Condition figures come from the profiled sample of each batch.
+        """
+        loaded = self._loaded
+        if loaded is None:
+            return []
+        return sorted((r.as_dict() for r in loaded[2]), key=lambda r: r["seconds"], reverse=True)
+
+    def _execute_actions(self, email: EmailRecord, rule: CompiledRule, pending: Optional[Dict[str, LabelDelta]]) -> int:
+        """
+        Logs actions directly when `pending` is None (no Gmail client); otherwise
+        records the label change in `pending` and returns 0 (counted when the
+        batch is sent).
+        """
         count = 0
         for action in rule.actions:
             if action.type == ActionType.mark_as_read:
-                count += self._act_mark_read(email)
+                count += self._act_mark_read(email, pending)
             elif action.type == ActionType.mark_as_unread:
-                count += self._act_mark_unread(email)
+                count += self._act_mark_unread(email, pending)
             elif action.type == ActionType.move_message:
                 mailbox = (action.mailbox or "Inbox").strip()
-                count += self._act_move_message(email, mailbox)
+                count += self._act_move_message(email, mailbox, pending)
             else:
                 LOG.warning(
                     "[ACTION] unknown action %s for email %s",
@@ -119,78 +441,106 @@ class RulesProcessor:
                 )
         return count
 
-    def _act_mark_read(self, email: dict) -> int:
-        if self.gmail is None:
+    def _act_mark_read(self, email: EmailRecord, pending: Optional[Dict[str, LabelDelta]]) -> int:
+        if pending is None:
             LOG.info("[ACTION] mark_as_read (LOG ONLY) -> email %s", email["id"])
             return 1
-        try:
-            self.gmail.modify_message(email["id"], add_label_ids=[], remove_label_ids=["UNREAD"])
-            LOG.info("[ACTION] mark_as_read -> email %s (APPLIED)", email["id"])
-            return 1
-        except Exception as e:
-            LOG.error("[ACTION] mark_as_read FAILED for %s: %s", email["id"], e)
-            return 0
+        self._delta(pending, email).record(remove=["UNREAD"])
+        return 0
 
-    def _act_mark_unread(self, email: dict) -> int:
-        if self.gmail is None:
+    def _act_mark_unread(self, email: EmailRecord, pending: Optional[Dict[str, LabelDelta]]) -> int:
+        if pending is None:
             LOG.info("[ACTION] mark_as_unread (LOG ONLY) -> email %s", email["id"])
             return 1
-        try:
-            self.gmail.modify_message(email["id"], add_label_ids=["UNREAD"], remove_label_ids=[])
-            LOG.info("[ACTION] mark_as_unread -> email %s (APPLIED)", email["id"])
-            return 1
-        except Exception as e:
-            LOG.error("[ACTION] mark_as_unread FAILED for %s: %s", email["id"], e)
-            return 0
+        self._delta(pending, email).record(add=["UNREAD"])
+        return 0
 
-    def _act_move_message(self, email: dict, mailbox: str) -> int:
+    def _act_move_message(self, email: EmailRecord, mailbox: str, pending: Optional[Dict[str, LabelDelta]]) -> int:
         """
         'Move' implemented as:
           - Add target label (create if missing) for user labels.
           - Remove INBOX (archive) unless moving to Inbox itself.
         """
-        if self.gmail is None:
+        if pending is None:
             LOG.info(
                 "[ACTION] move_message (LOG ONLY) -> email %s to '%s'",
                 email["id"],
                 mailbox,
             )
             return 1
-        try:
-            label_id, remove_inbox = self._resolve_move_target(mailbox)
-            add = []
-            rem = []
-            if label_id and label_id != "INBOX":
-                add.append(label_id)
-            elif label_id == "INBOX":
-                add.append("INBOX")
-            if remove_inbox:
-                rem.append("INBOX")
-
-            if not add and not rem:
-                LOG.info(
-                    "[ACTION] move_message -> email %s already in desired state",
-                    email["id"],
-                )
-                return 1
+        label_id, remove_inbox = self._resolve_move_target(mailbox)
+        add = [label_id] if label_id else []
+        rem = ["INBOX"] if remove_inbox else []
+        self._delta(pending, email).record(add=add, remove=rem)
+        return 0
 
-            self.gmail.modify_message(email["id"], add_label_ids=add, remove_label_ids=rem)
-            LOG.info(
-                "[ACTION] move_message -> email %s to '%s' (APPLIED) add=%s remove=%s",
-                email["id"],
-                mailbox,
-                add,
-                rem,
-            )
-            return 1
-        except Exception as e:
-            LOG.error(
-                "[ACTION] move_message FAILED for %s to '%s': %s",
-                email["id"],
-                mailbox,
-                e,
-            )
+    @staticmethod
+    def _delta(pending: Dict[str, LabelDelta], email: EmailRecord) -> LabelDelta:
+        delta = pending.get(email["id"])
+        if delta is None:
+            delta = pending[email["id"]] = LabelDelta()
+        return delta
+
+    def _flush_label_changes(self, pending: Dict[str, LabelDelta]) -> int:
+        """
+        Group messages by identical net label delta and send each group as
+        users.messages.batchModify calls of at most MAX_BATCH_MODIFY_IDS ids.
+        Returns the number of actions covered by successful batches; per-batch
+        outcomes are kept in `last_batches`.
+        """
+        applied, batches = self._plan_batches(pending)
+        for ids, add, rem in batches:
+            try:
+                self.gmail.batch_modify(ids, add_label_ids=add, remove_label_ids=rem)
+                applied += self._record_batch(pending, ids, add, rem)
+            except Exception as e:
+                self._record_batch(pending, ids, add, rem, error=e)
+        return applied
+
+    async def _flush_label_changes_async(self, pending: Dict[str, LabelDelta]) -> int:
+        applied, batches = self._plan_batches(pending)
+        results = await asyncio.gather(
+            *(self.async_gmail.batch_modify(ids, add_label_ids=add, remove_label_ids=rem) for ids, add, rem in batches),
+            return_exceptions=True,
+        )
+        for (ids, add, rem), res in zip(batches, results):
+            error = res if isinstance(res, Exception) else None
+            applied += self._record_batch(pending, ids, add, rem, error=error)
+        return applied
+
+    def _plan_batches(self, pending: Dict[str, LabelDelta]) -> Tuple[int, List[Tuple[List[str], List[str], List[str]]]]:
+        """Returns (actions needing no call, [(ids, add, remove), ...])."""
+        groups: Dict[tuple, List[str]] = {}
+        noop_actions = 0
+        for msg_id, delta in pending.items():
+            if delta.is_noop():
+                LOG.info("[ACTION] email %s already in desired state", msg_id)
+                noop_actions += delta.actions
+                continue
+            groups.setdefault(delta.key(), []).append(msg_id)
+
+        batches = []
+        for (add, rem), ids in groups.items():
+            for start in range(0, len(ids), MAX_BATCH_MODIFY_IDS):
+                batches.append((ids[start : start + MAX_BATCH_MODIFY_IDS], list(add), list(rem)))
+        return noop_actions, batches
+
+    def _record_batch(
+        self,
+        pending: Dict[str, LabelDelta],
+        ids: List[str],
+        add: List[str],
+        rem: List[str],
+        error: Optional[Exception] = None,
+    ) -> int:
+        self.last_batches.append(
+            {"ids": ids, "add": add, "remove": rem, "ok": error is None, "error": str(error) if error else None}
+        )
+        if error is not None:
+            LOG.error("[ACTION] batchModify of %d emails add=%s remove=%s FAILED: %s", len(ids), add, rem, error)
             return 0
+        LOG.info("[ACTION] batchModify %d emails add=%s remove=%s (APPLIED)", len(ids), add, rem)
+        return sum(pending[i].actions for i in ids)
 
     def _warm_labels_cache(self) -> None:
         if self._labels_loaded or self.gmail is None:
@@ -207,6 +557,35 @@ class RulesProcessor:
         except Exception as e:
             LOG.warning("Failed to preload labels: %s", e)
 
+    async def _warm_labels_cache_async(self) -> None:
+        if self._labels_loaded:
+            return
+        try:
+            for l in await self.async_gmail.list_labels():
+                name = (l.get("name") or "").strip()
+                if name:
+                    self._label_cache[name.lower()] = l.get("id")
+            self._labels_loaded = True
+            LOG.info("Preloaded %d labels into cache", len(self._label_cache))
+        except Exception as e:
+            LOG.warning("Failed to preload labels: %s", e)
+
+    async def _ensure_labels_async(self, rules: Sequence[CompiledRule]) -> None:
+        """Create missing move targets up front so planning only reads the label cache."""
+        mailboxes = {
+            (a.mailbox or "Inbox").strip() for r in rules for a in r.actions if a.type == ActionType.move_message
+        }
+        for mailbox in mailboxes:
+            if mailbox.lower() == "inbox" or mailbox.lower() in self._label_cache:
+                continue
+            try:
+                created = await self.async_gmail.create_label(mailbox)
+                if created.get("id"):
+                    self._label_cache[mailbox.lower()] = created["id"]
+                    LOG.info("Created label '%s' (id=%s)", mailbox, created["id"])
+            except Exception as e:
+                LOG.error("Failed to create label '%s': %s", mailbox, e)
+
     def _resolve_move_target(self, mailbox: str):
         """
         Returns (label_id, remove_inbox_flag).
@@ -219,6 +598,8 @@ class RulesProcessor:
         label_id = self._label_cache.get(mailbox.lower())
         if label_id:
             return label_id, True
+        if self.gmail is None:
+            return None, True
 
         try:
             created = self.gmail.create_label(mailbox)
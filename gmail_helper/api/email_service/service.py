@@ -1,7 +1,16 @@
-from typing import Optional
+import itertools
+from typing import List, Optional
 
-from gmail_helper.api.email_service.models import EmailResponse, EmailsListResponse
-from gmail_helper.common.contracts.emails_interface import EmailsInterface
+from gmail_helper.api.email_service.models import EmailResponse, EmailsListResponse, EmailsSearchResponse
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.emails_interface import AsyncEmailsInterface, EmailsInterface, encode_cursor
+from gmail_helper.common.utils.exceptions import Reason, ServiceException
+
+
+def _list_response(rows: List[EmailRecord], n: int) -> EmailsListResponse:
+    emails = [EmailResponse(**row) for row in rows]
+    next_cursor = encode_cursor(rows[-1]) if rows and len(rows) == n and "received_ts" in rows[-1] else None
+    return EmailsListResponse(emails=emails, next_cursor=next_cursor)
 
 
 class EmailService:
@@ -12,11 +21,62 @@ class EmailService:
     def __init__(self, store: EmailsInterface):
         self.store = store
 
-    def get_last_emails(self, n: int = 10) -> EmailsListResponse:
-        rows = self.store.get_last_n_emails(n)
-        emails = [EmailResponse(**row) for row in rows]
-        return EmailsListResponse(emails=emails)
+    def get_last_emails(self, n: int = 10, before: Optional[str] = None) -> EmailsListResponse:
+        """Newest-first page of `n` emails; pass the returned next_cursor as `before` for the next page."""
+        if n < 1:
+            raise ServiceException(Reason.INVALID_PARAM, "n must be at least 1")
+        if before is None:
+            rows = self.store.get_last_n_emails(n)
+        else:
+            try:
+                rows = list(itertools.islice(self.store.iter_emails(before=before, batch_size=n), n))
+            except ValueError as e:
+                raise ServiceException(Reason.INVALID_PARAM, str(e))
+        return _list_response(rows, n)
 
     def get_email_by_id(self, email_id: str) -> Optional[EmailResponse]:
         row = self.store.get_email_by_id(email_id)
         return EmailResponse(**row) if row else None
+
+    def search_emails(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> EmailsSearchResponse:
+        try:
+            rows, next_cursor = self.store.search(query, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise ServiceException(Reason.INVALID_PARAM, str(e))
+        return EmailsSearchResponse(emails=[EmailResponse(**row) for row in rows], next_cursor=next_cursor)
+
+
+class AsyncEmailService:
+    """
+    EmailService for async routes. Depends on AsyncEmailsInterface (contract).
+    """
+
+    def __init__(self, store: AsyncEmailsInterface):
+        self.store = store
+
+    async def get_last_emails(self, n: int = 10, before: Optional[str] = None) -> EmailsListResponse:
+        if n < 1:
+            raise ServiceException(Reason.INVALID_PARAM, "n must be at least 1")
+        if before is None:
+            rows = await self.store.get_last_n_emails(n)
+        else:
+            rows = []
+            try:
+                async for row in self.store.iter_emails(before=before, batch_size=n):
+                    rows.append(row)
+                    if len(rows) == n:
+                        break
+            except ValueError as e:
+                raise ServiceException(Reason.INVALID_PARAM, str(e))
+        return _list_response(rows, n)
+
+    async def get_email_by_id(self, email_id: str) -> Optional[EmailResponse]:
+        row = await self.store.get_email_by_id(email_id)
+        return EmailResponse(**row) if row else None
+
+    async def search_emails(self, query: str, limit: int = 20, cursor: Optional[str] = None) -> EmailsSearchResponse:
+        try:
+            rows, next_cursor = await self.store.search(query, limit=limit, cursor=cursor)
+        except ValueError as e:
+            raise ServiceException(Reason.INVALID_PARAM, str(e))
+        return EmailsSearchResponse(emails=[EmailResponse(**row) for row in rows], next_cursor=next_cursor)
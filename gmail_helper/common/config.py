@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 
 
@@ -11,6 +12,23 @@ class Config:
 
     # Database
     DB_PATH = os.getenv("DB_PATH", str(PROJECT_ROOT / "emails.db"))
+    SQLITE_CACHE_SIZE_KIB = int(os.getenv("SQLITE_CACHE_SIZE_KIB", "65536"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    # One SQLite file per received month under DB_PARTITION_DIR (default: DB_PATH + ".partitions"),
+    # with DB_PATH holding only the id -> partition catalog and sync state
+    DB_PARTITIONED = os.getenv("DB_PARTITIONED", "false").lower() == "true"
+    DB_PARTITION_DIR = os.getenv("DB_PARTITION_DIR") or None
+    # Partitions older than this many months are dropped, or moved to DB_ARCHIVE_DIR if set; 0 keeps all
+    DB_RETENTION_MONTHS = int(os.getenv("DB_RETENTION_MONTHS", "0"))
+    DB_ARCHIVE_DIR = os.getenv("DB_ARCHIVE_DIR") or None
+    # Background retention + VACUUM of cold partitions every N seconds; 0 disables it
+    DB_MAINTENANCE_INTERVAL_SEC = float(os.getenv("DB_MAINTENANCE_INTERVAL_SEC", "3600"))
+    # Reader threads (each with its own SQLite connection) behind the async store used by the API
+    DB_READ_WORKERS = int(os.getenv("DB_READ_WORKERS", "8"))
+    # LRU cache for get_email_by_id in front of the store; 0 disables it
+    EMAILS_CACHE_SIZE = int(os.getenv("EMAILS_CACHE_SIZE", "0"))
 
     # OAuth files at repo root by default
     CREDENTIALS_FILE = os.getenv("GMAIL_CREDENTIALS", str(PROJECT_ROOT / ".credentials.json"))
@@ -22,8 +40,26 @@ class Config:
         "https://www.googleapis.com/auth/gmail.modify",
     ]
 
+    # Gmail API root; point at the offline fake server (gmail_helper.testing) for benchmarks
+    GMAIL_API_BASE_URL = os.getenv("GMAIL_API_BASE_URL") or None
+    GMAIL_AUTH_DISABLED = os.getenv("GMAIL_AUTH_DISABLED", "false").lower() == "true"
+
+    # Gmail quota (per-user units/second) and retry policy
+    GMAIL_QUOTA_UNITS_PER_SEC = float(os.getenv("GMAIL_QUOTA_UNITS_PER_SEC", "250"))
+    GMAIL_MAX_RETRIES = int(os.getenv("GMAIL_MAX_RETRIES", "5"))
+    GMAIL_BACKOFF_BASE = float(os.getenv("GMAIL_BACKOFF_BASE", "1.0"))
+    GMAIL_BACKOFF_MAX = float(os.getenv("GMAIL_BACKOFF_MAX", "32.0"))
+
+    # AsyncGmailClient
+    GMAIL_ASYNC_MAX_CONCURRENCY = int(os.getenv("GMAIL_ASYNC_MAX_CONCURRENCY", "100"))
+    GMAIL_HTTP2 = os.getenv("GMAIL_HTTP2", "true").lower() == "true"
+
     # Rules
     RULES_FILE = os.getenv("RULES_FILE", str(PROJECT_ROOT / "rules.json"))
+    # Evaluate whole-mailbox rule runs over a columnar snapshot (needs numpy, so off by default without it)
+    RULES_COLUMNAR = os.getenv("RULES_COLUMNAR", str(find_spec("numpy") is not None)).lower() == "true"
+    # Evaluate rule runs over large windows in SQL, in the store
+    RULES_PUSHDOWN = os.getenv("RULES_PUSHDOWN", "true").lower() == "true"
 
     # API
     API_HOST = os.getenv("API_HOST", "0.0.0.0")
@@ -31,6 +67,8 @@ class Config:
 
     # Worker
     FETCH_BATCH_SIZE = int(os.getenv("FETCH_BATCH_SIZE", "25"))
+    LIST_PAGE_SIZE = int(os.getenv("LIST_PAGE_SIZE", "100"))
+    FETCH_WORKERS = int(os.getenv("FETCH_WORKERS", "1"))
     DEFAULT_LABELS = ["INBOX"]
 
 
@@ -0,0 +1,90 @@
+import sys
+from collections.abc import Mapping
+from typing import Any, Iterator, Optional, Sequence, Union
+
+from gmail_helper.common.utils.dateutils import iso_to_epoch
+
+
+class EmailRecord(Mapping):
+    """
+    Immutable, slotted email row passed between ingest, store, rules and API.
+
+    Carries no per-instance __dict__, and sender/recipient are interned so the
+    handful of distinct addresses in a mailbox are shared across rows. It is
+    also a read-only Mapping, so code written against the old row dicts
+    (`email["id"]`, `email.get("sender")`, `Model(**email)`) keeps working.
+    """
+
+    __slots__ = (
+        "id",
+        "thread_id",
+        "sender",
+        "recipient",
+        "subject",
+        "snippet",
+        "received_datetime",
+        "received_ts",
+        "label_ids",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        thread_id: str = "",
+        sender: str = "",
+        recipient: str = "",
+        subject: str = "",
+        snippet: str = "",
+        received_datetime: str = "",
+        received_ts: Optional[int] = None,
+        label_ids: Union[str, Sequence[str]] = "",
+    ):
+        if not isinstance(label_ids, str):
+            label_ids = ",".join(label_ids)
+        if received_ts is None:
+            received_ts = iso_to_epoch(received_datetime) or 0
+        setattr_ = object.__setattr__
+        setattr_(self, "id", id)
+        setattr_(self, "thread_id", thread_id or "")
+        setattr_(self, "sender", sys.intern(sender or ""))
+        setattr_(self, "recipient", sys.intern(recipient or ""))
+        setattr_(self, "subject", subject or "")
+        setattr_(self, "snippet", snippet or "")
+        setattr_(self, "received_datetime", received_datetime or "")
+        setattr_(self, "received_ts", received_ts)
+        setattr_(self, "label_ids", label_ids or "")
+
+    @classmethod
+    def from_mapping(cls, data: Mapping) -> "EmailRecord":
+        """Build from any mapping with (a subset of) the record's keys; a missing received_ts is derived."""
+        if isinstance(data, EmailRecord):
+            return data
+        values = {k: data[k] for k in cls.__slots__ if data.get(k) is not None}
+        if not isinstance(values.get("received_ts"), int):
+            values.pop("received_ts", None)
+        return cls(**values)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, k) for k in self.__slots__)
+
+    # Read-only Mapping interface
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"EmailRecord(id={self.id!r}, sender={self.sender!r}, subject={self.subject!r})"
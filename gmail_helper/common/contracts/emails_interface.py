@@ -1,7 +1,75 @@
-from typing import Dict, List, Optional, Protocol
+from typing import (
+    AsyncIterator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Protocol,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.rules_contract import Rule
+
+
+class InsertResult(NamedTuple):
+    inserted: int
+    duplicates: int
+
+
+def encode_cursor(email: Mapping) -> str:
+    """Opaque keyset cursor pointing just past `email` in newest-first (received_ts, id) order."""
+    return "%d:%s" % (email["received_ts"], email["id"])
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    ts, sep, email_id = cursor.partition(":")
+    if not sep or not ts.lstrip("-").isdigit():
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return int(ts), email_id
 
 
 class EmailsInterface(Protocol):
-    def insert_email(self, email: Dict) -> None: ...
-    def get_last_n_emails(self, n: int) -> List[Dict]: ...
-    def get_email_by_id(self, email_id: str) -> Optional[Dict]: ...
+    def insert_email(self, email: Mapping) -> None: ...
+    def insert_emails(self, emails: Iterable[Mapping]) -> InsertResult: ...
+    def get_last_n_emails(self, n: int) -> List[EmailRecord]: ...
+    def iter_emails(self, before: Optional[str] = None, batch_size: int = 500) -> Iterator[EmailRecord]: ...
+    def get_emails_between(
+        self, since_ts: Optional[int] = None, until_ts: Optional[int] = None, limit: int = 100
+    ) -> List[EmailRecord]: ...
+    def get_email_by_id(self, email_id: str) -> Optional[EmailRecord]: ...
+    def search(
+        self, query: str, limit: int = 20, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[EmailRecord], Optional[str]]: ...
+    def search_ids(self, text: str, field: str, floor: Optional[Tuple[int, str]] = None) -> Set[str]: ...
+    def existing_ids(self, email_ids: Iterable[str]) -> Set[str]: ...
+    def delete_emails(self, email_ids: Iterable[str]) -> int: ...
+    def update_labels(self, email_id: str, label_ids: List[str]) -> None: ...
+    def get_history_id(self, account: str) -> Optional[str]: ...
+    def set_history_id(self, account: str, history_id: str) -> None: ...
+    def columnar_snapshot(self): ...
+    def count(self) -> int: ...
+    def window_floor(self, n: int) -> Optional[Tuple[int, str]]: ...
+    def rule_ids(self, rule: Rule, now: float, floor: Optional[Tuple[int, str]] = None) -> Optional[List[str]]: ...
+
+
+class AsyncEmailsInterface(Protocol):
+    """Awaitable counterpart of EmailsInterface for use from the event loop."""
+
+    async def insert_emails(self, emails: Iterable[Mapping]) -> InsertResult: ...
+    async def get_last_n_emails(self, n: int) -> List[EmailRecord]: ...
+    def iter_emails(self, before: Optional[str] = None, batch_size: int = 500) -> AsyncIterator[EmailRecord]: ...
+    async def get_emails_between(
+        self, since_ts: Optional[int] = None, until_ts: Optional[int] = None, limit: int = 100
+    ) -> List[EmailRecord]: ...
+    async def get_email_by_id(self, email_id: str) -> Optional[EmailRecord]: ...
+    async def search(
+        self, query: str, limit: int = 20, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[EmailRecord], Optional[str]]: ...
+    async def existing_ids(self, email_ids: Iterable[str]) -> Set[str]: ...
+    async def delete_emails(self, email_ids: Iterable[str]) -> int: ...
+    async def update_labels(self, email_id: str, label_ids: List[str]) -> None: ...
@@ -33,6 +33,15 @@ class DatePredicate(str, Enum):
 
 Predicate = Union[StringPredicate, DatePredicate]
 
+DAY_SECONDS = 86400
+# DatePredicate -> (days per unit, True for "less than").
+DATE_UNITS = {
+    DatePredicate.less_than_days: (1, True),
+    DatePredicate.greater_than_days: (1, False),
+    DatePredicate.less_than_months: (30, True),
+    DatePredicate.greater_than_months: (30, False),
+}
+
 
 class Condition(BaseModel):
     field: FieldName
@@ -0,0 +1,298 @@
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+import httpx
+from google.auth.transport.requests import Request
+
+from gmail_helper.common.services.gmail_service import (
+    HISTORY_TYPES,
+    LIST_FIELDS,
+    MAX_BATCH_MODIFY_IDS,
+    MAX_PAGE_SIZE,
+    METADATA_FIELDS,
+    METADATA_HEADERS,
+    HistoryExpiredError,
+    TransferStats,
+    load_credentials,
+)
+from gmail_helper.common.services.rate_limiter import RATE_LIMIT_REASONS, RateLimiter, quota_cost
+from gmail_helper.common.utils.logger import get_logger
+
+LOG = get_logger(__name__)
+
+GMAIL_API_BASE_URL = "https://gmail.googleapis.com"
+
+try:
+    import h2  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the httpx[http2] extra
+    HTTP2_AVAILABLE = False
+
+
+def _is_retryable_response(resp: httpx.Response) -> bool:
+    if resp.status_code == 429 or 500 <= resp.status_code < 600:
+        return True
+    if resp.status_code == 403:
+        return any(reason in resp.content for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+class AsyncGmailClient:
+    """
+    Asyncio counterpart of GmailClient on a shared httpx.AsyncClient.
+    Keeps one pooled keep-alive (HTTP/2 when available) connection set and caps
+    in-flight requests with a semaphore. Shares the quota-aware RateLimiter.
+    """
+
+    def __init__(
+        self,
+        credentials_file: str,
+        token_file: str,
+        scopes: List[str],
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = 5,
+        max_concurrency: int = 100,
+        http2: bool = True,
+        base_url: Optional[str] = None,
+        auth_disabled: bool = False,
+        credentials=None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.credentials_file = credentials_file
+        self.token_file = token_file
+        self.scopes = scopes
+        self.limiter = rate_limiter or RateLimiter(units_per_second=250)
+        self.max_retries = max_retries
+        self.transfer = TransferStats()
+        self.max_concurrency = max_concurrency
+        self.base_url = (base_url or GMAIL_API_BASE_URL).rstrip("/")
+        self.auth_disabled = auth_disabled
+        self._creds = credentials
+        self._creds_lock: Optional[asyncio.Lock] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        if http2 and not HTTP2_AVAILABLE:
+            LOG.warning("h2 is not installed, AsyncGmailClient falls back to HTTP/1.1")
+            http2 = False
+        self._http_kwargs = dict(
+            base_url=self.base_url,
+            http2=http2,
+            timeout=httpx.Timeout(30.0),
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency,
+            ),
+            transport=transport,
+        )
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def __aenter__(self) -> "AsyncGmailClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def _client(self) -> httpx.AsyncClient:
+        # Created lazily so the client binds to the running event loop.
+        if self._http is None:
+            self._http = httpx.AsyncClient(**self._http_kwargs)
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._creds_lock = asyncio.Lock()
+        return self._http
+
+    async def _token(self) -> str:
+        async with self._creds_lock:
+            if self._creds is None:
+                self._creds = await asyncio.to_thread(
+                    load_credentials, self.credentials_file, self.token_file, self.scopes
+                )
+            elif not self._creds.valid and getattr(self._creds, "refresh_token", None):
+                LOG.info("Refreshing Gmail token...")
+                await asyncio.to_thread(self._creds.refresh, Request())
+            return self._creds.token
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        quota_method: str,
+        user_id: str = "me",
+        params: Optional[Dict] = None,
+        json: Optional[Dict] = None,
+    ) -> Dict:
+        http = self._client()
+        url = f"/gmail/v1/users/{user_id}{path}"
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        units = quota_cost(quota_method)
+        attempt = 0
+        while True:
+            wait = self.limiter.reserve(units)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            async with self._semaphore:
+                headers = {} if self.auth_disabled else {"Authorization": f"Bearer {await self._token()}"}
+                resp = await http.request(method, url, params=params, json=json, headers=headers)
+            self.transfer.record(quota_method, len(resp.content))
+            if resp.is_success:
+                self.limiter.on_success()
+                return resp.json() if resp.content else {}
+            if not _is_retryable_response(resp) or attempt >= self.max_retries:
+                resp.raise_for_status()
+            self.limiter.on_throttle()
+            delay = self.limiter.backoff(attempt)
+            LOG.warning("%s failed with %s, retrying in %.2fs", quota_method, resp.status_code, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def transfer_stats(self) -> Dict:
+        return self.transfer.snapshot()
+
+    async def list_messages(
+        self,
+        user_id: str = "me",
+        label_ids: Optional[List[str]] = None,
+        max_results: Optional[int] = None,
+        query: Optional[str] = None,
+    ) -> List[Dict]:
+        msgs: List[Dict] = []
+        async for page in self.iter_messages(
+            label_ids=label_ids, query=query, max_results=max_results, user_id=user_id
+        ):
+            msgs.extend(page)
+        return msgs
+
+    async def iter_messages(
+        self,
+        label_ids: Optional[List[str]] = None,
+        query: Optional[str] = None,
+        page_size: int = MAX_PAGE_SIZE,
+        max_results: Optional[int] = None,
+        user_id: str = "me",
+    ) -> AsyncIterator[List[Dict]]:
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        remaining = max_results
+        page_token = None
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            res = await self._request(
+                "GET",
+                "/messages",
+                "messages.list",
+                user_id=user_id,
+                params={
+                    "labelIds": label_ids or [],
+                    "q": query,
+                    "maxResults": size,
+                    "pageToken": page_token,
+                    "fields": LIST_FIELDS,
+                },
+            )
+            page = res.get("messages", []) or []
+            if page:
+                yield page
+            if remaining is not None:
+                remaining -= len(page)
+            page_token = res.get("nextPageToken")
+            if not page_token or not page:
+                return
+
+    async def get_message_metadata(self, msg_id: str, user_id: str = "me") -> Dict:
+        return await self._request(
+            "GET",
+            f"/messages/{msg_id}",
+            "messages.get",
+            user_id=user_id,
+            params={"format": "metadata", "metadataHeaders": METADATA_HEADERS, "fields": METADATA_FIELDS},
+        )
+
+    async def get_messages_metadata(self, msg_ids: Iterable[str], user_id: str = "me") -> List[Dict]:
+        """Fetch many messages concurrently; failures are logged and skipped, order is kept."""
+        ids = list(dict.fromkeys(msg_ids))
+        results = await asyncio.gather(
+            *(self.get_message_metadata(i, user_id=user_id) for i in ids), return_exceptions=True
+        )
+        out = []
+        for msg_id, res in zip(ids, results):
+            if isinstance(res, Exception):
+                LOG.error("Failed to fetch metadata for %s: %s", msg_id, res)
+            else:
+                out.append(res)
+        return out
+
+    async def get_profile(self, user_id: str = "me") -> Dict:
+        return await self._request("GET", "/profile", "getProfile", user_id=user_id)
+
+    async def iter_history(
+        self,
+        start_history_id: str,
+        history_types: Optional[List[str]] = None,
+        user_id: str = "me",
+    ) -> AsyncIterator[Dict]:
+        page_token = None
+        while True:
+            try:
+                res = await self._request(
+                    "GET",
+                    "/history",
+                    "history.list",
+                    user_id=user_id,
+                    params={
+                        "startHistoryId": start_history_id,
+                        "historyTypes": history_types or HISTORY_TYPES,
+                        "pageToken": page_token,
+                    },
+                )
+            except httpx.HTTPStatusError as e:
+                if e.response.status_code == 404:
+                    raise HistoryExpiredError(start_history_id) from e
+                raise
+            yield res
+            page_token = res.get("nextPageToken")
+            if not page_token:
+                return
+
+    async def modify_message(
+        self,
+        msg_id: str,
+        user_id: str = "me",
+        add_label_ids: Optional[List[str]] = None,
+        remove_label_ids: Optional[List[str]] = None,
+    ) -> Dict:
+        body = {
+            "addLabelIds": add_label_ids or [],
+            "removeLabelIds": remove_label_ids or [],
+        }
+        return await self._request("POST", f"/messages/{msg_id}/modify", "messages.modify", user_id=user_id, json=body)
+
+    async def batch_modify(
+        self,
+        msg_ids: List[str],
+        user_id: str = "me",
+        add_label_ids: Optional[List[str]] = None,
+        remove_label_ids: Optional[List[str]] = None,
+    ) -> None:
+        if len(msg_ids) > MAX_BATCH_MODIFY_IDS:
+            raise ValueError("batchModify accepts at most %d ids, got %d" % (MAX_BATCH_MODIFY_IDS, len(msg_ids)))
+        body = {
+            "ids": list(msg_ids),
+            "addLabelIds": add_label_ids or [],
+            "removeLabelIds": remove_label_ids or [],
+        }
+        await self._request("POST", "/messages/batchModify", "messages.batchModify", user_id=user_id, json=body)
+
+    async def list_labels(self, user_id: str = "me") -> List[Dict]:
+        res = await self._request("GET", "/labels", "labels.list", user_id=user_id)
+        return res.get("labels", []) or []
+
+    async def create_label(self, name: str, user_id: str = "me") -> Dict:
+        body = {
+            "name": name,
+            "labelListVisibility": "labelShow",
+            "messageListVisibility": "show",
+        }
+        return await self._request("POST", "/labels", "labels.create", user_id=user_id, json=body)
@@ -1,15 +1,86 @@
 import os
-from typing import Dict, List, Optional
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urljoin
 
+from google.auth.credentials import AnonymousCredentials
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
 
+from gmail_helper.common.services.rate_limiter import RateLimiter, is_retryable, quota_cost
+from gmail_helper.common.utils.exceptions import Reason, ServiceException
 from gmail_helper.common.utils.logger import get_logger
 
 LOG = get_logger(__name__)
 
+# Gmail rejects batch requests with more than 100 inner calls.
+MAX_BATCH_SIZE = 100
+# users.messages.batchModify accepts at most 1000 ids per call.
+MAX_BATCH_MODIFY_IDS = 1000
+# messages.list returns at most 500 ids per page.
+MAX_PAGE_SIZE = 500
+HISTORY_TYPES = ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"]
+
+# Only the headers and fields the ingest mapping and rules read (From/To/Subject/Date,
+# labels and historyId); everything else (Received chains, DKIM, ...) is dropped server-side.
+METADATA_HEADERS = ["From", "To", "Subject", "Date"]
+METADATA_FIELDS = "id,threadId,labelIds,snippet,historyId,payload/headers"
+LIST_FIELDS = "messages(id,threadId),nextPageToken"
+
+
+class TransferStats:
+    """Thread-safe per-method counters of calls and response bytes received."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, method: str, nbytes: int) -> None:
+        with self._lock:
+            entry = self._stats.setdefault(method, {"calls": 0, "bytes": 0})
+            entry["calls"] += 1
+            entry["bytes"] += nbytes
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                method: dict(entry, avg_bytes=entry["bytes"] / entry["calls"] if entry["calls"] else 0)
+                for method, entry in self._stats.items()
+            }
+
+
+class HistoryExpiredError(ServiceException):
+    """Raised when a startHistoryId is too old for users.history.list (HTTP 404)."""
+
+    def __init__(self, history_id: str):
+        super().__init__(Reason.ENTITY_NOT_FOUND, "History id %s is no longer available" % history_id)
+        self.history_id = history_id
+
+
+def load_credentials(credentials_file: str, token_file: str, scopes: List[str]) -> Credentials:
+    """Load the cached OAuth token, refreshing it or running the consent flow when needed."""
+    creds = None
+    if os.path.exists(token_file):
+        creds = Credentials.from_authorized_user_file(token_file, scopes)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            LOG.info("Refreshing Gmail token...")
+            creds.refresh(Request())
+        else:
+            if not os.path.exists(credentials_file):
+                raise FileNotFoundError("Gmail credentials file not found at %s" % credentials_file)
+            LOG.info("Starting Gmail OAuth flow...")
+            flow = InstalledAppFlow.from_client_secrets_file(credentials_file, scopes)
+            creds = flow.run_local_server(port=0)
+        with open(token_file, "w") as f:
+            f.write(creds.to_json())
+    return creds
+
 
 class GmailClient:
     """
@@ -22,56 +93,276 @@ class GmailClient:
         credentials_file: str,
         token_file: str,
         scopes: list[str],
+        rate_limiter: Optional[RateLimiter] = None,
+        max_retries: int = 5,
+        base_url: Optional[str] = None,
+        auth_disabled: bool = False,
     ):
         self.credentials_file = credentials_file
         self.token_file = token_file
         self.scopes = scopes
-        self._service = None
+        self.limiter = rate_limiter or RateLimiter(units_per_second=250)
+        self.max_retries = max_retries
+        self.transfer = TransferStats()
+        # Alternate API root (e.g. the offline fake server); None means Google's endpoint.
+        self.base_url = base_url
+        self.auth_disabled = auth_disabled
+        self._local = threading.local()
+        self._creds = None
+        self._creds_lock = threading.Lock()
 
     def service(self):
-        """Return authenticated gmail service (lazy)."""
-        if self._service is None:
-            self._service = self._authenticate()
-        return self._service
+        """
+        Return authenticated gmail service (lazy), one per thread.
+        httplib2 connections are not thread-safe, so each thread builds its own
+        service on top of the shared credentials.
+        """
+        service = getattr(self._local, "service", None)
+        if service is None:
+            service = self._local.service = self._authenticate()
+        return service
 
     def _authenticate(self):
-        creds = None
-        if os.path.exists(self.token_file):
-            creds = Credentials.from_authorized_user_file(self.token_file, self.scopes)
-
-        if not creds or not creds.valid:
-            if creds and creds.expired and creds.refresh_token:
-                LOG.info("Refreshing Gmail token...")
-                creds.refresh(Request())
-            else:
-                if not os.path.exists(self.credentials_file):
-                    raise FileNotFoundError("Gmail credentials file not found at %s" % self.credentials_file)
-                LOG.info("Starting Gmail OAuth flow...")
-                flow = InstalledAppFlow.from_client_secrets_file(self.credentials_file, self.scopes)
-                creds = flow.run_local_server(port=0)
-            with open(self.token_file, "w") as f:
-                f.write(creds.to_json())
+        with self._creds_lock:
+            if self._creds is None and self.auth_disabled:
+                self._creds = AnonymousCredentials()
+            elif self._creds is None:
+                self._creds = load_credentials(self.credentials_file, self.token_file, self.scopes)
+                LOG.info("Gmail auth OK")
+        client_options = {"api_endpoint": self.base_url} if self.base_url else None
+        return build("gmail", "v1", credentials=self._creds, client_options=client_options)
 
-        LOG.info("Gmail auth OK")
-        return build("gmail", "v1", credentials=creds)
+    def _new_batch(self, service, callback):
+        if self.base_url:
+            # new_batch_http_request() always targets the discovery rootUrl.
+            return BatchHttpRequest(callback=callback, batch_uri=urljoin(self.base_url, "batch/gmail/v1"))
+        return service.new_batch_http_request(callback=callback)
+
+    def _execute(self, request, method: str, units: Optional[int] = None):
+        """
+        Execute a googleapiclient request through the shared rate limiter,
+        retrying 429/5xx/rateLimitExceeded with exponential backoff and jitter.
+        """
+        units = quota_cost(method) if units is None else units
+        self._track_bytes(request, method)
+        attempt = 0
+        while True:
+            self.limiter.acquire(units)
+            try:
+                res = request.execute()
+            except HttpError as e:
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                self.limiter.on_throttle()
+                delay = self.limiter.backoff(attempt)
+                LOG.warning("%s failed with %s, retrying in %.2fs", method, e.resp.status, delay)
+                self.limiter.sleep(delay)
+                attempt += 1
+                continue
+            self.limiter.on_success()
+            return res
+
+    def _track_bytes(self, request, method: str):
+        """Count raw response bytes by wrapping the request's postproc (also called per item in batches)."""
+        postproc = request.postproc
+
+        def _counting_postproc(resp, content):
+            self.transfer.record(method, len(content or b""))
+            return postproc(resp, content)
+
+        request.postproc = _counting_postproc
+        return request
+
+    def rate_limit_stats(self) -> Dict:
+        return self.limiter.stats()
+
+    def transfer_stats(self) -> Dict:
+        return self.transfer.snapshot()
 
     def list_messages(
         self,
         user_id: str = "me",
         label_ids: Optional[List[str]] = None,
         max_results: Optional[int] = None,
+        query: Optional[str] = None,
     ) -> List[Dict]:
-        res = (
-            self.service()
-            .users()
+        msgs: List[Dict] = []
+        for page in self.iter_messages(
+            label_ids=label_ids,
+            query=query,
+            max_results=max_results,
+            user_id=user_id,
+        ):
+            msgs.extend(page)
+        return msgs
+
+    def iter_messages(
+        self,
+        label_ids: Optional[List[str]] = None,
+        query: Optional[str] = None,
+        page_size: int = MAX_PAGE_SIZE,
+        max_results: Optional[int] = None,
+        user_id: str = "me",
+    ) -> Iterator[List[Dict]]:
+        """
+        Stream message ids page by page, following nextPageToken.
+        Only one page is held in memory at a time; the next page is requested
+        lazily, once the caller has consumed the current one.
+        """
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        remaining = max_results
+        page_token = None
+        while remaining is None or remaining > 0:
+            size = page_size if remaining is None else min(page_size, remaining)
+            res = self._execute(
+                self.service()
+                .users()
+                .messages()
+                .list(
+                    userId=user_id,
+                    labelIds=label_ids or [],
+                    q=query,
+                    maxResults=size,
+                    pageToken=page_token,
+                    fields=LIST_FIELDS,
+                ),
+                "messages.list",
+            )
+            page = res.get("messages", []) or []
+            if page:
+                yield page
+            if remaining is not None:
+                remaining -= len(page)
+            page_token = res.get("nextPageToken")
+            if not page_token or not page:
+                return
+
+    def get_message_metadata(self, msg_id: str, user_id: str = "me") -> Dict:
+        return self._execute(
+            self._metadata_request(self.service(), msg_id, user_id),
+            "messages.get",
+        )
+
+    @staticmethod
+    def _metadata_request(service, msg_id: str, user_id: str):
+        return (
+            service.users()
             .messages()
-            .list(userId=user_id, labelIds=label_ids or [], maxResults=max_results)
-            .execute()
+            .get(
+                userId=user_id,
+                id=msg_id,
+                format="metadata",
+                metadataHeaders=METADATA_HEADERS,
+                fields=METADATA_FIELDS,
+            )
         )
-        return res.get("messages", []) or []
 
-    def get_message_metadata(self, msg_id: str, user_id: str = "me") -> Dict:
-        return self.service().users().messages().get(userId=user_id, id=msg_id, format="metadata").execute()
+    def get_messages_metadata(
+        self,
+        msg_ids: Iterable[str],
+        user_id: str = "me",
+        batch_size: int = MAX_BATCH_SIZE,
+        max_retries: int = 3,
+    ) -> List[Dict]:
+        """
+        Fetch metadata for many messages using Gmail batch HTTP requests.
+        Items that fail with a retryable status are re-sent in a follow-up batch;
+        permanent failures are logged and skipped. Results keep the input order.
+        """
+        ids = list(dict.fromkeys(msg_ids))
+        batch_size = max(1, min(batch_size, MAX_BATCH_SIZE))
+        results: Dict[str, Dict] = {}
+
+        pending = ids
+        attempt = 0
+        while pending:
+            retry: List[str] = []
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start : start + batch_size]
+                retry.extend(self._batch_get_metadata(chunk, user_id, results))
+
+            attempt += 1
+            if retry and attempt > max_retries:
+                LOG.error("Giving up on %d messages after %d attempts", len(retry), attempt)
+                break
+            if retry:
+                self.limiter.on_throttle()
+                delay = self.limiter.backoff(attempt - 1)
+                LOG.warning("Retrying %d messages in %.2fs (attempt %d)", len(retry), delay, attempt + 1)
+                self.limiter.sleep(delay)
+            pending = retry
+
+        return [results[i] for i in ids if i in results]
+
+    def _batch_get_metadata(self, msg_ids: List[str], user_id: str, results: Dict[str, Dict]) -> List[str]:
+        """Send one batch of messages.get calls. Returns the ids worth retrying."""
+        retry: List[str] = []
+
+        def _callback(request_id, response, exception):
+            if exception is None:
+                results[request_id] = response
+                return
+            if is_retryable(exception):
+                retry.append(request_id)
+            else:
+                LOG.error("Failed to fetch metadata for %s: %s", request_id, exception)
+
+        service = self.service()
+        batch = self._new_batch(service, _callback)
+        for msg_id in msg_ids:
+            batch.add(
+                self._track_bytes(self._metadata_request(service, msg_id, user_id), "messages.get"),
+                request_id=msg_id,
+            )
+        self.limiter.acquire(quota_cost("messages.get", len(msg_ids)))
+        try:
+            batch.execute()
+        except HttpError as e:
+            if not is_retryable(e):
+                raise
+            LOG.warning("Batch request failed with %s, will retry", e.resp.status)
+            return [i for i in msg_ids if i not in results]
+        if not retry:
+            self.limiter.on_success()
+        return retry
+
+    def get_profile(self, user_id: str = "me") -> Dict:
+        return self._execute(self.service().users().getProfile(userId=user_id), "getProfile")
+
+    def iter_history(
+        self,
+        start_history_id: str,
+        history_types: Optional[List[str]] = None,
+        user_id: str = "me",
+    ) -> Iterator[Dict]:
+        """
+        Stream users.history.list pages starting after start_history_id.
+        Each yielded page carries the mailbox's current historyId.
+        Raises HistoryExpiredError when the start id has aged out.
+        """
+        page_token = None
+        while True:
+            try:
+                res = self._execute(
+                    self.service()
+                    .users()
+                    .history()
+                    .list(
+                        userId=user_id,
+                        startHistoryId=start_history_id,
+                        historyTypes=history_types or HISTORY_TYPES,
+                        pageToken=page_token,
+                    ),
+                    "history.list",
+                )
+            except HttpError as e:
+                if e.resp.status == 404:
+                    raise HistoryExpiredError(start_history_id) from e
+                raise
+            yield res
+            page_token = res.get("nextPageToken")
+            if not page_token:
+                return
 
     def modify_message(
         self,
@@ -84,10 +375,32 @@ class GmailClient:
             "addLabelIds": add_label_ids or [],
             "removeLabelIds": remove_label_ids or [],
         }
-        return self.service().users().messages().modify(userId=user_id, id=msg_id, body=body).execute()
+        return self._execute(
+            self.service().users().messages().modify(userId=user_id, id=msg_id, body=body),
+            "messages.modify",
+        )
+
+    def batch_modify(
+        self,
+        msg_ids: List[str],
+        user_id: str = "me",
+        add_label_ids: Optional[List[str]] = None,
+        remove_label_ids: Optional[List[str]] = None,
+    ) -> None:
+        if len(msg_ids) > MAX_BATCH_MODIFY_IDS:
+            raise ValueError("batchModify accepts at most %d ids, got %d" % (MAX_BATCH_MODIFY_IDS, len(msg_ids)))
+        body = {
+            "ids": list(msg_ids),
+            "addLabelIds": add_label_ids or [],
+            "removeLabelIds": remove_label_ids or [],
+        }
+        self._execute(
+            self.service().users().messages().batchModify(userId=user_id, body=body),
+            "messages.batchModify",
+        )
 
     def list_labels(self, user_id: str = "me") -> List[Dict]:
-        res = self.service().users().labels().list(userId=user_id).execute()
+        res = self._execute(self.service().users().labels().list(userId=user_id), "labels.list")
         return res.get("labels", []) or []
 
     def create_label(self, name: str, user_id: str = "me") -> Dict:
@@ -96,4 +409,7 @@ class GmailClient:
             "labelListVisibility": "labelShow",
             "messageListVisibility": "show",
         }
-        return self.service().users().labels().create(userId=user_id, body=body).execute()
+        return self._execute(
+            self.service().users().labels().create(userId=user_id, body=body),
+            "labels.create",
+        )
@@ -0,0 +1,143 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from googleapiclient.errors import HttpError
+
+from gmail_helper.common.utils.logger import get_logger
+
+LOG = get_logger(__name__)
+
+# Gmail API quota units charged per method.
+# https://developers.google.com/gmail/api/reference/quota
+QUOTA_UNITS: Dict[str, int] = {
+    "getProfile": 1,
+    "history.list": 2,
+    "labels.create": 5,
+    "labels.list": 1,
+    "messages.batchModify": 50,
+    "messages.get": 5,
+    "messages.list": 5,
+    "messages.modify": 5,
+}
+DEFAULT_COST = 5
+
+RATE_LIMIT_REASONS = (b"rateLimitExceeded", b"userRateLimitExceeded")
+
+
+def quota_cost(method: str, count: int = 1) -> int:
+    return QUOTA_UNITS.get(method, DEFAULT_COST) * count
+
+
+def is_retryable(error: Exception) -> bool:
+    """429, 5xx and 403 rateLimitExceeded are worth retrying; everything else is not."""
+    if not isinstance(error, HttpError):
+        return False
+    status = error.resp.status
+    if status == 429 or 500 <= status < 600:
+        return True
+    if status == 403:
+        content = error.content or b""
+        return any(reason in content for reason in RATE_LIMIT_REASONS)
+    return False
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket measured in Gmail quota units.
+
+    The refill rate adapts: it is halved every time Gmail throttles us and
+    creeps back towards the configured maximum on each success, so sustained
+    throughput settles just under quota instead of collapsing into retries.
+    """
+
+    def __init__(
+        self,
+        units_per_second: float,
+        burst: Optional[float] = None,
+        min_units_per_second: Optional[float] = None,
+        backoff_base: float = 1.0,
+        backoff_max: float = 32.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.max_rate = float(units_per_second)
+        self.min_rate = float(min_units_per_second if min_units_per_second is not None else self.max_rate / 10)
+        self.rate = self.max_rate
+        self.capacity = float(burst if burst is not None else units_per_second)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._tokens = self.capacity
+        self._last = clock()
+        self._last_throttle: Optional[float] = None
+
+        self.waits = 0
+        self.waited_seconds = 0.0
+        self.throttled = 0
+        self.retries = 0
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def reserve(self, units: float) -> float:
+        """Take `units` from the bucket and return how long the caller must wait before using them."""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens -= units
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if wait > 0:
+                self.waits += 1
+                self.waited_seconds += wait
+            return wait
+
+    def acquire(self, units: float) -> None:
+        wait = self.reserve(units)
+        if wait > 0:
+            self._sleep(wait)
+
+    def sleep(self, seconds: float) -> None:
+        self._sleep(seconds)
+
+    def on_success(self) -> None:
+        if self.rate < self.max_rate:
+            with self._lock:
+                self._refill(self._clock())
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def on_throttle(self) -> None:
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            self.throttled += 1
+            # Concurrent callers often get throttled together; halve at most once per second.
+            if self._last_throttle is not None and now - self._last_throttle < 1.0:
+                return
+            self._last_throttle = now
+            self.rate = max(self.min_rate, self.rate / 2)
+        LOG.warning("Gmail throttled request, limiter rate now %.1f units/s", self.rate)
+
+    def backoff(self, attempt: int) -> float:
+        """Exponential backoff with full jitter for the given (0-based) retry attempt."""
+        self.retries += 1
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2**attempt)))
+
+    def current_wait(self) -> float:
+        with self._lock:
+            self._refill(self._clock())
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate": self.rate,
+            "max_rate": self.max_rate,
+            "current_wait": self.current_wait(),
+            "waits": self.waits,
+            "waited_seconds": self.waited_seconds,
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
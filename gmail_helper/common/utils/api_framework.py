@@ -325,8 +325,17 @@ def check_compatibility(route: dict, attribute_name: str):
 
 
 def _create_wrapper(func, self_factory):
-    def wrapper(*args, **kwargs):
-        return getattr(self_factory(), func.__name__)(*args, **kwargs)
+    # FastAPI runs plain functions in its threadpool and awaits coroutine functions on the
+    # event loop, so the wrapper has to keep the controller method's kind.
+    if inspect.iscoroutinefunction(func):
+
+        async def wrapper(*args, **kwargs):
+            return await getattr(self_factory(), func.__name__)(*args, **kwargs)
+
+    else:
+
+        def wrapper(*args, **kwargs):
+            return getattr(self_factory(), func.__name__)(*args, **kwargs)
 
     functools.update_wrapper(wrapper, func)
     signature = inspect.signature(func)
@@ -1,5 +1,6 @@
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
+from typing import Optional
 
 
 def to_utc_iso(dt) -> str:
@@ -18,3 +19,14 @@ def parse_rfc2822_to_iso(date_header: str) -> str:
         return to_utc_iso(dt)
     except Exception:
         return to_utc_iso(datetime.utcnow())
+
+
+def iso_to_epoch(value: str) -> Optional[int]:
+    """ISO8601 string (naive means UTC, trailing 'Z' allowed) to epoch seconds; None if unparseable."""
+    try:
+        dt = datetime.fromisoformat((value or "").replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
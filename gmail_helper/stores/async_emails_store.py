@@ -0,0 +1,91 @@
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+
+from gmail_helper.common.config import config
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.emails_interface import (
+    AsyncEmailsInterface,
+    EmailsInterface,
+    InsertResult,
+    encode_cursor,
+)
+
+
+class AsyncEmailsStore(AsyncEmailsInterface):
+    """
+    AsyncEmailsInterface over a blocking EmailsInterface such as EmailsStore.
+
+    Calls run on executors owned by this store rather than the event loop's
+    default one: `max_readers` reader threads, each of which keeps its own
+    pooled SQLite read connection (see SQLitePool.reader), and a single writer
+    thread, since SQLite serialises writes anyway. Awaiting a query therefore
+    never blocks the loop, and a burst of slow writes cannot starve reads.
+    """
+
+    def __init__(self, store: EmailsInterface, max_readers: int = config.DB_READ_WORKERS):
+        self.store = store
+        self._readers = ThreadPoolExecutor(max_workers=max_readers, thread_name_prefix="emails-read")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="emails-write")
+
+    async def _run(self, executor: ThreadPoolExecutor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+    def _read(self, func, *args, **kwargs):
+        return self._run(self._readers, func, *args, **kwargs)
+
+    def _write(self, func, *args, **kwargs):
+        return self._run(self._writer, func, *args, **kwargs)
+
+    async def insert_emails(self, emails: Iterable[Mapping]) -> InsertResult:
+        return await self._write(self.store.insert_emails, list(emails))
+
+    async def delete_emails(self, email_ids: Iterable[str]) -> int:
+        return await self._write(self.store.delete_emails, list(email_ids))
+
+    async def update_labels(self, email_id: str, label_ids: List[str]) -> None:
+        await self._write(self.store.update_labels, email_id, label_ids)
+
+    async def get_last_n_emails(self, n: int) -> List[EmailRecord]:
+        return await self._read(self.store.get_last_n_emails, n)
+
+    async def iter_emails(self, before: Optional[str] = None, batch_size: int = 500) -> AsyncIterator[EmailRecord]:
+        """
+        Newest-first stream like EmailsInterface.iter_emails. Each batch is a
+        separate keyset query, so no cursor is held open between awaits.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        while True:
+            page = await self._read(self._page, before, batch_size)
+            for record in page:
+                yield record
+            if len(page) < batch_size:
+                return
+            before = encode_cursor(page[-1])
+
+    def _page(self, before: Optional[str], batch_size: int) -> List[EmailRecord]:
+        return list(itertools.islice(self.store.iter_emails(before=before, batch_size=batch_size), batch_size))
+
+    async def get_emails_between(
+        self, since_ts: Optional[int] = None, until_ts: Optional[int] = None, limit: int = 100
+    ) -> List[EmailRecord]:
+        return await self._read(self.store.get_emails_between, since_ts=since_ts, until_ts=until_ts, limit=limit)
+
+    async def get_email_by_id(self, email_id: str) -> Optional[EmailRecord]:
+        return await self._read(self.store.get_email_by_id, email_id)
+
+    async def search(
+        self, query: str, limit: int = 20, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[EmailRecord], Optional[str]]:
+        return await self._read(self.store.search, query, limit=limit, cursor=cursor, fields=fields)
+
+    async def existing_ids(self, email_ids: Iterable[str]) -> Set[str]:
+        return await self._read(self.store.existing_ids, list(email_ids))
+
+    def close(self) -> None:
+        self._readers.shutdown(wait=True)
+        self._writer.shutdown(wait=True)
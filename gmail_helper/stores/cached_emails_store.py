@@ -0,0 +1,143 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.emails_interface import EmailsInterface, InsertResult
+from gmail_helper.common.contracts.rules_contract import Rule
+
+_MISSING = object()
+
+
+def _copy(row: Optional[Mapping]) -> Optional[Mapping]:
+    # EmailRecords are immutable and safe to share; plain dicts from other stores are copied.
+    return row if row is None or isinstance(row, EmailRecord) else dict(row)
+
+
+class CachedEmailsStore(EmailsInterface):
+    """
+    Read-through LRU cache for get_email_by_id in front of any EmailsInterface.
+    Writes made through this wrapper invalidate the affected ids; rows changed
+    by another process stay cached until evicted.
+    """
+
+    def __init__(self, store: EmailsInterface, max_size: int = 1024):
+        self.store = store
+        self.max_size = max_size
+        self._cache: "OrderedDict[str, Optional[Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by every invalidation so a lookup racing a write does not cache a stale row.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getattr__(self, name):
+        # Anything outside EmailsInterface (close, ...) goes straight to the wrapped store.
+        return getattr(self.store, name)
+
+    def get_email_by_id(self, email_id: str) -> Optional[EmailRecord]:
+        with self._lock:
+            row = self._cache.get(email_id, _MISSING)
+            if row is not _MISSING:
+                self._cache.move_to_end(email_id)
+                self.hits += 1
+                return _copy(row)
+            self.misses += 1
+            generation = self._generation
+
+        row = self.store.get_email_by_id(email_id)
+        with self._lock:
+            if generation != self._generation:
+                return row
+            self._cache[email_id] = _copy(row)
+            self._cache.move_to_end(email_id)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return row
+
+    def invalidate(self, email_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for email_id in email_ids:
+                self._cache.pop(email_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._cache.clear()
+
+    def cache_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._cache),
+                "max_size": self.max_size,
+            }
+
+    # Writes: delegate, then drop the ids they touched.
+
+    def insert_email(self, email: Mapping) -> None:
+        self.store.insert_email(email)
+        self.invalidate([email["id"]])
+
+    def insert_emails(self, emails: Iterable[Mapping]) -> InsertResult:
+        emails = list(emails)
+        result = self.store.insert_emails(emails)
+        self.invalidate(e["id"] for e in emails)
+        return result
+
+    def delete_emails(self, email_ids: Iterable[str]) -> int:
+        email_ids = list(email_ids)
+        removed = self.store.delete_emails(email_ids)
+        self.invalidate(email_ids)
+        return removed
+
+    def update_labels(self, email_id: str, label_ids: List[str]) -> None:
+        self.store.update_labels(email_id, label_ids)
+        self.invalidate([email_id])
+
+    # Everything else is passed through uncached.
+
+    def get_last_n_emails(self, n: int) -> List[EmailRecord]:
+        return self.store.get_last_n_emails(n)
+
+    def iter_emails(self, before: Optional[str] = None, batch_size: int = 500) -> Iterator[EmailRecord]:
+        return self.store.iter_emails(before=before, batch_size=batch_size)
+
+    def get_emails_between(
+        self, since_ts: Optional[int] = None, until_ts: Optional[int] = None, limit: int = 100
+    ) -> List[EmailRecord]:
+        return self.store.get_emails_between(since_ts=since_ts, until_ts=until_ts, limit=limit)
+
+    def search(
+        self, query: str, limit: int = 20, cursor: Optional[str] = None, fields: Optional[Sequence[str]] = None
+    ) -> Tuple[List[EmailRecord], Optional[str]]:
+        return self.store.search(query, limit=limit, cursor=cursor, fields=fields)
+
+    def search_ids(self, text: str, field: str, floor: Optional[Tuple[int, str]] = None) -> Set[str]:
+        return self.store.search_ids(text, field, floor=floor)
+
+    def existing_ids(self, email_ids: Iterable[str]) -> Set[str]:
+        return self.store.existing_ids(email_ids)
+
+    def get_history_id(self, account: str) -> Optional[str]:
+        return self.store.get_history_id(account)
+
+    def set_history_id(self, account: str, history_id: str) -> None:
+        self.store.set_history_id(account, history_id)
+
+    def columnar_snapshot(self):
+        return self.store.columnar_snapshot()
+
+    def count(self) -> int:
+        return self.store.count()
+
+    def window_floor(self, n: int) -> Optional[Tuple[int, str]]:
+        return self.store.window_floor(n)
+
+    def rule_ids(self, rule: Rule, now: float, floor: Optional[Tuple[int, str]] = None) -> Optional[List[str]]:
+        return self.store.rule_ids(rule, now, floor=floor)
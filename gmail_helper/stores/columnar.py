@@ -0,0 +1,175 @@
+from itertools import islice
+from typing import Dict, Iterable, List, Mapping
+
+try:
+    import numpy as np
+
+    NUMPY_AVAILABLE = True
+except ImportError:  # pragma: no cover - numpy is an optional dependency
+    np = None
+    NUMPY_AVAILABLE = False
+
+# Low-cardinality columns stored as int32 codes into a table of distinct values.
+ENCODED_COLUMNS = ("sender", "recipient")
+# Free-text columns stored as plain lowercased strings.
+TEXT_COLUMNS = ("subject", "snippet")
+
+
+class _NumpyColumn:
+    """Append-only NumPy buffer with amortised doubling."""
+
+    def __init__(self, dtype, capacity: int = 1024):
+        self._data = np.empty(capacity, dtype=dtype)
+        self.size = 0
+
+    def extend(self, values: List[int]) -> None:
+        needed = self.size + len(values)
+        if needed > len(self._data):
+            grown = np.empty(max(needed, 2 * len(self._data)), dtype=self._data.dtype)
+            grown[: self.size] = self._data[: self.size]
+            # Older snapshots keep their view of the previous buffer, which is never written again.
+            self._data = grown
+        self._data[self.size : needed] = values
+        self.size = needed
+
+    def view(self) -> "np.ndarray":
+        return self._data[: self.size]
+
+
+class ColumnarBuilder:
+    """
+    Incrementally built, column-oriented copy of the emails table.
+    Rows are only ever appended, so every snapshot() stays valid while more rows
+    arrive; EmailsStore starts a fresh builder when rows are deleted.
+    """
+
+    def __init__(self):
+        if not NUMPY_AVAILABLE:
+            raise ImportError("ColumnarBuilder requires numpy")
+        self.ids: List[str] = []
+        self.last_rowid = 0
+        self._values: Dict[str, List[str]] = {c: [] for c in ENCODED_COLUMNS}
+        self._codes_by_value: Dict[str, Dict[str, int]] = {c: {} for c in ENCODED_COLUMNS}
+        self._codes: Dict[str, _NumpyColumn] = {c: _NumpyColumn(np.int32) for c in ENCODED_COLUMNS}
+        self._text: Dict[str, List[str]] = {c: [] for c in TEXT_COLUMNS}
+        self._ts = _NumpyColumn(np.int64)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def append(self, rows: Iterable[Mapping]) -> None:
+        """Append rows with rowid, id, sender, recipient, subject, snippet and received_ts."""
+        rows = list(rows)
+        if not rows:
+            return
+        for column in ENCODED_COLUMNS:
+            values, codes_by_value = self._values[column], self._codes_by_value[column]
+            codes = []
+            for row in rows:
+                value = (row[column] or "").lower()
+                code = codes_by_value.get(value)
+                if code is None:
+                    code = codes_by_value[value] = len(values)
+                    values.append(value)
+                codes.append(code)
+            self._codes[column].extend(codes)
+        for column in TEXT_COLUMNS:
+            self._text[column].extend((row[column] or "").lower() for row in rows)
+        self._ts.extend([row["received_ts"] or 0 for row in rows])
+        self.ids.extend(row["id"] for row in rows)
+        self.last_rowid = rows[-1]["rowid"]
+
+    def snapshot(self) -> "ColumnarSnapshot":
+        return ColumnarSnapshot(
+            ids=self.ids,
+            size=len(self.ids),
+            values={c: self._values[c][:] for c in ENCODED_COLUMNS},
+            codes={c: self._codes[c].view() for c in ENCODED_COLUMNS},
+            text=self._text,
+            received_ts=self._ts.view(),
+        )
+
+
+class ColumnarSnapshot:
+    """
+    Read-only view of the first `size` rows of a ColumnarBuilder.
+    Predicates are evaluated over whole columns and return boolean NumPy masks;
+    string comparisons are case-insensitive like the rules engine.
+    """
+
+    def __init__(
+        self,
+        ids: List[str],
+        size: int,
+        values: Dict[str, List[str]],
+        codes: Dict[str, "np.ndarray"],
+        text: Dict[str, List[str]],
+        received_ts: "np.ndarray",
+    ):
+        self._ids = ids
+        self.size = size
+        self._values = values
+        self._codes = codes
+        self._text = text
+        self.received_ts = received_ts
+
+    @classmethod
+    def concat(cls, snapshots: List["ColumnarSnapshot"]) -> "ColumnarSnapshot":
+        """One snapshot over the rows of several (e.g. one per storage partition), in the given order."""
+        if len(snapshots) == 1:
+            return snapshots[0]
+        values: Dict[str, List[str]] = {}
+        codes: Dict[str, "np.ndarray"] = {}
+        for column in ENCODED_COLUMNS:
+            merged: List[str] = []
+            codes_by_value: Dict[str, int] = {}
+            remapped = []
+            for snap in snapshots:
+                # Translate this snapshot's codes into the merged value table.
+                table = np.fromiter(
+                    (codes_by_value.setdefault(v, len(codes_by_value)) for v in snap._values[column]),
+                    np.int32,
+                    len(snap._values[column]),
+                )
+                remapped.append(table[snap._codes[column]])
+            merged.extend(codes_by_value)
+            values[column] = merged
+            codes[column] = np.concatenate(remapped) if remapped else np.empty(0, np.int32)
+        return cls(
+            ids=[i for snap in snapshots for i in islice(snap._ids, snap.size)],
+            size=sum(snap.size for snap in snapshots),
+            values=values,
+            codes=codes,
+            text={c: [v for snap in snapshots for v in islice(snap._text[c], snap.size)] for c in TEXT_COLUMNS},
+            received_ts=(
+                np.concatenate([snap.received_ts for snap in snapshots]) if snapshots else np.empty(0, np.int64)
+            ),
+        )
+
+    def __len__(self) -> int:
+        return self.size
+
+    def ids_for(self, mask: "np.ndarray") -> List[str]:
+        return [self._ids[i] for i in np.flatnonzero(mask)]
+
+    def contains(self, column: str, text: str) -> "np.ndarray":
+        text = text.lower()
+        if column in self._codes:
+            table = self._value_mask(column, lambda v: text in v)
+            return table[self._codes[column]]
+        return np.fromiter((text in v for v in islice(self._text[column], self.size)), bool, self.size)
+
+    def equals(self, column: str, text: str) -> "np.ndarray":
+        text = text.lower()
+        if column in self._codes:
+            table = self._value_mask(column, lambda v: v == text)
+            return table[self._codes[column]]
+        return np.fromiter((v == text for v in islice(self._text[column], self.size)), bool, self.size)
+
+    def constant(self, value: bool) -> "np.ndarray":
+        return np.full(self.size, value, dtype=bool)
+
+    def _value_mask(self, column: str, test) -> "np.ndarray":
+        # One check per distinct value, then broadcast to rows through the codes.
+        values = self._values[column]
+        return np.fromiter((test(v) for v in values), bool, len(values))
@@ -1,10 +1,21 @@
-import sqlite3
-from contextlib import contextmanager
-from typing import Dict, List, Optional
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
 
 from gmail_helper.common.config import config
-from gmail_helper.common.contracts.emails_interface import EmailsInterface
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.emails_interface import (
+    EmailsInterface,
+    InsertResult,
+    decode_cursor,
+    encode_cursor,
+)
+from gmail_helper.common.contracts.rules_contract import Rule
+from gmail_helper.common.utils.dateutils import iso_to_epoch
 from gmail_helper.common.utils.logger import get_logger
+from gmail_helper.stores.columnar import ColumnarBuilder, ColumnarSnapshot
+from gmail_helper.stores.rule_sql import like_pattern, rule_where
+from gmail_helper.stores.sqlite_pool import SQLitePool
 
 LOG = get_logger(__name__)
 
@@ -12,7 +23,8 @@ LOG = get_logger(__name__)
 class EmailsStore(EmailsInterface):
     """
     SQLite implementation of EmailsInterface.
-    Returns dictionaries for easy API serialization.
+    Returns EmailRecords (read-only mappings) for easy API serialization. Writes go
+    through one long-lived writer connection, reads through per-thread readers (see SQLitePool).
     """
 
     CREATE_SQL = """
@@ -26,42 +38,388 @@ class EmailsStore(EmailsInterface):
     );
     """
 
+    # Schema migrations, applied in order and tracked with PRAGMA user_version.
+    MIGRATIONS = [
+        CREATE_SQL,
+        """
+        ALTER TABLE emails ADD COLUMN label_ids TEXT DEFAULT '';
+        CREATE TABLE IF NOT EXISTS sync_state (
+            account TEXT PRIMARY KEY,
+            history_id TEXT NOT NULL,
+            updated_at TEXT
+        );
+        """,
+        "ALTER TABLE emails ADD COLUMN recipient TEXT DEFAULT '';",
+        # Epoch seconds mirror of received_datetime; filled by _backfill_received_ts.
+        """
+        ALTER TABLE emails ADD COLUMN received_ts INTEGER;
+        CREATE INDEX IF NOT EXISTS idx_emails_received_ts ON emails (received_ts, id);
+        """,
+        # Trigram full-text index over the searchable columns, kept in sync by triggers.
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+            sender, recipient, subject, snippet,
+            content='emails', content_rowid='rowid', tokenize='trigram'
+        );
+        CREATE TRIGGER IF NOT EXISTS emails_fts_ai AFTER INSERT ON emails BEGIN
+            INSERT INTO emails_fts (rowid, sender, recipient, subject, snippet)
+            VALUES (new.rowid, new.sender, new.recipient, new.subject, new.snippet);
+        END;
+        CREATE TRIGGER IF NOT EXISTS emails_fts_ad AFTER DELETE ON emails BEGIN
+            INSERT INTO emails_fts (emails_fts, rowid, sender, recipient, subject, snippet)
+            VALUES ('delete', old.rowid, old.sender, old.recipient, old.subject, old.snippet);
+        END;
+        CREATE TRIGGER IF NOT EXISTS emails_fts_au AFTER UPDATE OF sender, recipient, subject, snippet ON emails BEGIN
+            INSERT INTO emails_fts (emails_fts, rowid, sender, recipient, subject, snippet)
+            VALUES ('delete', old.rowid, old.sender, old.recipient, old.subject, old.snippet);
+            INSERT INTO emails_fts (rowid, sender, recipient, subject, snippet)
+            VALUES (new.rowid, new.sender, new.recipient, new.subject, new.snippet);
+        END;
+        INSERT INTO emails_fts (emails_fts) VALUES ('rebuild');
+        """,
+        # Rules compare senders case-insensitively (see rule_sql.condition_sql).
+        "CREATE INDEX IF NOT EXISTS idx_emails_sender_lower ON emails (lower(sender));",
+    ]
+
+    # Same order as EmailRecord's fields, so rows selected with SELECT_SQL map positionally.
+    COLUMNS = EmailRecord.__slots__
+    SELECT_SQL = "SELECT " + ", ".join(COLUMNS) + " FROM emails"
+
     UPSERT_SQL = """
-    INSERT OR IGNORE INTO emails (id, thread_id, sender, subject, snippet, received_datetime)
-    VALUES (:id, :thread_id, :sender, :subject, :snippet, :received_datetime)
+    INSERT OR IGNORE INTO emails
+        (id, thread_id, sender, recipient, subject, snippet, received_datetime, received_ts, label_ids)
+    VALUES (:id, :thread_id, :sender, :recipient, :subject, :snippet, :received_datetime, :received_ts, :label_ids)
     """
 
-    def __init__(self, db_path: str = config.DB_PATH):
+    BACKFILL_CHUNK_SIZE = 5000
+
+    SEARCH_COLUMNS = ("sender", "recipient", "subject", "snippet")
+    # The trigram tokenizer cannot match terms shorter than this; they fall back to LIKE.
+    MIN_FTS_TERM = 3
+
+    # SQLite's default limit on host parameters per statement is 999.
+    IN_CHUNK_SIZE = 500
+
+    def __init__(
+        self,
+        db_path: str = config.DB_PATH,
+        cache_size_kib: int = config.SQLITE_CACHE_SIZE_KIB,
+        mmap_size: int = config.SQLITE_MMAP_SIZE,
+        busy_timeout_ms: int = config.SQLITE_BUSY_TIMEOUT_MS,
+        synchronous: str = config.SQLITE_SYNCHRONOUS,
+    ):
         self.db_path = db_path
-        with self._conn() as conn:
-            conn.execute(self.CREATE_SQL)
+        self._pool = SQLitePool(
+            db_path,
+            cache_size_kib=cache_size_kib,
+            mmap_size=mmap_size,
+            busy_timeout_ms=busy_timeout_ms,
+            synchronous=synchronous,
+        )
+        self._known_lock = threading.Lock()
+        self._columnar: Optional[ColumnarBuilder] = None
+        self._columnar_lock = threading.Lock()
+        with self._pool.writer() as conn:
+            self._migrate(conn)
+            self._backfill_received_ts(conn)
+            self._known_ids: Set[str] = {r[0] for r in conn.execute("SELECT id FROM emails")}
+        LOG.info("Loaded %d known email ids from %s", len(self._known_ids), self.db_path)
+
+    def _migrate(self, conn) -> None:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for i, script in enumerate(self.MIGRATIONS[version:], start=version + 1):
+            LOG.info("Applying schema migration %d to %s", i, self.db_path)
+            conn.executescript(script)
+            conn.execute(f"PRAGMA user_version = {i}")
             conn.commit()
 
-    @contextmanager
-    def _conn(self):
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
-
-    def insert_email(self, email: Dict) -> None:
-        with self._conn() as conn:
-            conn.execute(self.UPSERT_SQL, email)
+    def _backfill_received_ts(self, conn) -> None:
+        """Fill received_ts for rows written before it existed, one committed chunk at a time."""
+        total = 0
+        while True:
+            rows = conn.execute(
+                "SELECT id, received_datetime FROM emails WHERE received_ts IS NULL LIMIT ?",
+                (self.BACKFILL_CHUNK_SIZE,),
+            ).fetchall()
+            if not rows:
+                break
+            # Unparseable dates get 0 so they are not selected again.
+            conn.executemany(
+                "UPDATE emails SET received_ts = ? WHERE id = ?",
+                [(iso_to_epoch(r["received_datetime"]) or 0, r["id"]) for r in rows],
+            )
             conn.commit()
-            LOG.info("Stored email %s - %s", email["id"], email.get("subject", ""))
+            total += len(rows)
+        if total:
+            LOG.info("Backfilled received_ts for %d emails in %s", total, self.db_path)
 
-    def get_last_n_emails(self, n: int) -> List[Dict]:
-        with self._conn() as conn:
+    def close(self) -> None:
+        self._pool.close()
+
+    def compact(self) -> None:
+        """
+        VACUUM the database file to return free pages to the filesystem.
+        VACUUM may renumber rowids, which the external-content full-text index
+        and the columnar snapshot are keyed on, so both are rebuilt afterwards.
+        """
+        with self._pool.writer() as conn:
+            conn.execute("VACUUM")
+            conn.execute("INSERT INTO emails_fts (emails_fts) VALUES ('rebuild')")
+            conn.commit()
+            # Fold the WAL back into the main file so the space is actually released.
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        with self._columnar_lock:
+            self._columnar = None
+        LOG.info("Compacted %s", self.db_path)
+
+    def columnar_snapshot(self) -> ColumnarSnapshot:
+        """
+        Column-oriented snapshot of every stored email for bulk rule evaluation.
+        Built once, then topped up with rows added since the previous call
+        (tracked by rowid); deleting emails makes the next call rebuild it.
+        Requires numpy.
+        """
+        with self._columnar_lock:
+            if self._columnar is None:
+                self._columnar = ColumnarBuilder()
+            builder = self._columnar
+            with self._pool.reader() as conn:
+                cur = conn.execute(
+                    """
+                    SELECT rowid, id, sender, recipient, subject, snippet, received_ts
+                    FROM emails WHERE rowid > ? ORDER BY rowid
+                    """,
+                    (builder.last_rowid,),
+                )
+                while True:
+                    rows = cur.fetchmany(self.BACKFILL_CHUNK_SIZE)
+                    if not rows:
+                        break
+                    builder.append(rows)
+            return builder.snapshot()
+
+    def insert_email(self, email: Mapping) -> None:
+        self.insert_emails([email])
+        LOG.info("Stored email %s - %s", email["id"], email.get("subject", ""))
+
+    def insert_emails(self, emails: Iterable[Mapping]) -> InsertResult:
+        """
+        Insert many emails in a single transaction. Rows whose id is already stored
+        (or repeated within `emails`) are ignored and counted as duplicates.
+        """
+        rows = [self._row(e) for e in emails]
+        if not rows:
+            return InsertResult(0, 0)
+        with self._pool.writer() as conn:
+            # rowcount sums sqlite3_changes(), which leaves out rows written by triggers.
+            inserted = conn.executemany(self.UPSERT_SQL, rows).rowcount
+        with self._known_lock:
+            self._known_ids.update(r["id"] for r in rows)
+        return InsertResult(inserted, len(rows) - inserted)
+
+    def get_last_n_emails(self, n: int) -> List[EmailRecord]:
+        with self._pool.reader() as conn:
             cur = conn.execute(
-                "SELECT * FROM emails ORDER BY received_datetime DESC LIMIT ?",
+                self.SELECT_SQL + " ORDER BY received_ts DESC, id DESC LIMIT ?",
                 (n,),
             )
-            return [dict(r) for r in cur.fetchall()]
+            return [EmailRecord(*r) for r in cur.fetchall()]
+
+    def iter_emails(self, before: Optional[str] = None, batch_size: int = 500) -> Iterator[EmailRecord]:
+        """
+        Stream emails newest first, starting after the `before` cursor if given.
+        Rows are read `batch_size` at a time with keyset pagination on
+        (received_ts, id), so memory stays flat however many rows there are.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        key = decode_cursor(before) if before else None
+        with self._pool.reader() as conn:
+            cur = conn.cursor()
+            while True:
+                if key is None:
+                    cur.execute(
+                        self.SELECT_SQL + " ORDER BY received_ts DESC, id DESC LIMIT ?",
+                        (batch_size,),
+                    )
+                else:
+                    cur.execute(
+                        self.SELECT_SQL
+                        + " WHERE (received_ts, id) < (?, ?) ORDER BY received_ts DESC, id DESC LIMIT ?",
+                        (*key, batch_size),
+                    )
+                records = [EmailRecord(*r) for r in cur.fetchall()]
+                yield from records
+                if len(records) < batch_size:
+                    return
+                key = (records[-1].received_ts, records[-1].id)
+
+    def get_emails_between(
+        self, since_ts: Optional[int] = None, until_ts: Optional[int] = None, limit: int = 100
+    ) -> List[EmailRecord]:
+        """Newest-first emails with since_ts <= received_ts < until_ts (epoch seconds), via the received_ts index."""
+        with self._pool.reader() as conn:
+            cur = conn.execute(
+                self.SELECT_SQL
+                + " WHERE received_ts >= ? AND received_ts < ? ORDER BY received_ts DESC, id DESC LIMIT ?",
+                (since_ts if since_ts is not None else 0, until_ts if until_ts is not None else 2**62, limit),
+            )
+            return [EmailRecord(*r) for r in cur.fetchall()]
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[EmailRecord], Optional[str]]:
+        """
+        Newest-first emails containing every whitespace-separated term of `query`
+        (case-insensitive substring match) in any of `fields`. Returns the page and
+        an opaque cursor for the next one, or None on the last page.
+        """
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        where, params = self._search_clause(query.split(), fields)
+        if cursor:
+            where.append("(e.received_ts, e.id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        with self._pool.reader() as conn:
+            rows = conn.execute(
+                f"""
+                SELECT {", ".join("e." + c for c in self.COLUMNS)} FROM emails e
+                WHERE {" AND ".join(where) or "1"}
+                ORDER BY e.received_ts DESC, e.id DESC LIMIT ?
+                """,
+                params + [limit + 1],
+            ).fetchall()
+        page = [EmailRecord(*r) for r in rows[:limit]]
+        next_cursor = encode_cursor(page[-1]) if len(rows) > limit else None
+        return page, next_cursor
+
+    def search_ids(self, text: str, field: str, floor: Optional[Tuple[int, str]] = None) -> Set[str]:
+        """
+        Ids of the emails whose `field` contains `text` (case-insensitive), only
+        among emails at or after `floor` (see window_floor) when given.
+        """
+        where, params = self._search_clause([text], [field])
+        if floor is not None:
+            where.append("(e.received_ts, e.id) >= (?, ?)")
+            params.extend(floor)
+        with self._pool.reader() as conn:
+            return {r[0] for r in conn.execute(f"SELECT e.id FROM emails e WHERE {' AND '.join(where) or '1'}", params)}
+
+    def _search_clause(self, terms: Sequence[str], fields: Optional[Sequence[str]]) -> Tuple[List[str], List]:
+        fields = list(fields or self.SEARCH_COLUMNS)
+        unknown = set(fields) - set(self.SEARCH_COLUMNS)
+        if unknown:
+            raise ValueError(f"Cannot search fields {sorted(unknown)}")
+        where, params = [], []
+        long_terms = [t for t in terms if len(t) >= self.MIN_FTS_TERM]
+        if long_terms:
+            phrases = " ".join('"%s"' % t.replace('"', '""') for t in long_terms)
+            where.append("e.rowid IN (SELECT rowid FROM emails_fts WHERE emails_fts MATCH ?)")
+            params.append("{%s} : (%s)" % (" ".join(fields), phrases))
+        for term in terms:
+            if len(term) < self.MIN_FTS_TERM:
+                where.append("(" + " OR ".join(f"e.{f} LIKE ? ESCAPE '\\'" for f in fields) + ")")
+                params.extend([like_pattern(term)] * len(fields))
+        return where, params
+
+    def count(self) -> int:
+        with self._pool.reader() as conn:
+            return conn.execute("SELECT count(*) FROM emails").fetchone()[0]
+
+    def window_floor(self, n: int) -> Optional[Tuple[int, str]]:
+        """(received_ts, id) of the n-th newest email, the oldest of the last n; None if there are fewer."""
+        if n <= 0:
+            return None
+        with self._pool.reader() as conn:
+            row = conn.execute(
+                "SELECT received_ts, id FROM emails ORDER BY received_ts DESC, id DESC LIMIT 1 OFFSET ?", (n - 1,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def rule_ids(self, rule: Rule, now: float, floor: Optional[Tuple[int, str]] = None) -> Optional[List[str]]:
+        """
+        Newest-first ids of the emails `rule` matches at epoch `now`, evaluated in
+        SQL (see rule_sql.rule_where), optionally only among emails at or after
+        `floor` (see window_floor). None when the rule cannot be translated.
+        """
+        clause = rule_where(rule, now, self.MIN_FTS_TERM)
+        if clause is None:
+            return None
+        where, params = clause
+        if floor is not None:
+            where += " AND (e.received_ts, e.id) >= (?, ?)"
+            params = params + list(floor)
+        with self._pool.reader() as conn:
+            rows = conn.execute(
+                f"SELECT e.id FROM emails e WHERE {where} ORDER BY e.received_ts DESC, e.id DESC", params
+            )
+            return [r[0] for r in rows]
+
+    def get_email_by_id(self, email_id: str) -> Optional[EmailRecord]:
+        with self._pool.reader() as conn:
+            row = conn.execute(self.SELECT_SQL + " WHERE id = ?", (email_id,)).fetchone()
+            return EmailRecord(*row) if row else None
+
+    def existing_ids(self, email_ids: Iterable[str]) -> Set[str]:
+        """
+        Return the subset of `email_ids` already stored. Answered from the in-memory
+        id set; only misses hit SQLite, to pick up rows written by other processes.
+        """
+        ids = list(email_ids)
+        with self._known_lock:
+            found = {i for i in ids if i in self._known_ids}
+        misses = [i for i in ids if i not in found]
+        if not misses:
+            return found
+
+        with self._pool.reader() as conn:
+            for start in range(0, len(misses), self.IN_CHUNK_SIZE):
+                chunk = misses[start : start + self.IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT id FROM emails WHERE id IN ({placeholders})", chunk)
+                found.update(r[0] for r in rows)
+        with self._known_lock:
+            self._known_ids.update(found)
+        return found
+
+    def delete_emails(self, email_ids: Iterable[str]) -> int:
+        ids = list(email_ids)
+        with self._pool.writer() as conn:
+            cur = conn.executemany("DELETE FROM emails WHERE id = ?", [(i,) for i in ids])
+        with self._known_lock:
+            self._known_ids.difference_update(ids)
+        if cur.rowcount:
+            with self._columnar_lock:
+                self._columnar = None
+        return cur.rowcount
+
+    def update_labels(self, email_id: str, label_ids: List[str]) -> None:
+        with self._pool.writer() as conn:
+            conn.execute(
+                "UPDATE emails SET label_ids = ? WHERE id = ?",
+                (",".join(label_ids), email_id),
+            )
+
+    def get_history_id(self, account: str) -> Optional[str]:
+        with self._pool.reader() as conn:
+            row = conn.execute("SELECT history_id FROM sync_state WHERE account = ?", (account,)).fetchone()
+            return row["history_id"] if row else None
+
+    def set_history_id(self, account: str, history_id: str) -> None:
+        with self._pool.writer() as conn:
+            conn.execute(
+                """
+                INSERT INTO sync_state (account, history_id, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(account) DO UPDATE SET history_id = excluded.history_id, updated_at = excluded.updated_at
+                """,
+                (account, str(history_id), datetime.now(timezone.utc).isoformat()),
+            )
 
-    def get_email_by_id(self, email_id: str) -> Optional[Dict]:
-        with self._conn() as conn:
-            cur = conn.execute("SELECT * FROM emails WHERE id = ?", (email_id,))
-            row = cur.fetchone()
-            return dict(row) if row else None
+    @classmethod
+    def _row(cls, email: Mapping) -> Dict:
+        record = EmailRecord.from_mapping(email)
+        return {c: getattr(record, c) for c in cls.COLUMNS}
@@ -0,0 +1,490 @@
+import itertools
+import os
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Set, Tuple
+
+from gmail_helper.common.config import config
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.emails_interface import (
+    EmailsInterface,
+    InsertResult,
+    decode_cursor,
+    encode_cursor,
+)
+from gmail_helper.common.contracts.rules_contract import Rule
+from gmail_helper.common.utils.logger import get_logger
+from gmail_helper.stores.columnar import ColumnarSnapshot
+from gmail_helper.stores.emails_store import EmailsStore
+from gmail_helper.stores.rule_sql import rule_where
+from gmail_helper.stores.sqlite_pool import SQLitePool
+
+LOG = get_logger(__name__)
+
+
+def partition_key(received_ts: int) -> str:
+    """Month partition ("YYYY-MM", UTC) holding an email received at epoch `received_ts`."""
+    return datetime.fromtimestamp(received_ts or 0, tz=timezone.utc).strftime("%Y-%m")
+
+
+def months_before(key: str, months: int) -> str:
+    year, month = int(key[:4]), int(key[5:7])
+    index = year * 12 + month - 1 - months
+    return "%04d-%02d" % (index // 12, index % 12 + 1)
+
+
+class PartitionedEmailsStore(EmailsInterface):
+    """
+    EmailsInterface over one SQLite file per calendar month of received date.
+
+    Each partition is a full EmailsStore (own pool, indexes and full-text index)
+    under `partition_dir`; a small catalog database at `db_path` maps email ids
+    to partitions and holds the sync state. Time-ordered reads walk partitions
+    newest first and stop as soon as they have enough rows, so "last N" and date
+    range queries only open the months they need. Old months can be dropped or
+    archived whole (apply_retention) and cold ones VACUUMed (compact_cold_partitions),
+    optionally from a background maintenance thread. Emails of a single-file
+    EmailsStore already at `db_path` are moved into the partitions on first open.
+    """
+
+    CATALOG_SQL = """
+    CREATE TABLE IF NOT EXISTS partitions (
+        key TEXT PRIMARY KEY,
+        last_write REAL NOT NULL DEFAULT 0,
+        compacted_at REAL
+    );
+    CREATE TABLE IF NOT EXISTS email_index (
+        id TEXT PRIMARY KEY,
+        partition TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_email_index_partition ON email_index (partition);
+    CREATE TABLE IF NOT EXISTS sync_state (
+        account TEXT PRIMARY KEY,
+        history_id TEXT NOT NULL,
+        updated_at TEXT
+    );
+    """
+
+    IN_CHUNK_SIZE = EmailsStore.IN_CHUNK_SIZE
+    # Legacy rows moved into partitions per insert_emails call.
+    ADOPT_BATCH_SIZE = 5000
+
+    def __init__(
+        self,
+        db_path: str = config.DB_PATH,
+        partition_dir: Optional[str] = config.DB_PARTITION_DIR,
+        retention_months: int = config.DB_RETENTION_MONTHS,
+        archive_dir: Optional[str] = config.DB_ARCHIVE_DIR,
+        maintenance_interval_sec: float = config.DB_MAINTENANCE_INTERVAL_SEC,
+        cache_size_kib: int = config.SQLITE_CACHE_SIZE_KIB,
+        mmap_size: int = config.SQLITE_MMAP_SIZE,
+        busy_timeout_ms: int = config.SQLITE_BUSY_TIMEOUT_MS,
+        synchronous: str = config.SQLITE_SYNCHRONOUS,
+        clock=time.time,
+    ):
+        self.db_path = db_path
+        self.partition_dir = partition_dir or db_path + ".partitions"
+        self.retention_months = retention_months
+        self.archive_dir = archive_dir
+        self._clock = clock
+        self._store_kwargs = dict(
+            cache_size_kib=cache_size_kib,
+            mmap_size=mmap_size,
+            busy_timeout_ms=busy_timeout_ms,
+            synchronous=synchronous,
+        )
+        os.makedirs(self.partition_dir, exist_ok=True)
+        self._catalog = SQLitePool(db_path, **self._store_kwargs)
+        with self._catalog.writer() as conn:
+            conn.executescript(self.CATALOG_SQL)
+        self._stores: Dict[str, EmailsStore] = {}
+        # Readers and writers lease a partition's store (see _partition); _drop_partition waits for them.
+        self._leases: Dict[str, int] = {}
+        self._dropping: Set[str] = set()
+        self._stores_lock = threading.Condition()
+        self._adopt_legacy_emails()
+
+        self._stop = threading.Event()
+        self._maintenance: Optional[threading.Thread] = None
+        if maintenance_interval_sec > 0:
+            self._maintenance = threading.Thread(
+                target=self._maintenance_loop,
+                args=(maintenance_interval_sec,),
+                name="emails-partition-maintenance",
+                daemon=True,
+            )
+            self._maintenance.start()
+
+    # Partitions
+
+    def partitions(self) -> List[str]:
+        """Partition keys, newest first."""
+        with self._catalog.reader() as conn:
+            return [r[0] for r in conn.execute("SELECT key FROM partitions ORDER BY key DESC")]
+
+    def partition_path(self, key: str) -> str:
+        return os.path.join(self.partition_dir, "emails-%s.db" % key)
+
+    @contextmanager
+    def _partition(self, key: str, create: bool = False) -> Iterator[Optional[EmailsStore]]:
+        """
+        The store of partition `key`, opened lazily and kept open until the block
+        exits. None if the partition has been dropped meanwhile, unless `create`.
+        """
+        with self._stores_lock:
+            while key in self._dropping:
+                self._stores_lock.wait()
+            store = self._stores.get(key)
+            if store is None and (create or os.path.exists(self.partition_path(key))):
+                store = self._stores[key] = EmailsStore(db_path=self.partition_path(key), **self._store_kwargs)
+            if store is not None:
+                self._leases[key] = self._leases.get(key, 0) + 1
+        if store is None:
+            yield None
+            return
+        try:
+            yield store
+        finally:
+            with self._stores_lock:
+                self._leases[key] -= 1
+                if not self._leases[key]:
+                    del self._leases[key]
+                    self._stores_lock.notify_all()
+
+    def _stores_between(self, since_ts: Optional[int] = None, until_ts: Optional[int] = None) -> Iterator[EmailsStore]:
+        """Partitions overlapping [since_ts, until_ts), newest first, each leased while the caller uses it."""
+        for key in self._keys_between(since_ts, until_ts):
+            with self._partition(key) as store:
+                if store is not None:
+                    yield store
+
+    def _keys_between(self, since_ts: Optional[int] = None, until_ts: Optional[int] = None) -> Iterator[str]:
+        first = partition_key(since_ts) if since_ts else None
+        last = partition_key(until_ts - 1) if until_ts else None
+        for key in self.partitions():
+            if last is not None and key > last:
+                continue
+            if first is not None and key < first:
+                return
+            yield key
+
+    def _partitions_of(self, email_ids: Iterable[str]) -> Dict[str, List[str]]:
+        ids = list(email_ids)
+        by_partition: Dict[str, List[str]] = {}
+        with self._catalog.reader() as conn:
+            for start in range(0, len(ids), self.IN_CHUNK_SIZE):
+                chunk = ids[start : start + self.IN_CHUNK_SIZE]
+                placeholders = ",".join("?" * len(chunk))
+                for r in conn.execute(f"SELECT id, partition FROM email_index WHERE id IN ({placeholders})", chunk):
+                    by_partition.setdefault(r[1], []).append(r[0])
+        return by_partition
+
+    def _touch(self, conn, key: str) -> None:
+        conn.execute(
+            """
+            INSERT INTO partitions (key, last_write) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET last_write = excluded.last_write
+            """,
+            (key, self._clock()),
+        )
+
+    # Writes
+
+    def insert_email(self, email: Mapping) -> None:
+        self.insert_emails([email])
+        LOG.info("Stored email %s - %s", email["id"], email.get("subject", ""))
+
+    def insert_emails(self, emails: Iterable[Mapping]) -> InsertResult:
+        """Route each email to its month's partition; ids already stored in any partition are duplicates."""
+        records = [EmailRecord.from_mapping(e) for e in emails]
+        if not records:
+            return InsertResult(0, 0)
+        existing = self.existing_ids(r.id for r in records)
+        by_partition: Dict[str, Dict[str, EmailRecord]] = {}
+        for record in records:
+            if record.id not in existing:
+                by_partition.setdefault(partition_key(record.received_ts), {}).setdefault(record.id, record)
+
+        inserted = 0
+        for key, batch in by_partition.items():
+            # Held across the catalog writes too, so a concurrent drop cannot unlist the partition midway.
+            with self._partition(key, create=True) as store:
+                with self._catalog.writer() as conn:
+                    self._touch(conn, key)
+                inserted += store.insert_emails(batch.values()).inserted
+                with self._catalog.writer() as conn:
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO email_index (id, partition) VALUES (?, ?)",
+                        [(email_id, key) for email_id in batch],
+                    )
+        return InsertResult(inserted, len(records) - inserted)
+
+    def _adopt_legacy_emails(self) -> None:
+        """
+        Move the emails of a single-file EmailsStore at db_path (used before
+        partitioning was enabled) into the partitions, so they stay visible next to
+        the sync checkpoint they share the file with. Safe to re-run if interrupted:
+        the legacy table is only dropped once every row has been copied.
+        """
+        with self._catalog.reader() as conn:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'emails'").fetchone():
+                return
+        # Opening it as an EmailsStore brings an older schema up to date first.
+        legacy = EmailsStore(db_path=self.db_path, **self._store_kwargs)
+        moved = 0
+        try:
+            rows = legacy.iter_emails(batch_size=self.ADOPT_BATCH_SIZE)
+            while True:
+                batch = list(itertools.islice(rows, self.ADOPT_BATCH_SIZE))
+                if not batch:
+                    break
+                moved += self.insert_emails(batch).inserted
+        finally:
+            legacy.close()
+        # Resetting user_version lets a plain EmailsStore opened at db_path later (with
+        # partitioning switched off again) rebuild its tables instead of skipping the migrations.
+        with self._catalog.writer() as conn:
+            conn.executescript("DROP TABLE IF EXISTS emails_fts; DROP TABLE emails; PRAGMA user_version = 0;")
+        LOG.info("Moved %d emails from %s into monthly partitions", moved, self.db_path)
+
+    def delete_emails(self, email_ids: Iterable[str]) -> int:
+        removed = 0
+        for key, ids in self._partitions_of(email_ids).items():
+            with self._partition(key) as store:
+                if store is None:
+                    continue
+                removed += store.delete_emails(ids)
+                with self._catalog.writer() as conn:
+                    self._touch(conn, key)
+                    conn.executemany("DELETE FROM email_index WHERE id = ?", [(i,) for i in ids])
+        return removed
+
+    def update_labels(self, email_id: str, label_ids: List[str]) -> None:
+        for key in self._partitions_of([email_id]):
+            with self._partition(key) as store:
+                if store is not None:
+                    store.update_labels(email_id, label_ids)
+
+    # Reads
+
+    def get_email_by_id(self, email_id: str) -> Optional[EmailRecord]:
+        for key in self._partitions_of([email_id]):
+            with self._partition(key) as store:
+                return store.get_email_by_id(email_id) if store is not None else None
+        return None
+
+    def existing_ids(self, email_ids: Iterable[str]) -> Set[str]:
+        return {i for ids in self._partitions_of(email_ids).values() for i in ids}
+
+    def get_last_n_emails(self, n: int) -> List[EmailRecord]:
+        rows: List[EmailRecord] = []
+        for store in self._stores_between():
+            if len(rows) >= n:
+                break
+            rows.extend(store.get_last_n_emails(n - len(rows)))
+        return rows
+
+    def iter_emails(self, before: Optional[str] = None, batch_size: int = 500) -> Iterator[EmailRecord]:
+        """
+        iter_emails across partitions, newest first; the cursor prunes away newer
+        months. Each batch is read under its own lease, so no partition stays leased
+        while the caller holds the iterator.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be at least 1")
+        until = decode_cursor(before)[0] + 1 if before else None
+        for key in self._keys_between(until_ts=until):
+            while True:
+                with self._partition(key) as store:
+                    if store is None:
+                        break
+                    page = list(itertools.islice(store.iter_emails(before=before, batch_size=batch_size), batch_size))
+                yield from page
+                if len(page) < batch_size:
+                    break
+                before = encode_cursor(page[-1])
+
+    def get_emails_between(
+        self, since_ts: Optional[int] = None, until_ts: Optional[int] = None, limit: int = 100
+    ) -> List[EmailRecord]:
+        rows: List[EmailRecord] = []
+        for store in self._stores_between(since_ts, until_ts):
+            if len(rows) >= limit:
+                break
+            rows.extend(store.get_emails_between(since_ts=since_ts, until_ts=until_ts, limit=limit - len(rows)))
+        return rows
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[EmailRecord], Optional[str]]:
+        if limit < 1:
+            raise ValueError("limit must be at least 1")
+        until = decode_cursor(cursor)[0] + 1 if cursor else None
+        page: List[EmailRecord] = []
+        more = False
+        for store in self._stores_between(until_ts=until):
+            # One row past the page tells us whether there is a next one.
+            rows, _ = store.search(query, limit=limit + 1 - len(page), cursor=cursor, fields=fields)
+            page.extend(rows)
+            if len(page) > limit:
+                more = True
+                break
+        page = page[:limit]
+        return page, encode_cursor(page[-1]) if more else None
+
+    def search_ids(self, text: str, field: str, floor: Optional[Tuple[int, str]] = None) -> Set[str]:
+        ids: Set[str] = set()
+        for store in self._stores_between(since_ts=floor[0] if floor else None):
+            ids |= store.search_ids(text, field, floor=floor)
+        return ids
+
+    def count(self) -> int:
+        with self._catalog.reader() as conn:
+            return conn.execute("SELECT count(*) FROM email_index").fetchone()[0]
+
+    def window_floor(self, n: int) -> Optional[Tuple[int, str]]:
+        """EmailsStore.window_floor across partitions; per-partition counts come from the catalog."""
+        with self._catalog.reader() as conn:
+            counts = dict(conn.execute("SELECT partition, count(*) FROM email_index GROUP BY partition"))
+        for key in self.partitions():
+            size = counts.get(key, 0)
+            if 0 < n <= size:
+                with self._partition(key) as store:
+                    return store.window_floor(n) if store is not None else None
+            n -= size
+        return None
+
+    def rule_ids(self, rule: Rule, now: float, floor: Optional[Tuple[int, str]] = None) -> Optional[List[str]]:
+        """EmailsStore.rule_ids over the partitions at or after `floor`, newest first."""
+        if rule_where(rule, now) is None:
+            return None
+        ids: List[str] = []
+        for store in self._stores_between(since_ts=floor[0] if floor else None):
+            ids.extend(store.rule_ids(rule, now, floor=floor))
+        return ids
+
+    def columnar_snapshot(self) -> ColumnarSnapshot:
+        # Each partition keeps its own incrementally built snapshot; they are only stitched together here.
+        return ColumnarSnapshot.concat([store.columnar_snapshot() for store in self._stores_between()])
+
+    def get_history_id(self, account: str) -> Optional[str]:
+        with self._catalog.reader() as conn:
+            row = conn.execute("SELECT history_id FROM sync_state WHERE account = ?", (account,)).fetchone()
+            return row["history_id"] if row else None
+
+    def set_history_id(self, account: str, history_id: str) -> None:
+        with self._catalog.writer() as conn:
+            conn.execute(
+                """
+                INSERT INTO sync_state (account, history_id, updated_at) VALUES (?, ?, ?)
+                ON CONFLICT(account) DO UPDATE SET history_id = excluded.history_id, updated_at = excluded.updated_at
+                """,
+                (account, str(history_id), datetime.now(timezone.utc).isoformat()),
+            )
+
+    # Retention and compaction
+
+    def apply_retention(self, retention_months: Optional[int] = None) -> List[str]:
+        """
+        Drop partitions more than `retention_months` whole months older than the
+        current one (0 keeps everything). With an archive_dir the partition file is
+        moved there instead of deleted. Either way this is a file operation plus one
+        catalog delete, not a row-by-row DELETE. Returns the removed keys.
+        """
+        months = self.retention_months if retention_months is None else retention_months
+        if months <= 0:
+            return []
+        cutoff = months_before(partition_key(int(self._clock())), months)
+        removed = [key for key in self.partitions() if key < cutoff]
+        for key in removed:
+            self._drop_partition(key)
+        return removed
+
+    def _drop_partition(self, key: str) -> None:
+        with self._stores_lock:
+            # New users of the partition wait until it is gone; current ones finish first.
+            self._dropping.add(key)
+            while self._leases.get(key):
+                self._stores_lock.wait()
+            store = self._stores.pop(key, None)
+        try:
+            if store is not None:
+                # Closing the last connection checkpoints the WAL into the main file.
+                store.close()
+
+            with self._catalog.writer() as conn:
+                conn.execute("DELETE FROM email_index WHERE partition = ?", (key,))
+                conn.execute("DELETE FROM partitions WHERE key = ?", (key,))
+
+            path = self.partition_path(key)
+            if self.archive_dir:
+                os.makedirs(self.archive_dir, exist_ok=True)
+                shutil.move(path, os.path.join(self.archive_dir, os.path.basename(path)))
+                LOG.info("Archived partition %s to %s", key, self.archive_dir)
+            else:
+                os.remove(path)
+                LOG.info("Dropped partition %s", key)
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(path + suffix):
+                    os.remove(path + suffix)
+        finally:
+            with self._stores_lock:
+                self._dropping.discard(key)
+                self._stores_lock.notify_all()
+
+    def compact_cold_partitions(self) -> List[str]:
+        """
+        VACUUM partitions that are cold (older than the current month) and written
+        since their last compaction. Returns the compacted keys.
+        """
+        current = partition_key(int(self._clock()))
+        with self._catalog.reader() as conn:
+            keys = [
+                r[0]
+                for r in conn.execute(
+                    """
+                    SELECT key FROM partitions
+                    WHERE key < ? AND (compacted_at IS NULL OR last_write > compacted_at)
+                    ORDER BY key
+                    """,
+                    (current,),
+                )
+            ]
+        for key in keys:
+            if self._stop.is_set():
+                break
+            with self._partition(key) as store:
+                if store is None:
+                    continue
+                store.compact()
+            with self._catalog.writer() as conn:
+                conn.execute("UPDATE partitions SET compacted_at = ? WHERE key = ?", (self._clock(), key))
+        return keys
+
+    def run_maintenance(self) -> None:
+        self.apply_retention()
+        self.compact_cold_partitions()
+
+    def _maintenance_loop(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            try:
+                self.run_maintenance()
+            except Exception:
+                LOG.exception("Partition maintenance failed")
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._maintenance is not None:
+            self._maintenance.join()
+        with self._stores_lock:
+            for store in self._stores.values():
+                store.close()
+            self._stores.clear()
+        self._catalog.close()
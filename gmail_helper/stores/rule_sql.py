@@ -0,0 +1,80 @@
+from typing import List, Optional, Tuple
+
+from gmail_helper.common.contracts.rules_contract import DATE_UNITS, DAY_SECONDS, FieldName, Rule, StringPredicate
+
+# Rule field -> column a string predicate reads (DateReceived compares the ISO text).
+RULE_COLUMNS = {
+    FieldName.From_: "sender",
+    FieldName.To: "recipient",
+    FieldName.Subject: "subject",
+    FieldName.Message: "snippet",
+    FieldName.DateReceived: "received_datetime",
+}
+# Columns covered by the emails_fts trigram index.
+FTS_COLUMNS = ("sender", "recipient", "subject", "snippet")
+
+Clause = Tuple[str, List]
+
+
+def like_pattern(term: str) -> str:
+    """`%term%` for LIKE ... ESCAPE '\\', with the wildcards in `term` escaped."""
+    return "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+
+
+def _contains(column: str, needle: str, min_fts_term: int) -> Clause:
+    if column in FTS_COLUMNS and len(needle) >= min_fts_term:
+        phrase = '{%s} : "%s"' % (column, needle.replace('"', '""'))
+        return "e.rowid IN (SELECT rowid FROM emails_fts WHERE emails_fts MATCH ?)", [phrase]
+    return f"ifnull(e.{column}, '') LIKE ? ESCAPE '\\'", [like_pattern(needle)]
+
+
+def condition_sql(cond, now: float, min_fts_term: int = 3) -> Optional[Clause]:
+    """(SQL, params) true exactly for the emails `cond` matches, or None if it cannot be translated."""
+    if cond.predicate in DATE_UNITS:
+        if cond.field != FieldName.DateReceived:
+            return "0", []
+        days, less_than = DATE_UNITS[cond.predicate]
+        cutoff = now - int(cond.value) * days * DAY_SECONDS
+        op = ">" if less_than else "<"
+        return f"(e.received_ts {op} ? AND e.received_ts != 0)", [cutoff]
+
+    column = RULE_COLUMNS.get(cond.field)
+    if column is None or not isinstance(cond.predicate, StringPredicate):
+        return "0", []
+    needle = str(cond.value).lower()
+    if not needle.isascii():
+        return None
+
+    if cond.predicate == StringPredicate.contains:
+        return _contains(column, needle, min_fts_term) if needle else ("1", [])
+    if cond.predicate == StringPredicate.does_not_contain:
+        if not needle:
+            return "0", []
+        sql, params = _contains(column, needle, min_fts_term)
+        return f"NOT ({sql})", params
+    if cond.predicate == StringPredicate.equals:
+        # lower(sender) is indexed; NULL never equals a non-empty value.
+        return (f"lower(e.{column}) = ?", [needle]) if needle else (f"ifnull(e.{column}, '') = ''", [])
+    if cond.predicate == StringPredicate.does_not_equal:
+        return f"ifnull(lower(e.{column}), '') != ?", [needle]
+    return "0", []
+
+
+def rule_where(rule: Rule, now: float, min_fts_term: int = 3) -> Optional[Clause]:
+    """
+    WHERE condition over the emails table (aliased `e`) selecting exactly the
+    emails the rules engine would match with `rule` at epoch `now`, or None if a
+    condition cannot be translated. String predicates compare lowercased text,
+    through the trigram index for `contains` terms of at least `min_fts_term`
+    characters. SQLite only folds ASCII case, so values that are not ASCII are
+    left to the Python evaluator.
+    """
+    clauses = [condition_sql(c, now, min_fts_term) for c in rule.conditions]
+    if any(c is None for c in clauses):
+        return None
+    if not clauses:
+        # An empty `all` matches everything, an empty `any` nothing.
+        return ("1", []) if rule.match == "all" else ("0", [])
+    joiner = " AND " if rule.match == "all" else " OR "
+    params = [p for _, ps in clauses for p in ps]
+    return "(" + joiner.join(sql for sql, _ in clauses) + ")", params
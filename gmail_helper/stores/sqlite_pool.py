@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from gmail_helper.common.config import config
+from gmail_helper.common.utils.logger import get_logger
+
+LOG = get_logger(__name__)
+
+
+class SQLitePool:
+    """
+    Long-lived SQLite connections for one database file: a single writer shared
+    behind a lock and one reader per thread. The database runs in WAL mode so
+    readers never block on, or get blocked by, the writer.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        cache_size_kib: int = config.SQLITE_CACHE_SIZE_KIB,
+        mmap_size: int = config.SQLITE_MMAP_SIZE,
+        busy_timeout_ms: int = config.SQLITE_BUSY_TIMEOUT_MS,
+        synchronous: str = config.SQLITE_SYNCHRONOUS,
+    ):
+        self.db_path = db_path
+        self.cache_size_kib = cache_size_kib
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.synchronous = synchronous
+        self._write_lock = threading.Lock()
+        self._readers_lock = threading.Lock()
+        self._readers: List[sqlite3.Connection] = []
+        self._local = threading.local()
+        self._writer: Optional[sqlite3.Connection] = self._connect()
+        mode = self._writer.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+        if mode.lower() != "wal":
+            LOG.warning("Could not enable WAL for %s, journal_mode is %s", db_path, mode)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+        # Negative cache_size is in KiB rather than pages.
+        conn.execute(f"PRAGMA cache_size = -{abs(int(self.cache_size_kib))}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        return conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Exclusive use of the writer; commits on success and rolls back on error."""
+        with self._write_lock:
+            if self._writer is None:
+                raise RuntimeError(f"SQLitePool for {self.db_path} is closed")
+            try:
+                yield self._writer
+                self._writer.commit()
+            except BaseException:
+                self._writer.rollback()
+                raise
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """This thread's read connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            conn.execute("PRAGMA query_only = ON")
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        yield conn
+
+    def close(self) -> None:
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._local = threading.local()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
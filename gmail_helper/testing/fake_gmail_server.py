@@ -0,0 +1,328 @@
+"""
+Offline stand-in for the Gmail REST API, for load tests and benchmarks.
+
+Serves the subset of endpoints GmailClient and AsyncGmailClient use
+(messages.list/get/modify/batchModify, labels.list/create, history.list,
+getProfile and the multipart batch endpoint) from a SyntheticMailbox, with
+configurable latency and injected 429 errors.
+
+Run standalone:
+    python -m gmail_helper.testing.fake_gmail_server --messages 10000 --latency-ms 20 --port 8085
+then point the clients at it:
+    GMAIL_API_BASE_URL=http://127.0.0.1:8085/ GMAIL_AUTH_DISABLED=true ...
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from gmail_helper.common.utils.logger import get_logger
+from gmail_helper.testing.mailbox import SyntheticMailbox
+
+LOG = get_logger(__name__)
+
+USERS_PREFIX = re.compile(r"^/gmail/v1/users/(?P<user>[^/]+)(?P<rest>/.*)$")
+BATCH_PATH = "/batch/gmail/v1"
+RATE_LIMIT_ERROR = {
+    "error": {
+        "code": 429,
+        "message": "Too many concurrent requests for user",
+        "errors": [{"reason": "rateLimitExceeded", "domain": "usageLimits"}],
+    }
+}
+
+
+def _top_level_fields(fields: Optional[str]) -> Optional[set]:
+    """'messages(id,threadId),nextPageToken' -> {'messages', 'nextPageToken'}"""
+    if not fields:
+        return None
+    depth, token, out = 0, "", set()
+    for ch in fields + ",":
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            out.add(re.split(r"[/(]", token.strip())[0])
+            token = ""
+            continue
+        token += ch
+    return out
+
+
+class FakeGmailApi:
+    """Transport-independent request dispatcher over a SyntheticMailbox."""
+
+    def __init__(self, mailbox: SyntheticMailbox, error_rate: float = 0.0, seed: int = 7):
+        self.mailbox = mailbox
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {}
+        self.throttled = 0
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def _inject_error(self) -> bool:
+        if not self.error_rate:
+            return False
+        with self._lock:
+            hit = self._rng.random() < self.error_rate
+            self.throttled += hit
+        return hit
+
+    def dispatch(self, method: str, url: str, body: bytes = b"") -> Tuple[int, Dict]:
+        parts = urlsplit(url)
+        query = parse_qs(parts.query)
+        match = USERS_PREFIX.match(parts.path)
+        if not match:
+            return 404, {"error": {"code": 404, "message": "Not Found"}}
+        if self._inject_error():
+            return 429, RATE_LIMIT_ERROR
+        payload = json.loads(body) if body else {}
+        status, res = self._route(method, match.group("rest"), query, payload)
+        if status == 200:
+            fields = _top_level_fields((query.get("fields") or [None])[0])
+            if fields is not None:
+                res = {k: v for k, v in res.items() if k in fields}
+        return status, res
+
+    def _route(self, method: str, path: str, query: Dict[str, List[str]], payload: Dict) -> Tuple[int, Dict]:
+        mb = self.mailbox
+        segments = [s for s in path.split("/") if s]
+
+        if method == "GET" and segments == ["profile"]:
+            self._count("getProfile")
+            return 200, {
+                "emailAddress": mb.email_address,
+                "messagesTotal": len(mb.messages),
+                "historyId": str(mb.history_id),
+            }
+
+        if segments[:1] == ["messages"]:
+            if method == "GET" and len(segments) == 1:
+                self._count("messages.list")
+                return 200, self._list_messages(query)
+            if method == "POST" and segments[1:] == ["batchModify"]:
+                self._count("messages.batchModify")
+                if len(payload.get("ids", [])) > 1000:
+                    return 400, {"error": {"code": 400, "message": "Too many ids"}}
+                for msg_id in payload.get("ids", []):
+                    if msg_id in mb.messages:
+                        mb.modify(msg_id, payload.get("addLabelIds", []), payload.get("removeLabelIds", []))
+                return 204, {}
+            msg = mb.messages.get(segments[1]) if len(segments) > 1 else None
+            if msg is None:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            if method == "GET" and len(segments) == 2:
+                self._count("messages.get")
+                return 200, self._get_message(msg, query)
+            if method == "POST" and segments[2:] == ["modify"]:
+                self._count("messages.modify")
+                msg = mb.modify(msg["id"], payload.get("addLabelIds", []), payload.get("removeLabelIds", []))
+                return 200, {"id": msg["id"], "threadId": msg["threadId"], "labelIds": msg["labelIds"]}
+
+        if segments == ["labels"]:
+            if method == "GET":
+                self._count("labels.list")
+                return 200, {"labels": list(mb.labels.values())}
+            if method == "POST":
+                self._count("labels.create")
+                try:
+                    return 200, mb.create_label(payload["name"])
+                except ValueError as e:
+                    return 409, {"error": {"code": 409, "message": str(e)}}
+
+        if method == "GET" and segments == ["history"]:
+            self._count("history.list")
+            records = mb.history_since(int(query["startHistoryId"][0]))
+            if records is None:
+                return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+            start = int((query.get("pageToken") or ["0"])[0])
+            size = int((query.get("maxResults") or ["100"])[0])
+            res = {"history": records[start : start + size], "historyId": str(mb.history_id)}
+            if start + size < len(records):
+                res["nextPageToken"] = str(start + size)
+            return 200, res
+
+        return 404, {"error": {"code": 404, "message": "Not Found"}}
+
+    def _list_messages(self, query: Dict[str, List[str]]) -> Dict:
+        ids = self.mailbox.list_ids(query.get("labelIds", []))
+        q = (query.get("q") or [""])[0]
+        for term in q.split():
+            key, _, value = term.partition(":")
+            header = {"from": "From", "subject": "Subject", "to": "To"}.get(key.lower())
+            if header and value:
+                ids = [i for i in ids if value.lower() in self._header(self.mailbox.messages[i], header).lower()]
+        start = int((query.get("pageToken") or ["0"])[0])
+        size = min(int((query.get("maxResults") or ["100"])[0]), 500)
+        page = ids[start : start + size]
+        res = {
+            "messages": [{"id": i, "threadId": self.mailbox.messages[i]["threadId"]} for i in page],
+            "resultSizeEstimate": len(ids),
+        }
+        if start + size < len(ids):
+            res["nextPageToken"] = str(start + size)
+        return res
+
+    @staticmethod
+    def _header(msg: Dict, name: str) -> str:
+        for h in msg["payload"]["headers"]:
+            if h["name"] == name:
+                return h["value"]
+        return ""
+
+    @staticmethod
+    def _get_message(msg: Dict, query: Dict[str, List[str]]) -> Dict:
+        res = dict(msg)
+        wanted = query.get("metadataHeaders")
+        if wanted:
+            names = {w.lower() for w in wanted}
+            res["payload"] = {"headers": [h for h in msg["payload"]["headers"] if h["name"].lower() in names]}
+        return res
+
+    def dispatch_batch(self, content_type: str, body: bytes) -> Tuple[str, bytes]:
+        """Answer a multipart/mixed batch request; returns (content_type, body)."""
+        self._count("batch")
+        message = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+        boundary = "batch_fake_%08x" % random.getrandbits(32)
+        out = []
+        for part in message.iter_parts():
+            content_id = (part.get("Content-ID") or "").strip("<>")
+            raw = part.get_payload(decode=True) or b""
+            head, _, inner_body = raw.partition(b"\r\n\r\n") if b"\r\n\r\n" in raw else raw.partition(b"\n\n")
+            request_line = head.splitlines()[0].decode()
+            method, url, _ = request_line.split(" ", 2)
+            status, res = self.dispatch(method, url, inner_body.strip())
+            payload = json.dumps(res)
+            out.append(
+                "--%s\r\nContent-Type: application/http\r\nContent-ID: <response-%s>\r\n\r\n"
+                "HTTP/1.1 %d %s\r\nContent-Type: application/json; charset=UTF-8\r\nContent-Length: %d\r\n\r\n%s\r\n"
+                % (boundary, content_id, status, "OK" if status < 300 else "Error", len(payload), payload)
+            )
+        out.append("--%s--\r\n" % boundary)
+        return 'multipart/mixed; boundary="%s"' % boundary, "".join(out).encode()
+
+
+class FakeGmailServer:
+    """Threaded HTTP server exposing FakeGmailApi; use as a context manager or start()/stop()."""
+
+    def __init__(
+        self,
+        mailbox: Optional[SyntheticMailbox] = None,
+        latency_ms: float = 0.0,
+        latency_jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.api = FakeGmailApi(mailbox or SyntheticMailbox(), error_rate=error_rate)
+        self.latency = latency_ms / 1000.0
+        self.jitter = latency_jitter_ms / 1000.0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def mailbox(self) -> SyntheticMailbox:
+        return self.api.mailbox
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return "http://%s:%d/" % (host, port)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, fmt, *args):  # keep benchmark output quiet
+                pass
+
+            def _handle(self):
+                if server.latency or server.jitter:
+                    time.sleep(server.latency + random.uniform(0, server.jitter))
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if urlsplit(self.path).path == BATCH_PATH:
+                    content_type, payload = server.api.dispatch_batch(self.headers.get("Content-Type", ""), body)
+                    status = 200
+                else:
+                    status, res = server.api.dispatch(self.command, self.path, body)
+                    content_type, payload = "application/json; charset=UTF-8", json.dumps(res).encode()
+                    if status == 204:
+                        status, payload = 200, b"{}"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = _handle
+            do_POST = _handle
+
+        return Handler
+
+    def start(self) -> "FakeGmailServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-gmail", daemon=True)
+        self._thread.start()
+        LOG.info("Fake Gmail API serving %d messages at %s", len(self.mailbox.messages), self.base_url)
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self) -> "FakeGmailServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Offline fake Gmail API server")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--senders", type=int, default=0, help="number of synthetic senders (0 = built-in list)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected 429 per call")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8085)
+    args = parser.parse_args(argv)
+
+    senders = ["Sender %d <sender%d@example.com>" % (i, i) for i in range(args.senders)] or None
+    mailbox = SyntheticMailbox(size=args.messages, senders=senders, days=args.days, seed=args.seed)
+    server = FakeGmailServer(
+        mailbox,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        host=args.host,
+        port=args.port,
+    )
+    server.start()
+    try:
+        server._thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+import random
+import threading
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Dict, List, Optional, Sequence
+
+SYSTEM_LABELS = ["INBOX", "UNREAD", "SENT", "IMPORTANT", "STARRED", "TRASH", "SPAM"]
+
+DEFAULT_SENDERS = [
+    "GitHub <noreply@github.com>",
+    "Jira <jira@company.atlassian.net>",
+    "Team Lead <lead@company.com>",
+    "Newsletter <news@weekly.example.com>",
+    "Bank Alerts <alerts@bank.example.com>",
+    "Calendar <calendar-notification@google.com>",
+    "Friend <friend@example.org>",
+    "Recruiter <talent@recruiting.example.com>",
+]
+
+SUBJECT_WORDS = [
+    "build",
+    "failed",
+    "review",
+    "requested",
+    "invoice",
+    "meeting",
+    "update",
+    "weekly",
+    "digest",
+    "alert",
+    "release",
+    "merged",
+    "deploy",
+    "incident",
+    "reminder",
+]
+
+
+class SyntheticMailbox:
+    """
+    In-memory Gmail mailbox with generated messages, labels and a history log.
+    Backs FakeGmailServer; deterministic for a given seed.
+
+    Senders follow a Zipf-like distribution (a few senders produce most mail),
+    dates are spread uniformly over the last `days` days.
+    """
+
+    def __init__(
+        self,
+        size: int = 1000,
+        senders: Optional[Sequence[str]] = None,
+        sender_skew: float = 1.2,
+        days: int = 365,
+        unread_ratio: float = 0.3,
+        seed: int = 42,
+        email_address: str = "me@example.com",
+        now: Optional[datetime] = None,
+    ):
+        self.email_address = email_address
+        self._lock = threading.RLock()
+        self._rng = random.Random(seed)
+        self._now = now or datetime.now(timezone.utc)
+        self.messages: Dict[str, Dict] = {}
+        self.order: List[str] = []  # newest first, like messages.list
+        self.labels: Dict[str, Dict] = {name: {"id": name, "name": name, "type": "system"} for name in SYSTEM_LABELS}
+        self.history: List[Dict] = []
+        self.history_id = 1000
+
+        senders = list(senders or DEFAULT_SENDERS)
+        weights = [1.0 / (rank**sender_skew) for rank in range(1, len(senders) + 1)]
+        generated = []
+        for i in range(size):
+            received = self._now - timedelta(seconds=self._rng.uniform(0, days * 86400))
+            labels = ["INBOX"]
+            if self._rng.random() < unread_ratio:
+                labels.append("UNREAD")
+            generated.append(self._make_message(i, self._rng.choices(senders, weights)[0], received, labels))
+        generated.sort(key=lambda m: m["internalDate"], reverse=True)
+        for msg in generated:
+            self.messages[msg["id"]] = msg
+            self.order.append(msg["id"])
+        self._next_index = size
+        # History before this point has "expired", like Gmail's ~1 week retention.
+        self.history_floor = self.history_id
+
+    def _make_message(self, i: int, sender: str, received: datetime, labels: List[str]) -> Dict:
+        msg_id = "%016x" % (0x18F0000000000000 + i)
+        subject = " ".join(self._rng.choices(SUBJECT_WORDS, k=self._rng.randint(2, 6))).capitalize()
+        self.history_id += 1
+        return {
+            "id": msg_id,
+            "threadId": msg_id,
+            "labelIds": labels,
+            "snippet": "%s - %s" % (subject, " ".join(self._rng.choices(SUBJECT_WORDS, k=12))),
+            "historyId": str(self.history_id),
+            "internalDate": str(int(received.timestamp() * 1000)),
+            "sizeEstimate": self._rng.randint(2000, 60000),
+            "payload": {
+                "headers": [
+                    {"name": "Delivered-To", "value": self.email_address},
+                    {"name": "Received", "value": "from mx.example.com by mx.google.com; %s" % received},
+                    {"name": "DKIM-Signature", "value": "v=1; a=rsa-sha256; " + "x" * 300},
+                    {"name": "From", "value": sender},
+                    {"name": "To", "value": self.email_address},
+                    {"name": "Subject", "value": subject},
+                    {"name": "Date", "value": format_datetime(received)},
+                    {"name": "Message-ID", "value": "<%s@example.com>" % msg_id},
+                ]
+            },
+        }
+
+    def _record(self, **change) -> None:
+        self.history_id += 1
+        self.history.append(dict(id=str(self.history_id), **change))
+
+    def add_message(self, sender: str, labels: Optional[List[str]] = None, received: Optional[datetime] = None) -> Dict:
+        """Deliver a new message (newest first) and record it in the history log."""
+        with self._lock:
+            received = received or datetime.now(timezone.utc)
+            msg = self._make_message(self._next_index, sender, received, labels or ["INBOX"])
+            self._next_index += 1
+            self.messages[msg["id"]] = msg
+            self.order.insert(0, msg["id"])
+            self._record(messagesAdded=[{"message": self._summary(msg)}])
+            return msg
+
+    def delete_message(self, msg_id: str) -> None:
+        with self._lock:
+            msg = self.messages.pop(msg_id)
+            self.order.remove(msg_id)
+            self._record(messagesDeleted=[{"message": self._summary(msg)}])
+
+    def modify(self, msg_id: str, add: Sequence[str] = (), remove: Sequence[str] = ()) -> Dict:
+        with self._lock:
+            msg = self.messages[msg_id]
+            before = set(msg["labelIds"])
+            labels = [l for l in msg["labelIds"] if l not in set(remove)]
+            labels += [l for l in add if l not in labels]
+            msg["labelIds"] = labels
+            added, removed = set(labels) - before, before - set(labels)
+            if added:
+                self._record(labelsAdded=[{"message": self._summary(msg), "labelIds": sorted(added)}])
+            if removed:
+                self._record(labelsRemoved=[{"message": self._summary(msg), "labelIds": sorted(removed)}])
+            msg["historyId"] = str(self.history_id)
+            return msg
+
+    def create_label(self, name: str) -> Dict:
+        with self._lock:
+            for label in self.labels.values():
+                if label["name"].lower() == name.lower():
+                    raise ValueError("Label name exists or conflicts")
+            label = {"id": "Label_%d" % len(self.labels), "name": name, "type": "user"}
+            self.labels[label["id"]] = label
+            return label
+
+    def list_ids(self, label_ids: Sequence[str] = ()) -> List[str]:
+        with self._lock:
+            if not label_ids:
+                return list(self.order)
+            wanted = set(label_ids)
+            return [i for i in self.order if wanted.issubset(self.messages[i]["labelIds"])]
+
+    def history_since(self, start_history_id: int) -> Optional[List[Dict]]:
+        """Records after start_history_id, or None when it is older than the retained history."""
+        with self._lock:
+            if start_history_id < self.history_floor:
+                return None
+            return [h for h in self.history if int(h["id"]) > start_history_id]
+
+    @staticmethod
+    def _summary(msg: Dict) -> Dict:
+        return {"id": msg["id"], "threadId": msg["threadId"], "labelIds": list(msg["labelIds"])}
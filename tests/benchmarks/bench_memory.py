@@ -0,0 +1,59 @@
+"""
+Resident size of email rows held as plain dicts vs slotted EmailRecords.
+
+    python -m tests.benchmarks.bench_memory --rows 1000000 --senders 500
+"""
+
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+
+from gmail_helper.common.contracts.email_record import EmailRecord
+
+
+def _raw_rows(count: int, senders: int, seed: int):
+    # Fresh string objects per row, as the Gmail API and sqlite3 hand them back.
+    rng = random.Random(seed)
+    for i in range(count):
+        yield (
+            "m%08d" % i,
+            "t%08d" % (i // 3),
+            "user%d@example.com" % rng.randrange(senders),
+            "me@example.com".upper().lower(),
+            "Subject %d" % rng.randrange(1000),
+            "snippet %d" % i,
+            "2024-01-02T03:04:05+00:00",
+            1704164645 + i,
+            "INBOX,UNREAD",
+        )
+
+
+def _measure(name: str, build) -> None:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    per_row = current / len(rows)
+    print("%-14s %9d rows %8.1f MiB %7.1f B/row %7.2fs" % (name, len(rows), current / 2**20, per_row, elapsed))
+    del rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--senders", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    fields = EmailRecord.__slots__
+
+    _measure("dict", lambda: [dict(zip(fields, r)) for r in _raw_rows(args.rows, args.senders, args.seed)])
+    _measure("EmailRecord", lambda: [EmailRecord(*r) for r in _raw_rows(args.rows, args.senders, args.seed)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Rule evaluation throughput: the pre-compilation evaluator vs the compiled engine,
+and (--scaling) run time against rule count for per-sender rules, with and without
+the per-field Aho–Corasick scan and `equals` index.
+
+    python -m tests.benchmarks.bench_rules --rules 100 --emails 100000
+    python -m tests.benchmarks.bench_rules --scaling 100,1000,5000 --emails 10000
+
+--pushdown instead compares a rules run over the newest --emails emails of a
+SQLite store evaluated in Python with the same run evaluated in SQL.
+
+    python -m tests.benchmarks.bench_rules --pushdown --rules 100 --emails 100000
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+from datetime import timedelta
+
+from gmail_helper.api.email_service.orchestrator import GmailOrchestrator
+from gmail_helper.api.email_service.rules_engine import CompiledRuleSet
+from gmail_helper.api.email_service.rules_processor import RulesProcessor
+from gmail_helper.common.contracts.rules_contract import DatePredicate, FieldName, Rule, StringPredicate
+from gmail_helper.common.utils.dateutils import iso_to_epoch
+from gmail_helper.stores.emails_store import EmailsStore
+from gmail_helper.testing.mailbox import DEFAULT_SENDERS, SUBJECT_WORDS, SyntheticMailbox
+
+SENDER_STEMS = ["noreply", "alerts", "news", "lead"]
+
+
+def make_rules(count: int, seed: int = 7) -> list:
+    """Rules shaped like real ones: sender/subject substrings, exact senders and age limits."""
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        conditions = []
+        for _ in range(rng.randint(1, 3)):
+            kind = rng.random()
+            if kind < 0.4:
+                field, predicate, value = "From", "contains", "%s%d@" % (rng.choice(SENDER_STEMS), rng.randrange(50))
+            elif kind < 0.6:
+                field, predicate = "Subject", rng.choice(["contains", "does_not_contain"])
+                value = rng.choice(SUBJECT_WORDS)
+            elif kind < 0.8:
+                field, predicate, value = "From", "equals", rng.choice(DEFAULT_SENDERS)
+            else:
+                field, predicate = "DateReceived", rng.choice(list(DatePredicate)).value
+                value = rng.randint(1, 60)
+            conditions.append({"field": field, "predicate": predicate, "value": value})
+        rules.append(
+            {
+                "description": "rule %d" % i,
+                "match": rng.choice(["all", "any"]),
+                "conditions": conditions,
+                "actions": [{"type": "mark_as_read"}],
+            }
+        )
+    return rules
+
+
+def make_sender_rules(count: int, seed: int = 7) -> list:
+    """
+    One rule per sender, matched by substring or exact address, mostly senders absent
+    from the mailbox, some excluding a subject word.
+    """
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        if rng.random() < 0.2:
+            sender = "%s%d@" % (rng.choice(SENDER_STEMS), rng.randrange(50))
+        else:
+            sender = "user%d@corp%d" % (i, rng.randrange(100))
+        if rng.random() < 0.3:
+            predicate, sender = "equals", sender.rstrip("@") + "@example.com"
+        else:
+            predicate = "contains"
+        conditions = [{"field": "From", "predicate": predicate, "value": sender}]
+        if rng.random() < 0.5:
+            conditions.append({"field": "Subject", "predicate": "does_not_contain", "value": rng.choice(SUBJECT_WORDS)})
+        rules.append(Rule(description="rule %d" % i, conditions=conditions, actions=[{"type": "mark_as_read"}]))
+    return rules
+
+
+def make_emails(count: int, seed: int = 42) -> list:
+    senders = ["%s%d@example.com" % (stem, i) for stem in SENDER_STEMS for i in range(50)]
+    mailbox = SyntheticMailbox(size=count, senders=DEFAULT_SENDERS + senders, sender_skew=0.8, seed=seed)
+    return [GmailOrchestrator._to_email(mailbox.messages[mid]) for mid in mailbox.order]
+
+
+def legacy_run(rp: RulesProcessor, rules_file: str, emails: list) -> int:
+    """The evaluator before rules were compiled: reload, if/elif per condition, per email."""
+    with open(rules_file) as f:
+        rules = [Rule(**r) for r in json.load(f)["rules"]]
+    fields = {
+        FieldName.From_: "sender",
+        FieldName.To: "recipient",
+        FieldName.Subject: "subject",
+        FieldName.Message: "snippet",
+        FieldName.DateReceived: "received_datetime",
+    }
+
+    def eval_condition(cond, email) -> bool:
+        field_val = email.get(fields.get(cond.field), "") if cond.field in fields else ""
+        if isinstance(cond.predicate, StringPredicate):
+            fv = (field_val or "").lower()
+            ev = str(cond.value).lower()
+            if cond.predicate == StringPredicate.contains:
+                return ev in fv
+            if cond.predicate == StringPredicate.does_not_contain:
+                return ev not in fv
+            if cond.predicate == StringPredicate.equals:
+                return fv == ev
+            return fv != ev
+        received = email.get("received_ts")
+        if not isinstance(received, int):
+            received = iso_to_epoch(field_val)
+        if not received:
+            return False
+        delta = timedelta(seconds=time.time() - received)
+        v = int(cond.value)
+        if cond.predicate == DatePredicate.less_than_days:
+            return delta < timedelta(days=v)
+        if cond.predicate == DatePredicate.greater_than_days:
+            return delta > timedelta(days=v)
+        if cond.predicate == DatePredicate.less_than_months:
+            return delta < timedelta(days=30 * v)
+        return delta > timedelta(days=30 * v)
+
+    pending = {}
+    for rule in rules:
+        for email in emails:
+            results = [eval_condition(c, email) for c in rule.conditions]
+            if all(results) if rule.match == "all" else any(results):
+                rp._execute_actions(email, rule, pending)
+    return sum(d.actions for d in pending.values())
+
+
+def compiled_run(rp: RulesProcessor, emails: list) -> int:
+    pending = {}
+    rp._evaluate(rp.load_rules(), emails, pending, hits={})
+    return sum(d.actions for d in pending.values())
+
+
+def scaling_run(rp: RulesProcessor, counts: list, emails: list) -> None:
+    for count in counts:
+        rules = make_sender_rules(count)
+        for label, indexed in (("per-rule tests", False), ("scan + equals index", True)):
+            # An unreachable threshold keeps one substring test per condition.
+            ruleset = CompiledRuleSet(rules, min_needles=1 if indexed else float("inf"))
+            if not indexed:
+                ruleset.values.clear()
+            pending = {}
+            start = time.perf_counter()
+            rp._evaluate(ruleset, emails, pending, hits={})
+            elapsed = time.perf_counter() - start
+            matched = sum(d.actions for d in pending.values())
+            _report("%5d rules, %s" % (count, label), len(emails), elapsed, matched)
+
+
+def pushdown_run(rules_file: str, emails: list, tmp: str) -> None:
+    store = EmailsStore(db_path=os.path.join(tmp, "emails.db"))
+    store.insert_emails(emails)
+    try:
+        for label, pushdown in (("python window", False), ("sql pushdown", True)):
+            rp = RulesProcessor(store, rules_file=rules_file, gmail_client=None, pushdown=pushdown)
+            # Without a Gmail client every action is only logged, and counted.
+            start = time.perf_counter()
+            matched = rp.apply_rules(limit=len(emails))
+            _report(label, len(emails), time.perf_counter() - start, matched)
+    finally:
+        store.close()
+
+
+def _report(name: str, emails: int, elapsed: float, matched: int) -> None:
+    rate = emails / elapsed if elapsed else 0
+    print("%-32s %8d emails %8.2fs %12.0f emails/s  %d matches" % (name, emails, elapsed, rate, matched))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rules", type=int, default=100)
+    parser.add_argument("--emails", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--scaling", help="comma-separated rule counts, e.g. 100,1000,5000")
+    parser.add_argument("--pushdown", action="store_true", help="compare Python and SQL evaluation over a store")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    emails = make_emails(args.emails, seed=args.seed)
+    if args.scaling:
+        rp = RulesProcessor(None, rules_file=os.devnull, gmail_client=None)
+        scaling_run(rp, [int(c) for c in args.scaling.split(",")], emails)
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        rules_file = os.path.join(tmp, "rules.json")
+        with open(rules_file, "w") as f:
+            json.dump({"rules": make_rules(args.rules)}, f)
+        if args.pushdown:
+            pushdown_run(rules_file, emails, tmp)
+            return
+        rp = RulesProcessor(None, rules_file=rules_file, gmail_client=None)
+
+        start = time.perf_counter()
+        matched = legacy_run(rp, rules_file, emails)
+        _report("before (if/elif)", len(emails), time.perf_counter() - start, matched)
+
+        for label in ("after (first run)", "after (cached rules)"):
+            start = time.perf_counter()
+            matched = compiled_run(rp, emails)
+            _report(label, len(emails), time.perf_counter() - start, matched)
+
+
+if __name__ == "__main__":
+    main()
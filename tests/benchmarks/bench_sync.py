@@ -0,0 +1,93 @@
+"""
+End-to-end sync and rules throughput against the offline fake Gmail server.
+
+    python -m tests.benchmarks.bench_sync --messages 5000 --latency-ms 20 --error-rate 0.01
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from gmail_helper.api.email_service.orchestrator import GmailOrchestrator
+from gmail_helper.api.email_service.rules_processor import RulesProcessor
+from gmail_helper.common.config import config
+from gmail_helper.common.services.async_gmail_service import AsyncGmailClient
+from gmail_helper.common.services.gmail_service import GmailClient
+from gmail_helper.common.services.rate_limiter import RateLimiter
+from gmail_helper.stores.emails_store import EmailsStore
+from gmail_helper.testing.fake_gmail_server import FakeGmailServer
+from gmail_helper.testing.mailbox import SyntheticMailbox
+
+
+def _report(name: str, count: int, elapsed: float) -> None:
+    print("%-28s %7d msgs %8.2fs %10.1f msgs/s" % (name, count, elapsed, count / elapsed if elapsed else 0))
+
+
+def run(args) -> None:
+    mailbox = SyntheticMailbox(size=args.messages, seed=args.seed)
+    server = FakeGmailServer(mailbox, latency_ms=args.latency_ms, error_rate=args.error_rate)
+    with server, tempfile.TemporaryDirectory() as tmp:
+
+        def limiter():
+            return RateLimiter(units_per_second=args.quota, backoff_base=0.05, backoff_max=1.0)
+
+        def client():
+            return GmailClient("", "", [], rate_limiter=limiter(), base_url=server.base_url, auth_disabled=True)
+
+        def orchestrator(name: str, gmail=None, async_gmail=None) -> GmailOrchestrator:
+            store = EmailsStore(db_path=os.path.join(tmp, name + ".db"))
+            rules = RulesProcessor(store, rules_file=args.rules, gmail_client=gmail)
+            return GmailOrchestrator(store, rules, gmail_client=gmail, async_gmail_client=async_gmail)
+
+        orch = orchestrator("serial", gmail=client())
+        start = time.perf_counter()
+        count = orch.fetch_and_store(max_results=args.messages)
+        _report("sync fetch (serial)", count, time.perf_counter() - start)
+
+        start = time.perf_counter()
+        count = orch.fetch_and_store(max_results=args.messages)
+        _report("sync fetch (all known)", args.messages, time.perf_counter() - start)
+
+        orch = orchestrator("threads", gmail=client())
+        start = time.perf_counter()
+        count = orch.fetch_and_store(max_results=args.messages, workers=args.workers)
+        _report("sync fetch (%d workers)" % args.workers, count, time.perf_counter() - start)
+
+        async def _async_fetch():
+            async with AsyncGmailClient(
+                "", "", [], rate_limiter=limiter(), base_url=server.base_url, auth_disabled=True, http2=False
+            ) as async_gmail:
+                orch = orchestrator("async", async_gmail=async_gmail)
+                start = time.perf_counter()
+                count = await orch.fetch_and_store_async(max_results=args.messages)
+                _report("async fetch", count, time.perf_counter() - start)
+
+        asyncio.run(_async_fetch())
+
+        orch = orchestrator("serial", gmail=client())
+        start = time.perf_counter()
+        actions = orch.run_rules(limit=args.messages)
+        _report("rules run (%d actions)" % actions, args.messages, time.perf_counter() - start)
+
+        print("server calls:", server.api.calls, "throttled:", server.api.throttled)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--quota", type=float, default=1e6, help="limiter units/s (Gmail's real quota is 250)")
+    parser.add_argument("--rules", default=config.RULES_FILE)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
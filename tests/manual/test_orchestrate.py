@@ -14,6 +14,11 @@ class TestEmailFetch(unittest.TestCase):
         orchestrator = self.container.orchestrator()
         orchestrator.fetch_and_store()
 
+    def test_run_incremental_sync(self):
+        """Test #3 to sync only changes since the last stored historyId"""
+        orchestrator = self.container.orchestrator()
+        orchestrator.sync()
+
     def test_run_rules(self):
         """Test #2 to apply rules configured in rules.json"""
         orchestrator = self.container.orchestrator()
@@ -1,8 +1,18 @@
+import os
+import tempfile
 import unittest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
 
 from gmail_helper.api.email_service.models import EmailResponse, EmailsListResponse
-from gmail_helper.api.email_service.service import EmailService
+from gmail_helper.api.email_service.router import EmailRouter
+from gmail_helper.api.email_service.service import AsyncEmailService, EmailService
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.utils.api_framework import add_routers, routers_from_class
+from gmail_helper.common.utils.exceptions import Reason, ServiceException
+from gmail_helper.stores.emails_store import EmailsStore
 
 
 class TestEmailService(unittest.TestCase):
@@ -64,3 +74,112 @@ class TestEmailService(unittest.TestCase):
 
         self.mock_store.get_email_by_id.assert_called_once_with("does-not-exist")
         self.assertIsNone(resp)
+
+    def test_search_emails_returns_page_and_cursor(self):
+        self.mock_store.search.return_value = (
+            [
+                {
+                    "id": "9",
+                    "thread_id": "t9",
+                    "sender": "d@example.com",
+                    "subject": "Invoice",
+                    "snippet": "due",
+                    "received_datetime": "2024-08-15T10:00:00Z",
+                }
+            ],
+            "1723716000:9",
+        )
+
+        resp = self.service.search_emails("invoice", limit=1)
+
+        self.mock_store.search.assert_called_once_with("invoice", limit=1, cursor=None)
+        self.assertEqual(resp.emails[0].id, "9")
+        self.assertEqual(resp.next_cursor, "1723716000:9")
+
+    def test_search_emails_rejects_bad_cursor(self):
+        self.mock_store.search.side_effect = ValueError("Invalid cursor")
+
+        with self.assertRaises(ServiceException) as ctx:
+            self.service.search_emails("invoice", cursor="nope")
+
+        self.assertEqual(ctx.exception.get_code(), Reason.INVALID_PARAM)
+
+    def test_search_emails_rejects_non_positive_limit(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = EmailsStore(os.path.join(tmp, "emails.db"))
+            try:
+                for limit in (0, -3):
+                    with self.assertRaises(ServiceException) as ctx:
+                        EmailService(store).search_emails("invoice", limit=limit)
+                    self.assertEqual(ctx.exception.get_code(), Reason.INVALID_PARAM)
+            finally:
+                store.close()
+
+    def test_get_last_emails_pages_with_cursor(self):
+        row = {
+            "id": "5",
+            "thread_id": "t5",
+            "sender": "e@example.com",
+            "subject": "Older",
+            "snippet": "x",
+            "received_datetime": "2024-08-10T10:00:00Z",
+            "received_ts": 1723284000,
+        }
+        self.mock_store.iter_emails.return_value = iter([row, dict(row, id="4")])
+
+        resp = self.service.get_last_emails(1, before="1723370400:6")
+
+        self.mock_store.iter_emails.assert_called_once_with(before="1723370400:6", batch_size=1)
+        self.assertEqual([e.id for e in resp.emails], ["5"])
+        self.assertEqual(resp.next_cursor, "1723284000:5")
+
+    def test_get_last_emails_rejects_empty_pages(self):
+        with self.assertRaises(ServiceException) as ctx:
+            self.service.get_last_emails(0, before="1723370400:6")
+
+        self.assertEqual(ctx.exception.get_code(), Reason.INVALID_PARAM)
+        self.mock_store.iter_emails.assert_not_called()
+
+
+class TestEmailRouter(unittest.TestCase):
+    def setUp(self):
+        self.service = MagicMock()
+        self.service.search_emails = AsyncMock(return_value={"emails": [], "next_cursor": None})
+        app = FastAPI()
+        add_routers(app, routers_from_class(EmailRouter, lambda: EmailRouter(self.service)))
+        self.client = TestClient(app)
+
+    def test_search_limit_is_bounded(self):
+        for limit in (0, -3, 101):
+            resp = self.client.get("/emails/search", params={"q": "invoice", "limit": limit})
+            self.assertEqual(resp.status_code, 422)
+        self.service.search_emails.assert_not_called()
+
+        self.assertEqual(self.client.get("/emails/search", params={"q": "invoice", "limit": 100}).status_code, 200)
+        self.service.search_emails.assert_awaited_once_with("invoice", limit=100, cursor=None)
+
+
+class TestAsyncEmailService(unittest.IsolatedAsyncioTestCase):
+    async def test_get_last_emails_pages_with_cursor(self):
+        rows = [
+            EmailRecord(i, sender="s", received_datetime="2024-08-10T10:00:00Z", received_ts=ts)
+            for i, ts in (("5", 1723284000), ("4", 1723280000))
+        ]
+
+        async def iter_emails(before=None, batch_size=500):
+            for row in rows:
+                yield row
+
+        store = MagicMock()
+        store.iter_emails = iter_emails
+        resp = await AsyncEmailService(store).get_last_emails(1, before="1723370400:6")
+
+        self.assertEqual([e.id for e in resp.emails], ["5"])
+        self.assertEqual(resp.next_cursor, "1723284000:5")
+
+    async def test_get_email_by_id(self):
+        store = MagicMock()
+        store.get_email_by_id = AsyncMock(return_value=None)
+
+        self.assertIsNone(await AsyncEmailService(store).get_email_by_id("nope"))
+        store.get_email_by_id.assert_awaited_once_with("nope")
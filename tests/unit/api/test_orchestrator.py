@@ -1,14 +1,33 @@
+import threading
 import unittest
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from freezegun import freeze_time
 
 from gmail_helper.api.email_service.orchestrator import GmailOrchestrator
+from gmail_helper.common.config import config
+from gmail_helper.common.contracts.emails_interface import InsertResult
+from gmail_helper.common.services.gmail_service import HistoryExpiredError
+
+
+def mock_store():
+    """Mock store whose insert_emails records what it was given in `store.inserted`."""
+    store = Mock()
+    store.existing_ids.return_value = set()
+    store.inserted = []
+
+    def _insert(emails):
+        emails = list(emails)
+        store.inserted.extend(emails)
+        return InsertResult(len(emails), 0)
+
+    store.insert_emails.side_effect = _insert
+    return store
 
 
 class TestGmailOrchestrator(unittest.TestCase):
     def setUp(self):
-        self.mock_store = Mock()
+        self.mock_store = mock_store()
         self.mock_gmail = Mock()
         self.mock_rules = Mock()
 
@@ -19,29 +38,35 @@ class TestGmailOrchestrator(unittest.TestCase):
         )
 
     def test_fetch_and_store_no_messages(self):
-        self.mock_gmail.list_messages.return_value = []
+        self.mock_gmail.iter_messages.return_value = iter([])
 
         count = self.orch.fetch_and_store(max_results=5, label_ids=["INBOX"])
 
         self.assertEqual(count, 0)
-        self.mock_store.insert_email.assert_not_called()
-        self.mock_gmail.list_messages.assert_called_once_with(label_ids=["INBOX"], max_results=5)
+        self.mock_store.insert_emails.assert_not_called()
+        self.mock_gmail.iter_messages.assert_called_once_with(
+            label_ids=["INBOX"], query=None, page_size=config.LIST_PAGE_SIZE, max_results=5
+        )
+        self.mock_gmail.get_messages_metadata.assert_not_called()
 
     @freeze_time("2024-08-12 10:00:00")
     def test_fetch_and_store_with_message(self):
-        self.mock_gmail.list_messages.return_value = [{"id": "m1"}]
-        self.mock_gmail.get_message_metadata.return_value = {
-            "id": "m1",
-            "threadId": "t1",
-            "snippet": "Hello snippet",
-            "payload": {
-                "headers": [
-                    {"name": "From", "value": "sender@example.com"},
-                    {"name": "Subject", "value": "Hi"},
-                    {"name": "Date", "value": "Mon, 12 Aug 2024 10:00:00 +0000"},
-                ]
-            },
-        }
+        self.mock_gmail.iter_messages.return_value = iter([[{"id": "m1"}]])
+        self.mock_gmail.get_messages_metadata.return_value = [
+            {
+                "id": "m1",
+                "threadId": "t1",
+                "snippet": "Hello snippet",
+                "payload": {
+                    "headers": [
+                        {"name": "From", "value": "sender@example.com"},
+                        {"name": "To", "value": "me@example.com"},
+                        {"name": "Subject", "value": "Hi"},
+                        {"name": "Date", "value": "Mon, 12 Aug 2024 10:00:00 +0000"},
+                    ]
+                },
+            }
+        ]
 
         # Patch parse_rfc2822_to_iso to use the frozen time context
         with patch(
@@ -50,14 +75,195 @@ class TestGmailOrchestrator(unittest.TestCase):
             count = self.orch.fetch_and_store(max_results=1)
 
         self.assertEqual(count, 1)
-        self.mock_store.insert_email.assert_called_once()
-        email_arg = self.mock_store.insert_email.call_args[0][0]
+        self.mock_gmail.get_messages_metadata.assert_called_once_with(["m1"])
+        self.mock_store.insert_emails.assert_called_once()
+        (email_arg,) = self.mock_store.inserted
         self.assertEqual(email_arg["id"], "m1")
         self.assertEqual(email_arg["thread_id"], "t1")
         self.assertEqual(email_arg["sender"], "sender@example.com")
+        self.assertEqual(email_arg["recipient"], "me@example.com")
         self.assertEqual(email_arg["subject"], "Hi")
         self.assertEqual(email_arg["received_datetime"], "2024-08-12T10:00:00Z")
 
+    def test_fetch_and_store_fetches_metadata_per_page(self):
+        self.mock_gmail.iter_messages.return_value = iter([[{"id": "m1"}, {"id": "m2"}], [{"id": "m3"}]])
+        self.mock_gmail.get_messages_metadata.side_effect = lambda ids: [{"id": i} for i in ids]
+
+        count = self.orch.fetch_and_store(max_results=3, query="from:github.com")
+
+        self.assertEqual(count, 3)
+        self.assertEqual(
+            [c.args[0] for c in self.mock_gmail.get_messages_metadata.call_args_list],
+            [["m1", "m2"], ["m3"]],
+        )
+        self.assertEqual(self.mock_gmail.iter_messages.call_args.kwargs["query"], "from:github.com")
+
+    def test_fetch_and_store_skips_known_messages(self):
+        self.mock_gmail.iter_messages.return_value = iter([[{"id": "m1"}, {"id": "m2"}], [{"id": "m3"}]])
+        self.mock_store.existing_ids.side_effect = lambda ids: {"m1", "m3"} & set(ids)
+        self.mock_gmail.get_messages_metadata.side_effect = lambda ids: [{"id": i} for i in ids]
+
+        count = self.orch.fetch_and_store(max_results=3)
+
+        self.assertEqual(count, 1)
+        self.mock_gmail.get_messages_metadata.assert_called_once_with(["m2"])
+
+    def test_fetch_and_store_writes_each_batch_once(self):
+        self.mock_gmail.iter_messages.return_value = iter([[{"id": "m1"}, {"id": "m2"}, {"id": "m3"}]])
+        self.mock_gmail.get_messages_metadata.side_effect = lambda ids: [{"id": i} for i in ids]
+        self.mock_store.insert_emails.side_effect = lambda emails: InsertResult(len(list(emails)) - 1, 1)
+
+        count = self.orch.fetch_and_store(max_results=3)
+
+        self.assertEqual(count, 2)
+        self.mock_store.insert_emails.assert_called_once()
+
+    def test_fetch_and_store_with_workers_uses_single_writer(self):
+        self.mock_gmail.iter_messages.return_value = iter([[{"id": f"m{i}"} for i in range(250)], [{"id": "last"}]])
+        self.mock_gmail.get_messages_metadata.side_effect = lambda ids: [{"id": i} for i in ids]
+        writer_threads = set()
+        self.mock_store.insert_emails.side_effect = lambda emails: (
+            writer_threads.add(threading.get_ident()) or InsertResult(len(list(emails)), 0)
+        )
+
+        count = self.orch.fetch_and_store(max_results=251, workers=4)
+
+        self.assertEqual(count, 251)
+        self.assertEqual(self.mock_gmail.get_messages_metadata.call_count, 4)
+        self.assertEqual(self.mock_store.insert_emails.call_count, 4)
+        self.assertEqual(len(writer_threads), 1)
+        self.assertNotIn(threading.get_ident(), writer_threads)
+
+    def test_fetch_and_store_with_workers_raises_fetch_errors(self):
+        self.mock_gmail.iter_messages.return_value = iter([[{"id": "m1"}], [{"id": "m2"}]])
+
+        def _fetch(ids):
+            if ids == ["m1"]:
+                raise RuntimeError("quota exceeded")
+            return [{"id": i} for i in ids]
+
+        self.mock_gmail.get_messages_metadata.side_effect = _fetch
+
+        with self.assertRaisesRegex(RuntimeError, "quota exceeded"):
+            self.orch.fetch_and_store(max_results=2, workers=2)
+        # The batch that did arrive is still written before the error surfaces.
+        self.assertEqual([e["id"] for e in self.mock_store.inserted], ["m2"])
+
+    def test_sync_without_checkpoint_runs_full_sync(self):
+        self.mock_gmail.get_profile.return_value = {"emailAddress": "me@example.com", "historyId": "100"}
+        self.mock_store.get_history_id.return_value = None
+        self.mock_gmail.iter_messages.return_value = iter([])
+
+        self.orch.sync(label_ids=["INBOX"])
+
+        self.mock_gmail.iter_history.assert_not_called()
+        self.mock_gmail.iter_messages.assert_called_once()
+        self.mock_store.set_history_id.assert_called_once_with("me@example.com", "100")
+
+    def test_full_sync_lists_whole_mailbox_before_checkpointing(self):
+        ids = [f"m{i}" for i in range(config.FETCH_BATCH_SIZE * 2 + 5)]
+
+        def iter_messages(label_ids=None, query=None, page_size=None, max_results=None):
+            listed = [{"id": i} for i in ids[:max_results]]
+            return iter([listed[i : i + 20] for i in range(0, len(listed), 20)])
+
+        self.mock_gmail.get_profile.return_value = {"emailAddress": "me@example.com", "historyId": "100"}
+        self.mock_store.get_history_id.return_value = None
+        self.mock_gmail.iter_messages.side_effect = iter_messages
+        self.mock_gmail.get_messages_metadata.side_effect = lambda batch: [{"id": i} for i in batch]
+
+        stored = self.orch.sync(label_ids=["INBOX"])
+
+        self.assertEqual(stored, len(ids))
+        self.assertEqual([e["id"] for e in self.mock_store.inserted], ids)
+        self.mock_store.set_history_id.assert_called_once_with("me@example.com", "100")
+
+        # A capped listing may leave messages out, so it must not move the checkpoint.
+        self.mock_store.set_history_id.reset_mock()
+        self.orch.sync(max_results=10, label_ids=["INBOX"])
+
+        self.assertEqual(self.mock_gmail.iter_messages.call_args.kwargs["max_results"], 10)
+        self.mock_store.set_history_id.assert_not_called()
+
+    def test_sync_applies_history_changes(self):
+        self.mock_gmail.get_profile.return_value = {"emailAddress": "me@example.com", "historyId": "120"}
+        self.mock_store.get_history_id.return_value = "100"
+        self.mock_store.delete_emails.return_value = 1
+        self.mock_store.existing_ids.side_effect = lambda ids: {"old"} & set(ids)
+        self.mock_gmail.iter_history.return_value = iter(
+            [
+                {
+                    "historyId": "110",
+                    "history": [
+                        {"messagesAdded": [{"message": {"id": "new", "labelIds": ["INBOX"]}}]},
+                        {"messagesAdded": [{"message": {"id": "sent", "labelIds": ["SENT"]}}]},
+                        {"messagesDeleted": [{"message": {"id": "gone"}}]},
+                    ],
+                },
+                {
+                    "historyId": "120",
+                    "history": [{"labelsRemoved": [{"message": {"id": "old", "labelIds": ["INBOX"]}}]}],
+                },
+            ]
+        )
+        self.mock_gmail.get_messages_metadata.side_effect = lambda ids: [{"id": i} for i in ids]
+
+        changed = self.orch.sync(label_ids=["INBOX"])
+
+        self.assertEqual(changed, 3)
+        self.mock_gmail.iter_messages.assert_not_called()
+        self.mock_gmail.get_messages_metadata.assert_called_once_with(["new"])
+        self.mock_store.delete_emails.assert_called_once_with({"gone"})
+        self.mock_store.update_labels.assert_called_once_with("old", ["INBOX"])
+        self.mock_store.set_history_id.assert_called_once_with("me@example.com", "120")
+
+    def test_sync_keeps_checkpoint_when_messages_fail_to_fetch(self):
+        self.mock_gmail.get_profile.return_value = {"emailAddress": "me@example.com", "historyId": "150"}
+        self.mock_store.get_history_id.return_value = "100"
+        self.mock_gmail.iter_history.return_value = iter(
+            [{"historyId": "150", "history": [{"messagesAdded": [{"message": {"id": "new", "labelIds": ["INBOX"]}}]}]}]
+        )
+        self.mock_gmail.get_messages_metadata.return_value = []
+
+        self.orch.sync(label_ids=["INBOX"])
+
+        self.mock_store.set_history_id.assert_not_called()
+
+    def test_sync_ingests_unknown_messages_relabelled_into_synced_labels(self):
+        self.mock_gmail.get_profile.return_value = {"emailAddress": "me@example.com", "historyId": "120"}
+        self.mock_store.get_history_id.return_value = "100"
+        self.mock_store.existing_ids.side_effect = lambda ids: {"known"} & set(ids)
+        self.mock_gmail.iter_history.return_value = iter(
+            [
+                {
+                    "historyId": "120",
+                    "history": [
+                        {"labelsAdded": [{"message": {"id": "back", "labelIds": ["INBOX"]}}]},
+                        {"labelsAdded": [{"message": {"id": "known", "labelIds": ["INBOX", "STARRED"]}}]},
+                        {"labelsRemoved": [{"message": {"id": "elsewhere", "labelIds": ["SENT"]}}]},
+                    ],
+                }
+            ]
+        )
+        self.mock_gmail.get_messages_metadata.side_effect = lambda ids: [{"id": i} for i in ids]
+
+        self.orch.sync(label_ids=["INBOX"])
+
+        self.mock_gmail.get_messages_metadata.assert_called_once_with(["back"])
+        self.mock_store.update_labels.assert_called_once_with("known", ["INBOX", "STARRED"])
+        self.mock_store.set_history_id.assert_called_once_with("me@example.com", "120")
+
+    def test_sync_falls_back_when_checkpoint_expired(self):
+        self.mock_gmail.get_profile.return_value = {"emailAddress": "me@example.com", "historyId": "500"}
+        self.mock_store.get_history_id.return_value = "1"
+        self.mock_gmail.iter_history.side_effect = HistoryExpiredError("1")
+        self.mock_gmail.iter_messages.return_value = iter([])
+
+        self.orch.sync()
+
+        self.mock_gmail.iter_messages.assert_called_once()
+        self.mock_store.set_history_id.assert_called_once_with("me@example.com", "500")
+
     def test_run_rules_delegates(self):
         self.mock_rules.apply_rules.return_value = 42
 
@@ -65,3 +271,22 @@ class TestGmailOrchestrator(unittest.TestCase):
 
         self.assertEqual(result, 42)
         self.mock_rules.apply_rules.assert_called_once_with(limit=7)
+
+
+class TestGmailOrchestratorAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_fetch_and_store_async(self):
+        store = mock_store()
+        async_gmail = Mock()
+
+        async def iter_messages(**kwargs):
+            yield [{"id": "m1"}, {"id": "m2"}]
+            yield [{"id": "m3"}]
+
+        async_gmail.iter_messages = iter_messages
+        async_gmail.get_messages_metadata = AsyncMock(side_effect=lambda ids: [{"id": i} for i in ids])
+        orch = GmailOrchestrator(store=store, rules_processor=Mock(), async_gmail_client=async_gmail)
+
+        count = await orch.fetch_and_store_async(max_results=3)
+
+        self.assertEqual(count, 3)
+        self.assertEqual([e["id"] for e in store.inserted], ["m1", "m2", "m3"])
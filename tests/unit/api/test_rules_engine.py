@@ -0,0 +1,240 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from gmail_helper.api.email_service.rules_engine import CompiledRule, CompiledRuleSet, rule_conditions, view_builder
+from gmail_helper.api.email_service.rules_processor import RulesProcessor
+from gmail_helper.common.contracts.email_record import EmailRecord
+from gmail_helper.common.contracts.rules_contract import Rule
+
+NOW = 1_700_000_000
+
+
+def record(eid, sender="GitHub <noreply@github.com>", subject="Build failed", days_ago=1):
+    return EmailRecord(eid, sender=sender, subject=subject, received_ts=NOW - days_ago * 86400)
+
+
+class TestCompiledRule(unittest.TestCase):
+    def matches(self, rule_json, email):
+        rule = CompiledRule(Rule(**rule_json))
+        return rule.bind(NOW)(view_builder(rule_conditions([rule]))(email))
+
+    def test_string_predicates_are_case_insensitive(self):
+        rule = {"conditions": [{"field": "From", "predicate": "contains", "value": "GITHUB"}]}
+        self.assertTrue(self.matches(rule, record("e1")))
+        rule = {"conditions": [{"field": "Subject", "predicate": "equals", "value": "build FAILED"}]}
+        self.assertTrue(self.matches(rule, record("e1")))
+        rule = {"conditions": [{"field": "Subject", "predicate": "does_not_contain", "value": "failed"}]}
+        self.assertFalse(self.matches(rule, record("e1")))
+
+    def test_date_cutoffs_fixed_at_bind_time(self):
+        rule = {"conditions": [{"field": "DateReceived", "predicate": "less_than_days", "value": 2}]}
+        self.assertTrue(self.matches(rule, record("e1", days_ago=1)))
+        self.assertFalse(self.matches(rule, record("e1", days_ago=3)))
+        rule = {"conditions": [{"field": "DateReceived", "predicate": "greater_than_months", "value": 1}]}
+        self.assertTrue(self.matches(rule, record("e1", days_ago=31)))
+        self.assertFalse(self.matches(rule, EmailRecord("e2", received_ts=0)))
+
+    def test_to_condition_uses_recipient(self):
+        rule = {"conditions": [{"field": "To", "predicate": "contains", "value": "team@"}]}
+        self.assertTrue(self.matches(rule, EmailRecord("e1", recipient="Team <team@example.com>")))
+        self.assertFalse(self.matches(rule, record("e1")))
+
+    def test_date_condition_prefers_received_ts(self):
+        rule = {"conditions": [{"field": "DateReceived", "predicate": "greater_than_days", "value": 2}]}
+        email = EmailRecord("e1", received_datetime="2023-11-14T22:13:20Z", received_ts=NOW - 3 * 86400)
+        self.assertTrue(self.matches(rule, email))
+        self.assertFalse(self.matches(rule, EmailRecord("e2", received_datetime="garbage")))
+
+    def test_date_predicates_only_apply_to_date_received(self):
+        rule = {"conditions": [{"field": "Subject", "predicate": "less_than_days", "value": 2}]}
+        self.assertFalse(self.matches(rule, record("e1", days_ago=1)))
+        rule = {"conditions": [{"field": "From", "predicate": "greater_than_days", "value": 2}]}
+        self.assertFalse(self.matches(rule, record("e1", days_ago=3)))
+
+    def test_all_and_any(self):
+        conditions = [
+            {"field": "From", "predicate": "contains", "value": "github"},
+            {"field": "Subject", "predicate": "contains", "value": "merged"},
+        ]
+        self.assertFalse(self.matches({"match": "all", "conditions": conditions}, record("e1")))
+        self.assertTrue(self.matches({"match": "any", "conditions": conditions}, record("e1")))
+
+
+class TestConditionOrdering(unittest.TestCase):
+    CONDITIONS = [
+        {"field": "Subject", "predicate": "contains", "value": "failed"},
+        {"field": "DateReceived", "predicate": "less_than_days", "value": 2},
+    ]
+
+    def test_cheap_date_checks_run_first_until_measured(self):
+        rule = CompiledRule(Rule(conditions=self.CONDITIONS))
+
+        self.assertEqual([c.field.value for c in rule.ordered_conditions()], ["DateReceived", "Subject"])
+
+    def test_measured_selectivity_reorders(self):
+        rule = CompiledRule(Rule(conditions=self.CONDITIONS))
+        subject, date = rule.conditions
+        # The substring check almost always fails and the date check almost always passes.
+        subject.stats.record(1000, 10, 1000 * 1e-7)
+        date.stats.record(1000, 990, 1000 * 5e-8)
+
+        self.assertEqual(rule.ordered_conditions(), [subject, date])
+        any_rule = CompiledRule(Rule(match="any", conditions=self.CONDITIONS))
+        any_rule.conditions[0].stats.record(1000, 10, 1000 * 1e-7)
+        any_rule.conditions[1].stats.record(1000, 990, 1000 * 5e-8)
+        self.assertEqual(any_rule.ordered_conditions()[0].field.value, "DateReceived")
+
+    def test_short_circuits_and_profiles(self):
+        rule = CompiledRule(Rule(conditions=self.CONDITIONS))
+        subject, date = rule.conditions
+        view = view_builder(rule_conditions([rule]))
+        matches = rule.bind(NOW, profile=True)
+
+        self.assertFalse(matches(view(record("old", days_ago=5))))
+        self.assertTrue(matches(view(record("new"))))
+
+        # The date check rejected "old" on its own, so the subject was only checked once.
+        self.assertEqual((date.stats.evaluations, date.stats.matches), (2, 1))
+        self.assertEqual((subject.stats.evaluations, subject.stats.matches), (1, 1))
+
+
+class TestCompiledRuleSet(unittest.TestCase):
+    RULES = [
+        Rule(description="github", conditions=[{"field": "From", "predicate": "contains", "value": "GitHub"}]),
+        Rule(
+            description="not failed",
+            conditions=[{"field": "Subject", "predicate": "does_not_contain", "value": "failed"}],
+        ),
+        Rule(
+            description="either",
+            match="any",
+            conditions=[
+                {"field": "From", "predicate": "contains", "value": "bank"},
+                {"field": "Subject", "predicate": "contains", "value": "build"},
+            ],
+        ),
+        Rule(
+            description="recent bank",
+            conditions=[
+                {"field": "From", "predicate": "contains", "value": "bank"},
+                {"field": "DateReceived", "predicate": "less_than_days", "value": 2},
+            ],
+        ),
+    ]
+    EMAILS = [
+        record("e1"),
+        record("e2", sender="bank@example.com", subject="Statement", days_ago=1),
+        record("e3", sender="bank@example.com", subject="Statement", days_ago=5),
+    ]
+
+    def matching(self, ruleset):
+        views = [ruleset.view(e) for e in self.EMAILS]
+        return [[e.id for e, v in zip(self.EMAILS, views) if r.bind(NOW)(v)] for r in ruleset]
+
+    def test_scanned_fields_match_like_substring_tests(self):
+        plain = CompiledRuleSet(self.RULES)
+        scanned = CompiledRuleSet(self.RULES, min_needles=1)
+
+        self.assertEqual(plain.matchers, {})
+        self.assertEqual(sorted(scanned.matchers), [0, 2])
+        self.assertTrue(all(c.scanned for c in rule_conditions(scanned) if c.field.value != "DateReceived"))
+        self.assertEqual(self.matching(scanned), self.matching(plain))
+        self.assertEqual(self.matching(scanned), [["e1"], ["e2", "e3"], ["e1", "e2", "e3"], ["e2"]])
+
+    def test_one_scan_yields_candidates(self):
+        ruleset = CompiledRuleSet(self.RULES, min_needles=1)
+        views = [ruleset.view(e) for e in self.EMAILS]
+        github, not_failed, either, recent_bank = ruleset
+
+        postings = ruleset.postings(views)
+        self.assertEqual(ruleset.candidates(github, postings), [0])
+        self.assertEqual(ruleset.candidates(either, postings), [0, 1, 2])
+        self.assertEqual(ruleset.candidates(recent_bank, postings), [1, 2])
+        # A negated needle cannot rule any email out.
+        self.assertIsNone(ruleset.candidates(not_failed, postings))
+
+    def test_equals_values_are_looked_up_once_per_email(self):
+        rules = [
+            Rule(
+                description="bank", conditions=[{"field": "From", "predicate": "equals", "value": "Bank@Example.com"}]
+            ),
+            Rule(
+                description="bank or build",
+                match="any",
+                conditions=[
+                    {"field": "From", "predicate": "equals", "value": "bank@example.com"},
+                    {"field": "Subject", "predicate": "equals", "value": "build failed"},
+                ],
+            ),
+            Rule(
+                description="not bank",
+                conditions=[{"field": "From", "predicate": "does_not_equal", "value": "bank@example.com"}],
+            ),
+        ]
+        ruleset = CompiledRuleSet(rules)
+        bank, bank_or_build, not_bank = ruleset
+        postings = ruleset.postings([ruleset.view(e) for e in self.EMAILS])
+
+        self.assertEqual(ruleset.values, {0: {"bank@example.com"}, 2: {"build failed"}})
+        self.assertEqual(ruleset.candidates(bank, postings), [1, 2])
+        self.assertEqual(ruleset.candidates(bank_or_build, postings), [0, 1, 2])
+        self.assertIsNone(ruleset.candidates(not_bank, postings))
+        self.assertEqual(self.matching(ruleset), [["e2", "e3"], ["e1", "e2", "e3"], ["e1"]])
+
+
+class TestRulesCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rules_file = os.path.join(self.tmp.name, "rules.json")
+        self.write([{"description": "one", "conditions": [], "actions": []}])
+        self.rp = RulesProcessor(None, rules_file=self.rules_file, gmail_client=None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rules, mtime=None):
+        with open(self.rules_file, "w") as f:
+            json.dump({"rules": rules}, f)
+        if mtime is not None:
+            os.utime(self.rules_file, (mtime, mtime))
+
+    def test_rules_reloaded_only_when_file_changes(self):
+        first = self.rp.load_rules()
+        compiled = self.rp._compile(first)
+
+        self.assertIs(self.rp.load_rules(), first)
+        self.assertIs(self.rp._compile(self.rp.load_rules()), compiled)
+
+        self.write([{"description": "two", "conditions": [], "actions": []}], mtime=time.time() + 10)
+        reloaded = self.rp.load_rules()
+
+        self.assertEqual([r.description for r in reloaded], ["two"])
+        self.assertIsNot(self.rp._compile(reloaded), compiled)
+
+    def test_rule_stats_after_a_batch(self):
+        self.write(
+            [
+                {
+                    "description": "github",
+                    "conditions": [{"field": "From", "predicate": "contains", "value": "github"}],
+                },
+                {"description": "all", "conditions": []},
+            ],
+            mtime=time.time() + 20,
+        )
+        emails = [record("e1"), record("e2", sender="bank@example.com")]
+
+        self.rp._evaluate(self.rp.load_rules(), emails, None, hits={})
+        stats = {s["description"]: s for s in self.rp.rule_stats()}
+
+        self.assertEqual((stats["github"]["evaluations"], stats["github"]["matches"]), (2, 1))
+        self.assertEqual(stats["github"]["match_rate"], 0.5)
+        self.assertEqual(stats["github"]["conditions"][0]["evaluations"], 2)
+        self.assertEqual(stats["all"]["matches"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
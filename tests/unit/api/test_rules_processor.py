@@ -1,9 +1,9 @@
 import unittest
 from datetime import datetime, timezone
-from unittest.mock import Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
 from gmail_helper.api.email_service.rules_processor import RulesProcessor
-from gmail_helper.common.contracts.rules_contract import ActionType
+from gmail_helper.common.contracts.rules_contract import ActionType, FieldName, StringPredicate
 
 
 def make_email(eid="e1", subject="hello"):
@@ -35,14 +35,11 @@ class TestRulesProcessor(unittest.TestCase):
         rule.conditions = []
         rule.match = "all"
 
-        with (
-            patch.object(self.rp, "load_rules", return_value=[rule]),
-            patch.object(self.rp, "_matches", return_value=True),
-        ):
+        with patch.object(self.rp, "load_rules", return_value=[rule]):
             count = self.rp.apply_rules(limit=1)
 
         self.assertEqual(count, 1)
-        self.mock_gmail.modify_message.assert_called_once_with("e1", add_label_ids=[], remove_label_ids=["UNREAD"])
+        self.mock_gmail.batch_modify.assert_called_once_with(["e1"], add_label_ids=[], remove_label_ids=["UNREAD"])
 
     def test_mark_as_unread(self):
         rule = Mock()
@@ -51,27 +48,21 @@ class TestRulesProcessor(unittest.TestCase):
         rule.conditions = []
         rule.match = "all"
 
-        with (
-            patch.object(self.rp, "load_rules", return_value=[rule]),
-            patch.object(self.rp, "_matches", return_value=True),
-        ):
+        with patch.object(self.rp, "load_rules", return_value=[rule]):
             count = self.rp.apply_rules(limit=1)
 
         self.assertEqual(count, 1)
-        self.mock_gmail.modify_message.assert_called_once_with("e1", add_label_ids=["UNREAD"], remove_label_ids=[])
+        self.mock_gmail.batch_modify.assert_called_once_with(["e1"], add_label_ids=["UNREAD"], remove_label_ids=[])
 
     def test_move_message_inbox(self):
         action = Mock(type=ActionType.move_message, mailbox="Inbox")
         rule = Mock(description="move", actions=[action], conditions=[], match="all")
 
-        with (
-            patch.object(self.rp, "load_rules", return_value=[rule]),
-            patch.object(self.rp, "_matches", return_value=True),
-        ):
+        with patch.object(self.rp, "load_rules", return_value=[rule]):
             count = self.rp.apply_rules(limit=1)
 
         self.assertEqual(count, 1)
-        args, kwargs = self.mock_gmail.modify_message.call_args
+        args, kwargs = self.mock_gmail.batch_modify.call_args
         self.assertEqual(kwargs["add_label_ids"], ["INBOX"])
         self.assertEqual(kwargs["remove_label_ids"], [])
 
@@ -80,17 +71,51 @@ class TestRulesProcessor(unittest.TestCase):
         action = Mock(type=ActionType.move_message, mailbox="Work")
         rule = Mock(description="move", actions=[action], conditions=[], match="all")
 
-        with (
-            patch.object(self.rp, "load_rules", return_value=[rule]),
-            patch.object(self.rp, "_matches", return_value=True),
-        ):
+        with patch.object(self.rp, "load_rules", return_value=[rule]):
             self.rp.apply_rules(limit=1)
 
         self.mock_gmail.create_label.assert_called_once_with("Work")
-        self.mock_gmail.modify_message.assert_called_once()
-        add_ids = self.mock_gmail.modify_message.call_args.kwargs["add_label_ids"]
+        self.mock_gmail.batch_modify.assert_called_once()
+        add_ids = self.mock_gmail.batch_modify.call_args.kwargs["add_label_ids"]
         self.assertIn("LBL_NEW", add_ids)
 
+    def test_uses_search_index_to_narrow_candidates(self):
+        emails = [dict(make_email(f"e{i}"), sender="x@github.com" if i % 2 else "y@example.com") for i in range(6)]
+        # e5 matches too, but the index is what decides the candidates
+        self.mock_store.search_ids.return_value = {"e1", "e3"}
+        cond = Mock(field=FieldName.From_, predicate=StringPredicate.contains, value="GitHub")
+        rule = Mock(description="gh", actions=[Mock(type=ActionType.mark_as_read)], conditions=[cond], match="all")
+        self.rp.SEARCH_MIN_EMAILS = 1
+
+        pending = {}
+
+        self.rp._evaluate([rule], emails, pending)
+
+        self.assertEqual(sorted(pending), ["e1", "e3"])
+        # Only the batch's own window is looked up.
+        (text, field), kwargs = self.mock_store.search_ids.call_args
+        self.assertEqual((text, field), ("github", "sender"))
+        self.assertEqual(kwargs["floor"][1], "e0")
+        self.mock_store.window_floor.assert_not_called()
+
+    def test_whole_mailbox_run_streams_in_batches(self):
+        self.mock_store.iter_emails.return_value = iter([make_email(f"e{i}") for i in range(5)])
+        self.mock_gmail.list_labels.return_value = []
+        rule = Mock(description="read", actions=[Mock(type=ActionType.mark_as_read)], conditions=[], match="all")
+        self.rp.STREAM_BATCH_SIZE = 2
+        seen = []
+
+        with (
+            patch.object(self.rp, "load_rules", return_value=[rule]),
+            patch.object(self.rp, "_search_hits", return_value={}),
+            patch.object(self.rp, "_evaluate", side_effect=lambda r, emails, p, h, now: seen.append(len(emails)) or 0),
+        ):
+            self.rp.apply_rules(limit=None)
+
+        self.assertEqual(seen, [2, 2, 1])
+        self.mock_store.iter_emails.assert_called_once_with(batch_size=2)
+        self.mock_store.get_last_n_emails.assert_not_called()
+
     def test_warm_labels_cache_populates(self):
         self.mock_gmail.list_labels.return_value = [
             {"id": "LBL1", "name": "Work"},
@@ -99,3 +124,79 @@ class TestRulesProcessor(unittest.TestCase):
         self.rp._warm_labels_cache()
         self.assertEqual(self.rp._label_cache["work"], "LBL1")
         self.assertEqual(self.rp._label_cache["personal"], "LBL2")
+
+    def test_coalesces_label_changes_into_batch_modify(self):
+        self.mock_store.get_last_n_emails.return_value = [make_email(f"e{i}") for i in range(3)]
+        self.mock_gmail.list_labels.return_value = [{"id": "LBL_GH", "name": "GitHub"}]
+        rules = [
+            Mock(description="read", actions=[Mock(type=ActionType.mark_as_read)], conditions=[], match="all"),
+            Mock(
+                description="move",
+                actions=[Mock(type=ActionType.move_message, mailbox="GitHub")],
+                conditions=[],
+                match="all",
+            ),
+        ]
+
+        with patch.object(self.rp, "load_rules", return_value=rules):
+            count = self.rp.apply_rules(limit=3)
+
+        self.assertEqual(count, 6)
+        self.mock_gmail.modify_message.assert_not_called()
+        self.mock_gmail.batch_modify.assert_called_once_with(
+            ["e0", "e1", "e2"], add_label_ids=["LBL_GH"], remove_label_ids=["INBOX", "UNREAD"]
+        )
+        self.assertTrue(self.rp.last_batches[0]["ok"])
+
+    def test_later_action_wins_and_groups_by_delta(self):
+        self.mock_store.get_last_n_emails.return_value = [make_email("e1"), make_email("e2", subject="second")]
+        # Every email is marked read; only e2 matches the later unread rule.
+        rule_read = Mock(description="read", actions=[Mock(type=ActionType.mark_as_read)], conditions=[], match="all")
+        second = Mock(field=FieldName.Subject, predicate=StringPredicate.equals, value="Second")
+        rule_unread = Mock(
+            description="unread", actions=[Mock(type=ActionType.mark_as_unread)], conditions=[second], match="all"
+        )
+
+        with patch.object(self.rp, "load_rules", return_value=[rule_read, rule_unread]):
+            self.rp.apply_rules(limit=2)
+
+        calls = {tuple(c.args[0]): c.kwargs for c in self.mock_gmail.batch_modify.call_args_list}
+        self.assertEqual(calls[("e1",)], {"add_label_ids": [], "remove_label_ids": ["UNREAD"]})
+        self.assertEqual(calls[("e2",)], {"add_label_ids": ["UNREAD"], "remove_label_ids": []})
+
+    def test_failed_batch_is_reported(self):
+        self.mock_gmail.batch_modify.side_effect = RuntimeError("rateLimitExceeded")
+        rule = Mock(description="read", actions=[Mock(type=ActionType.mark_as_read)], conditions=[], match="all")
+
+        with patch.object(self.rp, "load_rules", return_value=[rule]):
+            count = self.rp.apply_rules(limit=1)
+
+        self.assertEqual(count, 0)
+        self.assertFalse(self.rp.last_batches[0]["ok"])
+        self.assertIn("rateLimitExceeded", self.rp.last_batches[0]["error"])
+
+
+class TestRulesProcessorAsync(unittest.IsolatedAsyncioTestCase):
+    async def test_apply_rules_async_uses_async_client(self):
+        store = Mock()
+        store.get_last_n_emails.return_value = [make_email("e1"), make_email("e2")]
+        async_gmail = Mock()
+        async_gmail.list_labels = AsyncMock(return_value=[])
+        async_gmail.create_label = AsyncMock(return_value={"id": "LBL_NEW"})
+        async_gmail.batch_modify = AsyncMock()
+        rp = RulesProcessor(store, rules_file="rules.json", gmail_client=None, async_gmail_client=async_gmail)
+        rule = Mock(
+            description="move",
+            actions=[Mock(type=ActionType.move_message, mailbox="Work")],
+            conditions=[],
+            match="all",
+        )
+
+        with patch.object(rp, "load_rules", return_value=[rule]):
+            count = await rp.apply_rules_async(limit=2)
+
+        self.assertEqual(count, 2)
+        async_gmail.create_label.assert_awaited_once_with("Work")
+        async_gmail.batch_modify.assert_awaited_once_with(
+            ["e1", "e2"], add_label_ids=["LBL_NEW"], remove_label_ids=["INBOX"]
+        )
@@ -0,0 +1,27 @@
+import random
+import unittest
+
+from gmail_helper.common.utils.aho_corasick import AhoCorasick
+
+
+class TestAhoCorasick(unittest.TestCase):
+    def test_finds_overlapping_and_nested_patterns(self):
+        ac = AhoCorasick(["he", "she", "his", "hers", "", "she"])
+
+        self.assertEqual(ac.patterns, ("he", "she", "his", "hers"))
+        self.assertEqual(ac.search("ushers"), {"he", "she", "hers"})
+        self.assertEqual(ac.search("ahishe"), {"his", "she", "he"})
+        self.assertEqual(ac.search("xyz"), frozenset())
+        self.assertEqual(ac.search(""), frozenset())
+
+    def test_agrees_with_substring_search(self):
+        rng = random.Random(3)
+        patterns = ["".join(rng.choice("abc") for _ in range(rng.randint(1, 4))) for _ in range(40)]
+        ac = AhoCorasick(patterns)
+        for _ in range(200):
+            text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 30)))
+            self.assertEqual(ac.search(text), {p for p in patterns if p in text}, text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from gmail_helper.common.utils.api_framework import add_routers, api_get, api_router, routers_from_class
+
+
+@api_router(prefix="/things")
+class ThingsRouter:
+    @api_get("/sync")
+    def sync_route(self, n: int = 1):
+        return {"kind": "sync", "n": n}
+
+    @api_get("/async")
+    async def async_route(self, n: int = 1):
+        return {"kind": "async", "n": n}
+
+
+class TestApiFramework(unittest.TestCase):
+    def setUp(self):
+        app = FastAPI()
+        add_routers(app, routers_from_class(ThingsRouter, ThingsRouter))
+        self.client = TestClient(app)
+
+    def test_sync_and_async_controller_methods(self):
+        self.assertEqual(self.client.get("/things/sync", params={"n": 2}).json(), {"kind": "sync", "n": 2})
+        self.assertEqual(self.client.get("/things/async", params={"n": 3}).json(), {"kind": "async", "n": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
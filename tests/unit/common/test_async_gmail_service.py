@@ -0,0 +1,77 @@
+import json
+import unittest
+from unittest.mock import Mock
+
+import httpx
+
+from gmail_helper.common.services.async_gmail_service import AsyncGmailClient
+from gmail_helper.common.services.gmail_service import HistoryExpiredError
+from gmail_helper.common.services.rate_limiter import RateLimiter
+
+
+class TestAsyncGmailClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.requests = []
+        self.responses = {}
+
+        def handler(request: httpx.Request):
+            self.requests.append(request)
+            key = (request.method, request.url.path)
+            queue = self.responses.get(key)
+            if queue:
+                status, body = queue.pop(0)
+            else:
+                status, body = 200, {"id": request.url.path.rsplit("/", 1)[-1]}
+            return httpx.Response(status, json=body)
+
+        limiter = RateLimiter(units_per_second=10000, backoff_base=0.0)
+        self.client = AsyncGmailClient(
+            "creds.json",
+            "token.json",
+            scopes=[],
+            rate_limiter=limiter,
+            credentials=Mock(valid=True, token="tok"),
+            transport=httpx.MockTransport(handler),
+            http2=False,
+        )
+
+    async def asyncTearDown(self):
+        await self.client.aclose()
+
+    async def test_get_messages_metadata_concurrently(self):
+        res = await self.client.get_messages_metadata(["m1", "m2", "m3"])
+
+        self.assertEqual([m["id"] for m in res], ["m1", "m2", "m3"])
+        self.assertEqual(len(self.requests), 3)
+        self.assertEqual(self.requests[0].headers["Authorization"], "Bearer tok")
+        self.assertEqual(self.requests[0].url.params["format"], "metadata")
+
+    async def test_iter_messages_follows_page_token(self):
+        path = "/gmail/v1/users/me/messages"
+        self.responses[("GET", path)] = [
+            (200, {"messages": [{"id": "m1"}], "nextPageToken": "p2"}),
+            (200, {"messages": [{"id": "m2"}]}),
+        ]
+
+        pages = [p async for p in self.client.iter_messages(label_ids=["INBOX"], page_size=1)]
+
+        self.assertEqual(pages, [[{"id": "m1"}], [{"id": "m2"}]])
+        self.assertEqual(self.requests[1].url.params["pageToken"], "p2")
+        self.assertEqual(self.requests[0].url.params["labelIds"], "INBOX")
+
+    async def test_retries_rate_limited_requests(self):
+        path = "/gmail/v1/users/me/messages/batchModify"
+        self.responses[("POST", path)] = [(429, {}), (200, {})]
+
+        await self.client.batch_modify(["m1", "m2"], remove_label_ids=["UNREAD"])
+
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(json.loads(self.requests[1].content)["ids"], ["m1", "m2"])
+        self.assertEqual(self.client.limiter.stats()["throttled"], 1)
+
+    async def test_history_expired(self):
+        self.responses[("GET", "/gmail/v1/users/me/history")] = [(404, {})]
+
+        with self.assertRaises(HistoryExpiredError):
+            async for _ in self.client.iter_history("1"):
+                pass
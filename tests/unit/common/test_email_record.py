@@ -0,0 +1,59 @@
+import copy
+import pickle
+import unittest
+
+from gmail_helper.common.contracts.email_record import EmailRecord
+
+
+def _record(**kw):
+    values = dict(
+        id="m1",
+        thread_id="t1",
+        sender="alice@example.com",
+        recipient="bob@example.com",
+        subject="Hello",
+        snippet="hi",
+        received_datetime="2024-01-02T03:04:05+00:00",
+        label_ids=["INBOX", "UNREAD"],
+    )
+    values.update(kw)
+    return EmailRecord(**values)
+
+
+class TestEmailRecord(unittest.TestCase):
+    def test_is_immutable_and_slotted(self):
+        record = _record()
+        with self.assertRaises(AttributeError):
+            record.subject = "changed"
+        with self.assertRaises(AttributeError):
+            del record.subject
+        self.assertFalse(hasattr(record, "__dict__"))
+
+    def test_mapping_access(self):
+        record = _record()
+        self.assertEqual(record["id"], "m1")
+        self.assertEqual(record.get("sender"), "alice@example.com")
+        self.assertIsNone(record.get("missing"))
+        self.assertEqual(record["label_ids"], "INBOX,UNREAD")
+        self.assertEqual(dict(record)["received_ts"], 1704164645)
+        self.assertEqual(record, dict(record))
+
+    def test_sender_is_interned(self):
+        a = _record(sender="".join(["carol", "@example.com"]))
+        b = _record(sender="".join(["carol@", "example.com"]))
+        self.assertIs(a.sender, b.sender)
+
+    def test_pickle_and_copy_roundtrip(self):
+        record = _record()
+        self.assertEqual(pickle.loads(pickle.dumps(record)), record)
+        self.assertEqual(copy.deepcopy(record), record)
+
+    def test_from_mapping(self):
+        record = EmailRecord.from_mapping({"id": "m2", "sender": None, "received_ts": "bad"})
+        self.assertEqual(record.sender, "")
+        self.assertEqual(record.received_ts, 0)
+        self.assertIs(EmailRecord.from_mapping(record), record)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,199 @@
+import threading
+import unittest
+from unittest.mock import Mock, patch
+
+from googleapiclient.errors import HttpError
+
+from gmail_helper.common.services.gmail_service import GmailClient
+from gmail_helper.common.services.rate_limiter import RateLimiter
+
+
+def http_error(status, content=b"{}"):
+    return HttpError(Mock(status=status, reason="err"), content)
+
+
+def make_client():
+    limiter = RateLimiter(units_per_second=1000, sleep=lambda s: None)
+    return GmailClient("creds.json", "token.json", scopes=[], rate_limiter=limiter)
+
+
+class FakeBatch:
+    def __init__(self, callback, outcomes, sizes):
+        self.callback = callback
+        self.outcomes = outcomes
+        self.sizes = sizes
+        self.items = []
+
+    def add(self, request, request_id):
+        self.items.append(request_id)
+
+    def execute(self):
+        self.sizes.append(len(self.items))
+        for msg_id in self.items:
+            queue = self.outcomes.get(msg_id)
+            outcome = queue.pop(0) if queue else {"id": msg_id}
+            if isinstance(outcome, Exception):
+                self.callback(msg_id, None, outcome)
+            else:
+                self.callback(msg_id, outcome, None)
+
+
+class TestGetMessagesMetadata(unittest.TestCase):
+    def setUp(self):
+        self.outcomes = {}
+        self.batch_sizes = []
+        service = Mock()
+        service.new_batch_http_request.side_effect = lambda callback: FakeBatch(
+            callback, self.outcomes, self.batch_sizes
+        )
+        self.client = make_client()
+        self.client._local.service = service
+
+    def test_splits_into_batches_of_100(self):
+        ids = [f"m{i}" for i in range(250)]
+
+        res = self.client.get_messages_metadata(ids)
+
+        self.assertEqual(self.batch_sizes, [100, 100, 50])
+        self.assertEqual([m["id"] for m in res], ids)
+
+    def test_retries_only_retryable_failures(self):
+        self.outcomes["m1"] = [http_error(429)]
+        self.outcomes["m2"] = [http_error(404)]
+
+        res = self.client.get_messages_metadata(["m0", "m1", "m2"])
+
+        self.assertEqual([m["id"] for m in res], ["m0", "m1"])
+        self.assertEqual(self.batch_sizes, [3, 1])
+
+    def test_gives_up_after_max_retries(self):
+        self.outcomes["m1"] = [http_error(503)] * 5
+
+        res = self.client.get_messages_metadata(["m0", "m1"], max_retries=2)
+
+        self.assertEqual([m["id"] for m in res], ["m0"])
+        self.assertEqual(self.batch_sizes, [2, 1, 1])
+
+
+class TestIterMessages(unittest.TestCase):
+    def setUp(self):
+        self.pages = {
+            None: {"messages": [{"id": "m1"}, {"id": "m2"}], "nextPageToken": "p2"},
+            "p2": {"messages": [{"id": "m3"}, {"id": "m4"}], "nextPageToken": "p3"},
+            "p3": {"messages": [{"id": "m5"}]},
+        }
+        self.list_calls = []
+
+        def _list(**kwargs):
+            self.list_calls.append(kwargs)
+            page = dict(self.pages[kwargs["pageToken"]])
+            page["messages"] = page["messages"][: kwargs["maxResults"]]
+            return Mock(execute=Mock(return_value=page))
+
+        service = Mock()
+        service.users.return_value.messages.return_value.list.side_effect = _list
+        self.client = make_client()
+        self.client._local.service = service
+
+    def test_follows_next_page_token(self):
+        pages = list(self.client.iter_messages(label_ids=["INBOX"], query="is:unread", page_size=2))
+
+        self.assertEqual([[m["id"] for m in p] for p in pages], [["m1", "m2"], ["m3", "m4"], ["m5"]])
+        self.assertEqual([c["pageToken"] for c in self.list_calls], [None, "p2", "p3"])
+        self.assertEqual(self.list_calls[0]["q"], "is:unread")
+
+    def test_is_lazy(self):
+        pages = self.client.iter_messages(page_size=2)
+
+        next(pages)
+
+        self.assertEqual(len(self.list_calls), 1)
+
+    def test_max_results_limits_pages(self):
+        msgs = self.client.list_messages(max_results=3)
+
+        self.assertEqual([m["id"] for m in msgs], ["m1", "m2", "m3"])
+        self.assertEqual([c["maxResults"] for c in self.list_calls], [3, 1])
+
+
+class TestExecuteWithRetry(unittest.TestCase):
+    def setUp(self):
+        self.client = make_client()
+
+    def test_retries_rate_limited_requests(self):
+        request = Mock()
+        request.execute.side_effect = [
+            http_error(429),
+            http_error(403, b'{"error": {"errors": [{"reason": "rateLimitExceeded"}]}}'),
+            {"ok": True},
+        ]
+
+        res = self.client._execute(request, "messages.modify")
+
+        self.assertEqual(res, {"ok": True})
+        stats = self.client.rate_limit_stats()
+        self.assertEqual(stats["throttled"], 2)
+        self.assertEqual(stats["retries"], 2)
+
+    def test_does_not_retry_permanent_errors(self):
+        request = Mock()
+        request.execute.side_effect = http_error(403, b'{"error": {"errors": [{"reason": "forbidden"}]}}')
+
+        with self.assertRaises(HttpError):
+            self.client._execute(request, "messages.modify")
+        self.assertEqual(request.execute.call_count, 1)
+
+    def test_gives_up_after_max_retries(self):
+        self.client.max_retries = 2
+        request = Mock()
+        request.execute.side_effect = http_error(503)
+
+        with self.assertRaises(HttpError):
+            self.client._execute(request, "labels.create")
+        self.assertEqual(request.execute.call_count, 3)
+
+
+class TestPerThreadService(unittest.TestCase):
+    def test_each_thread_builds_its_own_service(self):
+        client = make_client()
+        with (
+            patch("gmail_helper.common.services.gmail_service.load_credentials", return_value=Mock()) as load,
+            patch("gmail_helper.common.services.gmail_service.build", side_effect=lambda *a, **k: object()),
+        ):
+            main = client.service()
+            seen = []
+            t = threading.Thread(target=lambda: seen.append(client.service()))
+            t.start()
+            t.join()
+
+            self.assertIs(client.service(), main)
+            self.assertIsNot(seen[0], main)
+            load.assert_called_once()
+
+
+class TestTrimmedResponses(unittest.TestCase):
+    def setUp(self):
+        self.client = make_client()
+        self.service = Mock()
+        self.client._local.service = self.service
+
+    def test_metadata_request_uses_header_and_field_masks(self):
+        self.client.get_message_metadata("m1")
+
+        kwargs = self.service.users.return_value.messages.return_value.get.call_args.kwargs
+        self.assertEqual(kwargs["metadataHeaders"], ["From", "To", "Subject", "Date"])
+        self.assertIn("payload/headers", kwargs["fields"])
+        self.assertIn("labelIds", kwargs["fields"])
+        self.assertIn("historyId", kwargs["fields"])
+
+    def test_counts_response_bytes_per_method(self):
+        for _ in range(2):
+            request = Mock()
+            request.postproc = lambda resp, content: content
+            request.execute.side_effect = lambda r=request: r.postproc(Mock(), b"x" * 120)
+            self.client._execute(request, "messages.get")
+
+        stats = self.client.transfer_stats()["messages.get"]
+        self.assertEqual(stats["calls"], 2)
+        self.assertEqual(stats["bytes"], 240)
+        self.assertEqual(stats["avg_bytes"], 120)
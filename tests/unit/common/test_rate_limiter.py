@@ -0,0 +1,59 @@
+import unittest
+
+from gmail_helper.common.services.rate_limiter import RateLimiter, quota_cost
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class TestRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(units_per_second=100, clock=self.clock, sleep=self.clock.sleep)
+
+    def test_burst_then_waits_for_refill(self):
+        self.limiter.acquire(100)
+        self.assertEqual(self.clock.now, 0.0)
+
+        self.limiter.acquire(50)
+
+        self.assertAlmostEqual(self.clock.now, 0.5)
+        self.assertEqual(self.limiter.stats()["waits"], 1)
+
+    def test_sustained_rate_matches_quota(self):
+        for _ in range(60):
+            self.limiter.acquire(quota_cost("messages.get", 10))
+
+        # 3000 units at 100 units/s, minus the initial 100-unit burst
+        self.assertAlmostEqual(self.clock.now, 29.0)
+
+    def test_throttle_halves_rate_and_success_recovers(self):
+        self.limiter.on_throttle()
+        self.limiter.on_throttle()  # same second: counted, not halved again
+        self.assertEqual(self.limiter.rate, 50)
+        self.clock.now += 1.0
+        self.limiter.on_throttle()
+        self.assertEqual(self.limiter.rate, 25)
+
+        for _ in range(100):
+            self.limiter.on_success()
+
+        self.assertEqual(self.limiter.rate, 100)
+        self.assertEqual(self.limiter.stats()["throttled"], 3)
+
+    def test_backoff_is_bounded(self):
+        for attempt in range(10):
+            self.assertLessEqual(self.limiter.backoff(attempt), self.limiter.backoff_max)
+        self.assertEqual(self.limiter.retries, 10)
+
+    def test_quota_costs(self):
+        self.assertEqual(quota_cost("messages.batchModify"), 50)
+        self.assertEqual(quota_cost("messages.get", 100), 500)
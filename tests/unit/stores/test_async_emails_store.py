@@ -0,0 +1,64 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from gmail_helper.stores.async_emails_store import AsyncEmailsStore
+from gmail_helper.stores.emails_store import EmailsStore
+from tests.unit.stores.test_emails_store import make_email
+
+
+class TestAsyncEmailsStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sync_store = EmailsStore(db_path=os.path.join(self.tmp.name, "emails.db"))
+        self.store = AsyncEmailsStore(self.sync_store, max_readers=2)
+
+    def tearDown(self):
+        self.store.close()
+        self.sync_store.close()
+        self.tmp.cleanup()
+
+    async def test_roundtrip_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        seen = []
+        get_by_id = self.sync_store.get_email_by_id
+
+        def spy(email_id):
+            seen.append(threading.get_ident())
+            return get_by_id(email_id)
+
+        self.sync_store.get_email_by_id = spy
+
+        result = await self.store.insert_emails([make_email("e1"), make_email("e2")])
+        row = await self.store.get_email_by_id("e1")
+
+        self.assertEqual(result, (2, 0))
+        self.assertEqual(row["subject"], "subject e1")
+        self.assertNotEqual(seen, [loop_thread])
+
+    async def test_iter_emails_pages_with_keyset_cursor(self):
+        await self.store.insert_emails(
+            [make_email("e%d" % i, received="2024-08-%02dT10:00:00+00:00" % (i + 1)) for i in range(5)]
+        )
+
+        ids = [r["id"] async for r in self.store.iter_emails(batch_size=2)]
+
+        self.assertEqual(ids, ["e4", "e3", "e2", "e1", "e0"])
+        self.assertEqual([r["id"] for r in await self.store.get_last_n_emails(2)], ["e4", "e3"])
+        with self.assertRaises(ValueError):
+            [r async for r in self.store.iter_emails(batch_size=0)]
+
+    async def test_search_and_writes(self):
+        await self.store.insert_emails([make_email("e1", subject="quarterly invoice")])
+        page, cursor = await self.store.search("invoice")
+        self.assertEqual([r["id"] for r in page], ["e1"])
+
+        await self.store.update_labels("e1", ["STARRED"])
+        self.assertEqual((await self.store.get_email_by_id("e1"))["label_ids"], "STARRED")
+        self.assertEqual(await self.store.delete_emails(["e1"]), 1)
+        self.assertEqual(await self.store.existing_ids(["e1"]), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+from unittest.mock import Mock
+
+from gmail_helper.common.contracts.emails_interface import InsertResult
+from gmail_helper.stores.cached_emails_store import CachedEmailsStore
+
+
+class TestCachedEmailsStore(unittest.TestCase):
+    def setUp(self):
+        self.rows = {"e1": {"id": "e1", "label_ids": "INBOX"}, "e2": {"id": "e2"}, "e3": {"id": "e3"}}
+        self.store = Mock()
+        self.store.get_email_by_id.side_effect = lambda i: dict(self.rows[i]) if i in self.rows else None
+        self.store.insert_emails.return_value = InsertResult(1, 0)
+        self.cache = CachedEmailsStore(self.store, max_size=2)
+
+    def test_serves_repeat_lookups_from_cache(self):
+        first = self.cache.get_email_by_id("e1")
+        first["label_ids"] = "mutated"
+
+        self.assertEqual(self.cache.get_email_by_id("e1")["label_ids"], "INBOX")
+        self.assertIsNone(self.cache.get_email_by_id("nope"))
+        self.assertIsNone(self.cache.get_email_by_id("nope"))
+        self.assertEqual(self.store.get_email_by_id.call_count, 2)
+        self.assertEqual(self.cache.cache_stats()["hits"], 2)
+        self.assertEqual(self.cache.cache_stats()["misses"], 2)
+
+    def test_evicts_least_recently_used(self):
+        self.cache.get_email_by_id("e1")
+        self.cache.get_email_by_id("e2")
+        self.cache.get_email_by_id("e1")
+        self.cache.get_email_by_id("e3")
+
+        self.cache.get_email_by_id("e1")
+        self.cache.get_email_by_id("e2")
+
+        stats = self.cache.cache_stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["evictions"], 2)
+        self.assertEqual([c.args[0] for c in self.store.get_email_by_id.call_args_list], ["e1", "e2", "e3", "e2"])
+
+    def test_writes_invalidate_entries(self):
+        self.cache.get_email_by_id("e1")
+        self.cache.get_email_by_id("nope")
+
+        self.rows["e1"]["label_ids"] = "STARRED"
+        self.cache.update_labels("e1", ["STARRED"])
+        self.rows["nope"] = {"id": "nope"}
+        self.cache.insert_emails([{"id": "nope"}])
+
+        self.assertEqual(self.cache.get_email_by_id("e1")["label_ids"], "STARRED")
+        self.assertEqual(self.cache.get_email_by_id("nope"), {"id": "nope"})
+        self.store.update_labels.assert_called_once_with("e1", ["STARRED"])
+
+        self.cache.delete_emails(["e1"])
+        del self.rows["e1"]
+        self.assertIsNone(self.cache.get_email_by_id("e1"))
+
+    def test_passes_other_calls_through(self):
+        self.cache.get_last_n_emails(5)
+        self.cache.close()
+
+        self.store.get_last_n_emails.assert_called_once_with(5)
+        self.store.close.assert_called_once()
@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, timezone
+
+from gmail_helper.api.email_service.rules_processor import RulesProcessor
+from gmail_helper.common.contracts.rules_contract import Rule
+from gmail_helper.stores.columnar import NUMPY_AVAILABLE
+from gmail_helper.stores.emails_store import EmailsStore
+
+
+def make_email(eid, sender, subject, days_ago):
+    received = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return {
+        "id": eid,
+        "thread_id": eid,
+        "sender": sender,
+        "recipient": "Me <me@example.com>",
+        "subject": subject,
+        "snippet": "snippet for " + subject,
+        "received_datetime": received.isoformat(),
+    }
+
+
+@unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+class TestColumnarSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = EmailsStore(db_path=os.path.join(self.tmp.name, "emails.db"))
+        self.store.insert_emails(
+            [
+                make_email("e1", "GitHub <noreply@github.com>", "Build FAILED", 1),
+                make_email("e2", "Bank <alerts@bank.com>", "Statement ready", 40),
+                make_email("e3", "GitHub <noreply@github.com>", "PR merged", 3),
+                make_email("e4", "Friend <f@example.org>", "Lunch?", 100),
+            ]
+        )
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_dictionary_encodes_senders_and_lowercases_text(self):
+        snap = self.store.columnar_snapshot()
+
+        self.assertEqual(len(snap), 4)
+        self.assertEqual(len(snap._values["sender"]), 3)
+        self.assertEqual(snap.ids_for(snap.contains("sender", "GITHUB")), ["e1", "e3"])
+        self.assertEqual(snap.ids_for(snap.equals("sender", "friend <f@example.org>")), ["e4"])
+        self.assertEqual(snap.ids_for(snap.contains("subject", "failed")), ["e1"])
+        self.assertEqual(str(snap.received_ts.dtype), "int64")
+
+    def test_tops_up_incrementally_and_rebuilds_after_delete(self):
+        before = self.store.columnar_snapshot()
+        self.store.insert_email(make_email("e5", "New <n@example.com>", "hello", 0))
+
+        after = self.store.columnar_snapshot()
+        self.store.delete_emails(["e1"])
+        rebuilt = self.store.columnar_snapshot()
+
+        self.assertEqual(len(before), 4)
+        self.assertEqual(before.ids_for(before.constant(True)), ["e1", "e2", "e3", "e4"])
+        self.assertEqual(after.ids_for(after.contains("sender", "new")), ["e5"])
+        self.assertEqual(rebuilt.ids_for(rebuilt.constant(True)), ["e2", "e3", "e4", "e5"])
+
+    def test_columnar_rules_match_row_by_row_evaluation(self):
+        rules = [
+            Rule(
+                conditions=[
+                    {"field": "From", "predicate": "contains", "value": "github"},
+                    {"field": "DateReceived", "predicate": "less_than_days", "value": 2},
+                ],
+                actions=[{"type": "mark_as_read"}],
+            ),
+            Rule(
+                match="any",
+                conditions=[
+                    {"field": "Subject", "predicate": "equals", "value": "lunch?"},
+                    {"field": "Message", "predicate": "does_not_contain", "value": "snippet"},
+                    {"field": "DateReceived", "predicate": "greater_than_months", "value": 1},
+                ],
+                actions=[{"type": "mark_as_unread"}],
+            ),
+            Rule(
+                conditions=[{"field": "To", "predicate": "does_not_equal", "value": "me <me@example.com>"}],
+                actions=[{"type": "mark_as_read"}],
+            ),
+            Rule(
+                conditions=[{"field": "Subject", "predicate": "less_than_months", "value": 12}],
+                actions=[{"type": "move_message", "mailbox": "Recent"}],
+            ),
+        ]
+        rp = RulesProcessor(self.store, rules_file="unused.json", gmail_client=None, columnar=True)
+        columnar, rows = {}, {}
+
+        rp._evaluate_columnar(rules, columnar)
+        rp._evaluate(rules, list(self.store.iter_emails()), rows)
+
+        self.assertEqual({k: v.key() for k, v in columnar.items()}, {k: v.key() for k, v in rows.items()})
+        self.assertEqual(sorted(columnar), ["e1", "e2", "e4"])
+        self.assertTrue(rp._use_columnar(rules, None))
+        self.assertFalse(rp._use_columnar(rules, 20))
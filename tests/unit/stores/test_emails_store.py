@@ -0,0 +1,223 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+from gmail_helper.stores.emails_store import EmailsStore
+
+
+def make_email(eid, received="2024-08-12T10:00:00+00:00", **kwargs):
+    email = {
+        "id": eid,
+        "thread_id": "t-" + eid,
+        "sender": "a@example.com",
+        "subject": "subject " + eid,
+        "snippet": "body",
+        "received_datetime": received,
+    }
+    email.update(kwargs)
+    return email
+
+
+class TestEmailsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "emails.db")
+        self.store = EmailsStore(db_path=self.db_path)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_insert_and_get(self):
+        self.store.insert_email(make_email("e1", label_ids=["INBOX", "UNREAD"]))
+
+        row = self.store.get_email_by_id("e1")
+
+        self.assertEqual(row["subject"], "subject e1")
+        self.assertEqual(row["label_ids"], "INBOX,UNREAD")
+
+    def test_insert_emails_counts_new_and_duplicate_rows(self):
+        self.store.insert_email(make_email("e1"))
+
+        result = self.store.insert_emails([make_email("e1"), make_email("e2"), make_email("e3"), make_email("e3")])
+
+        self.assertEqual(result, (2, 2))
+        self.assertEqual(self.store.existing_ids(["e1", "e2", "e3"]), {"e1", "e2", "e3"})
+        self.assertEqual(self.store.insert_emails([]), (0, 0))
+
+    def test_last_n_and_range_use_received_ts(self):
+        self.store.insert_emails(
+            [
+                make_email("old", received="2024-01-01T00:00:00+00:00"),
+                make_email("new", received="2024-03-01T00:00:00Z"),
+                make_email("mid", received="2024-02-01T00:00:00+00:00"),
+            ]
+        )
+
+        self.assertEqual([r["id"] for r in self.store.get_last_n_emails(2)], ["new", "mid"])
+        self.assertEqual(self.store.get_email_by_id("new")["received_ts"], 1709251200)
+        rows = self.store.get_emails_between(since_ts=1704067200 + 1, until_ts=1709251200)
+        self.assertEqual([r["id"] for r in rows], ["mid"])
+
+    def test_iter_emails_streams_newest_first_in_batches(self):
+        self.store.insert_emails(
+            [make_email("e%d" % i, received="2024-01-01T00:00:%02d+00:00" % (i // 2)) for i in range(7)]
+        )
+
+        ids = [r["id"] for r in self.store.iter_emails(batch_size=3)]
+        after = [r["id"] for r in self.store.iter_emails(before="1704067202:e5", batch_size=2)]
+
+        self.assertEqual(ids, ["e6", "e5", "e4", "e3", "e2", "e1", "e0"])
+        self.assertEqual(after, ["e4", "e3", "e2", "e1", "e0"])
+        with self.assertRaises(ValueError):
+            list(self.store.iter_emails(before="nope"))
+        with self.assertRaises(ValueError):
+            list(self.store.iter_emails(batch_size=0))
+
+    def test_search_matches_substrings_newest_first_with_cursor(self):
+        self.store.insert_emails(
+            [
+                make_email("e1", received="2024-01-01T00:00:00Z", subject="Build FAILED on main"),
+                make_email(
+                    "e2", received="2024-01-02T00:00:00Z", subject="weekly digest", sender="GitHub <n@github.com>"
+                ),
+                make_email("e3", received="2024-01-03T00:00:00Z", subject="build failed again"),
+                make_email("e4", received="2024-01-04T00:00:00Z", subject="deploy ok"),
+            ]
+        )
+
+        page, cursor = self.store.search("failed", limit=1)
+        rest, end = self.store.search("failed", limit=1, cursor=cursor)
+
+        self.assertEqual([r["id"] for r in page + rest], ["e3", "e1"])
+        self.assertIsNone(end)
+        self.assertEqual([r["id"] for r in self.store.search("build ain")[0]], ["e3", "e1"])
+        self.assertEqual([r["id"] for r in self.store.search("hub", fields=["sender"])[0]], ["e2"])
+        self.assertEqual([r["id"] for r in self.store.search("ok")[0]], ["e4"])
+        self.assertEqual(self.store.search_ids("d fail", "subject"), {"e1", "e3"})
+        self.assertEqual(self.store.search_ids("d fail", "subject", floor=self.store.window_floor(2)), {"e3"})
+        with self.assertRaises(ValueError):
+            self.store.search("x", cursor="garbage")
+        for limit in (0, -3):
+            with self.assertRaises(ValueError):
+                self.store.search("failed", limit=limit)
+
+    def test_search_index_follows_deletes_and_updates(self):
+        self.store.insert_email(make_email("e1", subject="quarterly invoice"))
+        self.store.insert_email(make_email("e2", subject="invoice reminder"))
+        self.store.delete_emails(["e1"])
+        with self.store._pool.writer() as conn:
+            conn.execute("UPDATE emails SET subject = 'paid' WHERE id = 'e2'")
+
+        self.assertEqual(self.store.search_ids("invoice", "subject"), set())
+        self.assertEqual(self.store.search_ids("paid", "subject"), {"e2"})
+
+    def test_delete_and_update_labels(self):
+        self.store.insert_email(make_email("e1"))
+        self.store.insert_email(make_email("e2"))
+
+        self.assertEqual(self.store.delete_emails(["e1", "missing"]), 1)
+        self.store.update_labels("e2", ["INBOX"])
+
+        self.assertIsNone(self.store.get_email_by_id("e1"))
+        self.assertEqual(self.store.get_email_by_id("e2")["label_ids"], "INBOX")
+
+    def test_existing_ids_tracks_inserts_and_deletes(self):
+        self.store.insert_email(make_email("e1"))
+        self.store.insert_email(make_email("e2"))
+        self.store.delete_emails(["e2"])
+
+        self.assertEqual(self.store.existing_ids(["e1", "e2", "e3"]), {"e1"})
+
+    def test_existing_ids_sees_rows_written_elsewhere(self):
+        other = EmailsStore(db_path=self.db_path)
+        other.insert_email(make_email("e9"))
+
+        self.assertEqual(self.store.existing_ids(["e9"]), {"e9"})
+        self.assertEqual(EmailsStore(db_path=self.db_path).existing_ids(["e9"]), {"e9"})
+
+    def test_history_checkpoint_roundtrip(self):
+        self.assertIsNone(self.store.get_history_id("me@example.com"))
+
+        self.store.set_history_id("me@example.com", "100")
+        self.store.set_history_id("me@example.com", "200")
+
+        self.assertEqual(self.store.get_history_id("me@example.com"), "200")
+
+    def test_migrates_legacy_schema(self):
+        legacy = os.path.join(self.tmp.name, "legacy.db")
+        conn = sqlite3.connect(legacy)
+        conn.execute(EmailsStore.CREATE_SQL)
+        conn.execute("INSERT INTO emails (id, subject) VALUES ('old', 'legacy')")
+        conn.commit()
+        conn.close()
+
+        store = EmailsStore(db_path=legacy)
+
+        self.assertEqual(store.get_email_by_id("old")["subject"], "legacy")
+        store.set_history_id("me", "1")
+        store.close()
+
+    def test_backfills_received_ts_in_chunks(self):
+        legacy = os.path.join(self.tmp.name, "legacy.db")
+        conn = sqlite3.connect(legacy)
+        for script in EmailsStore.MIGRATIONS[:3]:
+            conn.executescript(script)
+        conn.execute("PRAGMA user_version = 3")
+        conn.executemany(
+            "INSERT INTO emails (id, received_datetime) VALUES (?, ?)",
+            [("e%d" % i, "2024-01-01T00:00:%02d+00:00" % i) for i in range(5)] + [("bad", "")],
+        )
+        conn.commit()
+        conn.close()
+
+        with patch.object(EmailsStore, "BACKFILL_CHUNK_SIZE", 2):
+            store = EmailsStore(db_path=legacy)
+        self.addCleanup(store.close)
+
+        self.assertEqual(store.get_email_by_id("e3")["received_ts"], 1704067203)
+        self.assertEqual(store.get_email_by_id("bad")["received_ts"], 0)
+        self.assertEqual([r["id"] for r in store.get_last_n_emails(1)], ["e4"])
+
+    def test_uses_wal_and_tuned_pragmas(self):
+        store = EmailsStore(db_path=self.db_path, cache_size_kib=1024, busy_timeout_ms=1234)
+        self.addCleanup(store.close)
+
+        with store._pool.reader() as conn:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+            self.assertEqual(conn.execute("PRAGMA cache_size").fetchone()[0], -1024)
+            self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 1234)
+
+    def test_reads_run_alongside_an_open_write(self):
+        self.store.insert_email(make_email("e1"))
+        seen = []
+
+        with self.store._pool.writer() as conn:
+            conn.execute("INSERT INTO emails (id, subject) VALUES ('e2', 'pending')")
+            t = threading.Thread(target=lambda: seen.append(self.store.get_last_n_emails(10)))
+            t.start()
+            t.join(timeout=2)
+
+        self.assertEqual([r["id"] for r in seen[0]], ["e1"])
+        self.assertIsNotNone(self.store.get_email_by_id("e2"))
+
+    def test_readers_are_per_thread(self):
+        conns = []
+
+        def _grab():
+            with self.store._pool.reader() as conn:
+                conns.append(conn)
+
+        threads = [threading.Thread(target=_grab) for _ in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        _grab()
+        _grab()
+
+        self.assertEqual(len({id(c) for c in conns}), 3)
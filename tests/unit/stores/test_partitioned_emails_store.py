@@ -0,0 +1,181 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from gmail_helper.stores.columnar import NUMPY_AVAILABLE
+from gmail_helper.stores.emails_store import EmailsStore
+from gmail_helper.stores.partitioned_emails_store import PartitionedEmailsStore, months_before, partition_key
+from tests.unit.stores.test_emails_store import make_email
+
+# 2024-03-15T00:00:00Z
+NOW = 1710460800.0
+
+
+class TestPartitionedEmailsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "emails.db")
+        self.archive_dir = os.path.join(self.tmp.name, "archive")
+        self.store = PartitionedEmailsStore(
+            db_path=self.db_path, archive_dir=self.archive_dir, maintenance_interval_sec=0, clock=lambda: NOW
+        )
+        self.store.insert_emails(
+            [
+                make_email("jan1", received="2024-01-05T00:00:00+00:00", subject="invoice january"),
+                make_email("jan2", received="2024-01-20T00:00:00+00:00"),
+                make_email("feb1", received="2024-02-10T00:00:00+00:00", subject="invoice february"),
+                make_email("mar1", received="2024-03-01T00:00:00+00:00"),
+                make_email("mar2", received="2024-03-02T00:00:00+00:00", subject="invoice march"),
+            ]
+        )
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_month_keys(self):
+        self.assertEqual(partition_key(NOW), "2024-03")
+        self.assertEqual(months_before("2024-03", 3), "2023-12")
+
+    def test_insert_routes_by_month_and_dedupes_across_partitions(self):
+        self.assertEqual(self.store.partitions(), ["2024-03", "2024-02", "2024-01"])
+        self.assertTrue(os.path.exists(self.store.partition_path("2024-02")))
+
+        result = self.store.insert_emails([make_email("feb1"), make_email("apr1", received="2024-04-01T00:00:00Z")])
+
+        self.assertEqual(result, (1, 1))
+        self.assertEqual(self.store.get_email_by_id("feb1")["subject"], "invoice february")
+        self.assertEqual(self.store.existing_ids(["jan1", "apr1", "nope"]), {"jan1", "apr1"})
+
+    def test_reads_span_partitions_newest_first(self):
+        self.assertEqual([r["id"] for r in self.store.get_last_n_emails(3)], ["mar2", "mar1", "feb1"])
+        self.assertEqual(
+            [r["id"] for r in self.store.iter_emails(batch_size=2)], ["mar2", "mar1", "feb1", "jan2", "jan1"]
+        )
+
+        cursor = "%d:%s" % (self.store.get_email_by_id("feb1")["received_ts"], "feb1")
+        self.assertEqual([r["id"] for r in self.store.iter_emails(before=cursor)], ["jan2", "jan1"])
+
+        since = self.store.get_email_by_id("jan2")["received_ts"]
+        until = self.store.get_email_by_id("mar2")["received_ts"]
+        self.assertEqual([r["id"] for r in self.store.get_emails_between(since, until)], ["mar1", "feb1", "jan2"])
+
+    def test_search_pages_across_partitions(self):
+        page, cursor = self.store.search("invoice", limit=2)
+        self.assertEqual([r["id"] for r in page], ["mar2", "feb1"])
+
+        page, cursor = self.store.search("invoice", limit=2, cursor=cursor)
+        self.assertEqual([r["id"] for r in page], ["jan1"])
+        self.assertIsNone(cursor)
+        self.assertEqual(self.store.search_ids("invoice", "subject"), {"jan1", "feb1", "mar2"})
+        floor = self.store.window_floor(3)
+        self.assertEqual(self.store.search_ids("invoice", "subject", floor=floor), {"feb1", "mar2"})
+        for limit in (0, -3):
+            with self.assertRaises(ValueError):
+                self.store.search("invoice", limit=limit)
+
+    def test_update_and_delete_find_the_partition(self):
+        self.store.update_labels("jan2", ["STARRED"])
+        self.assertEqual(self.store.get_email_by_id("jan2")["label_ids"], "STARRED")
+
+        self.assertEqual(self.store.delete_emails(["jan2", "mar1", "nope"]), 2)
+        self.assertIsNone(self.store.get_email_by_id("jan2"))
+        self.assertEqual(self.store.existing_ids(["jan2", "mar1"]), set())
+
+    def test_retention_archives_old_partitions(self):
+        removed = self.store.apply_retention(retention_months=1)
+
+        self.assertEqual(removed, ["2024-01"])
+        self.assertEqual(self.store.partitions(), ["2024-03", "2024-02"])
+        self.assertIsNone(self.store.get_email_by_id("jan1"))
+        self.assertTrue(os.path.exists(os.path.join(self.archive_dir, "emails-2024-01.db")))
+        self.assertFalse(os.path.exists(self.store.partition_path("2024-01")))
+
+    def test_drop_waits_for_partition_in_use(self):
+        with self.store._partition("2024-01") as store:
+            dropper = threading.Thread(target=self.store.apply_retention, args=(1,))
+            dropper.start()
+            dropper.join(0.2)
+            self.assertTrue(dropper.is_alive())
+            self.assertEqual(store.get_email_by_id("jan1")["id"], "jan1")
+        dropper.join(5)
+
+        self.assertFalse(dropper.is_alive())
+        self.assertEqual(self.store.partitions(), ["2024-03", "2024-02"])
+        with self.store._partition("2024-01") as store:
+            self.assertIsNone(store)
+        self.assertFalse(os.path.exists(self.store.partition_path("2024-01")))
+
+    def test_compaction_only_touches_cold_partitions_once(self):
+        self.store.delete_emails(["jan2"])
+
+        self.assertEqual(self.store.compact_cold_partitions(), ["2024-01", "2024-02"])
+        self.assertEqual(self.store.compact_cold_partitions(), [])
+        # The full-text index is rebuilt after VACUUM renumbers rowids.
+        self.assertEqual(self.store.search_ids("january", "subject"), {"jan1"})
+
+    def test_history_id_lives_in_catalog(self):
+        self.store.set_history_id("me", "42")
+        self.assertEqual(self.store.get_history_id("me"), "42")
+
+    def test_adopts_emails_of_single_file_store_at_db_path(self):
+        db_path = os.path.join(self.tmp.name, "legacy.db")
+        legacy = EmailsStore(db_path=db_path)
+        legacy.insert_emails(
+            [
+                make_email("old1", received="2023-11-03T00:00:00+00:00", subject="invoice november"),
+                make_email("old2", received="2024-02-11T00:00:00+00:00"),
+            ]
+        )
+        legacy.update_labels("old2", ["INBOX", "UNREAD"])
+        legacy.set_history_id("me", "42")
+        legacy.close()
+
+        for _ in range(2):
+            store = PartitionedEmailsStore(db_path=db_path, maintenance_interval_sec=0, clock=lambda: NOW)
+            try:
+                self.assertEqual([r["id"] for r in store.get_last_n_emails(5)], ["old2", "old1"])
+                self.assertEqual(store.partitions(), ["2024-02", "2023-11"])
+                self.assertEqual(store.get_email_by_id("old2")["label_ids"], "INBOX,UNREAD")
+                self.assertEqual(store.search_ids("invoice", "subject"), {"old1"})
+                self.assertEqual(store.get_history_id("me"), "42")
+                with store._catalog.reader() as conn:
+                    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+                self.assertNotIn("emails", tables)
+            finally:
+                store.close()
+
+    def test_partitioning_can_be_switched_off_and_on_again(self):
+        db_path = os.path.join(self.tmp.name, "legacy.db")
+        legacy = EmailsStore(db_path=db_path)
+        legacy.insert_emails([make_email("old1", received="2024-02-11T00:00:00+00:00")])
+        legacy.close()
+        PartitionedEmailsStore(db_path=db_path, maintenance_interval_sec=0, clock=lambda: NOW).close()
+
+        # Back to a single file: the tables are recreated and new mail lands there.
+        plain = EmailsStore(db_path=db_path)
+        try:
+            self.assertEqual(plain.get_last_n_emails(5), [])
+            plain.insert_emails([make_email("new1", received="2024-03-01T00:00:00+00:00", subject="invoice")])
+            self.assertEqual(plain.search_ids("invoice", "subject"), {"new1"})
+        finally:
+            plain.close()
+
+        store = PartitionedEmailsStore(db_path=db_path, maintenance_interval_sec=0, clock=lambda: NOW)
+        try:
+            self.assertEqual([r["id"] for r in store.get_last_n_emails(5)], ["new1", "old1"])
+        finally:
+            store.close()
+
+    @unittest.skipUnless(NUMPY_AVAILABLE, "numpy not installed")
+    def test_columnar_snapshot_merges_partitions(self):
+        snapshot = self.store.columnar_snapshot()
+
+        self.assertEqual(len(snapshot), 5)
+        self.assertEqual(sorted(snapshot.ids_for(snapshot.contains("subject", "INVOICE"))), ["feb1", "jan1", "mar2"])
+        self.assertEqual(int(snapshot.equals("sender", "a@example.com").sum()), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
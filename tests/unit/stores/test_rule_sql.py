@@ -0,0 +1,133 @@
+import os
+import random
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from gmail_helper.api.email_service.rules_engine import CompiledRuleSet
+from gmail_helper.api.email_service.rules_processor import RulesProcessor
+from gmail_helper.common.contracts.rules_contract import Rule
+from gmail_helper.common.utils.dateutils import to_utc_iso
+from gmail_helper.stores.emails_store import EmailsStore
+from gmail_helper.stores.partitioned_emails_store import PartitionedEmailsStore
+from gmail_helper.stores.rule_sql import rule_where
+
+# 2024-03-15T00:00:00Z
+NOW = 1710460800.0
+
+WORDS = ["Invoice", "invoice", "GitHub", "news", "re:", "50%", "a_b", 'say "hi"', "x", "Zoë", ""]
+SENDERS = ["GitHub <noreply@github.com>", "bank@example.com", "NEWS@Example.com", "", "50%_off@shop.example"]
+
+
+def random_email(rng: random.Random, i: int) -> dict:
+    if rng.random() < 0.1:
+        received = "not a date"
+    else:
+        received = to_utc_iso(datetime.fromtimestamp(NOW - rng.randrange(0, 120 * 86400), tz=timezone.utc))
+    return {
+        "id": "e%03d" % i,
+        "thread_id": "t%d" % i,
+        "sender": rng.choice(SENDERS),
+        "recipient": rng.choice(["me@example.com", "Team <team@example.com>", ""]),
+        "subject": " ".join(rng.sample(WORDS, 3)),
+        "snippet": " ".join(rng.sample(WORDS, 2)),
+        "received_datetime": received,
+    }
+
+
+def random_condition(rng: random.Random) -> dict:
+    if rng.random() < 0.25:
+        predicate = rng.choice(["less_than_days", "greater_than_days", "less_than_months", "greater_than_months"])
+        # Date predicates on other fields never match.
+        field = rng.choice(["DateReceived", "DateReceived", "DateReceived", "From", "Subject"])
+        return {"field": field, "predicate": predicate, "value": rng.randint(1, 90)}
+    field = rng.choice(["From", "To", "Subject", "Message", "DateReceived"])
+    predicate = rng.choice(["contains", "does_not_contain", "equals", "does_not_equal"])
+    if predicate in ("equals", "does_not_equal") and field == "From":
+        value = rng.choice(SENDERS).upper()
+    else:
+        value = rng.choice(WORDS + ["HUB", "example.com", "2024-"])
+    return {"field": field, "predicate": predicate, "value": value}
+
+
+def random_rule(rng: random.Random) -> Rule:
+    conditions = [random_condition(rng) for _ in range(rng.randint(0, 3))]
+    return Rule(match=rng.choice(["all", "any"]), conditions=conditions, actions=[{"type": "mark_as_read"}])
+
+
+class TestRuleSql(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rng = random.Random(11)
+        self.emails = [random_email(self.rng, i) for i in range(300)]
+        self.store = EmailsStore(db_path=os.path.join(self.tmp.name, "emails.db"))
+        self.store.insert_emails(self.emails)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def python_ids(self, rules, records):
+        ruleset = CompiledRuleSet(rules)
+        views = [ruleset.view(r) for r in records]
+        return [[rec.id for rec, view in zip(records, views) if rule.bind(NOW)(view)] for rule in ruleset]
+
+    def test_sql_and_python_agree_on_random_rules(self):
+        rules = [random_rule(self.rng) for _ in range(300)]
+        records = list(self.store.iter_emails())
+        translated = 0
+
+        for rule, expected in zip(rules, self.python_ids(rules, records)):
+            ids = self.store.rule_ids(rule, NOW)
+            if ids is None:
+                self.assertIsNone(rule_where(rule, NOW))
+                continue
+            translated += 1
+            self.assertEqual(ids, expected, rule)
+        # Only rules with non-ASCII values stay with Python.
+        self.assertGreater(translated, 200)
+
+    def test_window_limits_to_newest_emails(self):
+        rule = Rule(conditions=[{"field": "Subject", "predicate": "contains", "value": "invoice"}])
+        newest = self.store.get_last_n_emails(50)
+
+        floor = self.store.window_floor(50)
+
+        self.assertEqual(floor, (newest[-1].received_ts, newest[-1].id))
+        self.assertEqual(self.store.rule_ids(rule, NOW, floor=floor), self.python_ids([rule], newest)[0])
+        self.assertIsNone(self.store.window_floor(301))
+        self.assertEqual(self.store.count(), 300)
+
+    def test_partitioned_store_matches_single_store(self):
+        partitioned = PartitionedEmailsStore(
+            db_path=os.path.join(self.tmp.name, "catalog.db"), maintenance_interval_sec=0, clock=lambda: NOW
+        )
+        try:
+            partitioned.insert_emails(self.emails)
+            rules = [random_rule(self.rng) for _ in range(30)]
+            for n in (10, 120, 300):
+                self.assertEqual(partitioned.window_floor(n), self.store.window_floor(n))
+            floor = self.store.window_floor(120)
+            for rule in rules:
+                self.assertEqual(
+                    partitioned.rule_ids(rule, NOW, floor=floor), self.store.rule_ids(rule, NOW, floor=floor)
+                )
+        finally:
+            partitioned.close()
+
+    def test_pushdown_run_matches_python_run(self):
+        rules = [random_rule(self.rng) for _ in range(40)]
+        rules.append(Rule(conditions=[{"field": "Subject", "predicate": "contains", "value": "zoë"}]))
+        rp = RulesProcessor(self.store, rules_file="unused.json", gmail_client=None, pushdown=True)
+        pushed, rows = {}, {}
+
+        rp._evaluate_pushdown(rules, pushed, limit=200, now=NOW)
+        rp._evaluate(rules, self.store.get_last_n_emails(200), rows, hits={}, now=NOW)
+
+        self.assertEqual({k: v.key() for k, v in pushed.items()}, {k: v.key() for k, v in rows.items()})
+        self.assertTrue(rp._use_pushdown(None))
+        self.assertFalse(rp._use_pushdown(20))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+import asyncio
+import unittest
+from datetime import datetime, timezone
+
+from gmail_helper.common.services.async_gmail_service import AsyncGmailClient
+from gmail_helper.common.services.gmail_service import GmailClient, HistoryExpiredError
+from gmail_helper.common.services.rate_limiter import RateLimiter
+from gmail_helper.testing.fake_gmail_server import FakeGmailServer
+from gmail_helper.testing.mailbox import SyntheticMailbox
+
+
+def fast_limiter():
+    return RateLimiter(units_per_second=1e6, backoff_base=0.001, backoff_max=0.01)
+
+
+class TestSyntheticMailbox(unittest.TestCase):
+    def test_is_deterministic_for_a_seed(self):
+        now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+        a, b = SyntheticMailbox(size=50, seed=3, now=now), SyntheticMailbox(size=50, seed=3, now=now)
+
+        self.assertEqual(a.order, b.order)
+        self.assertEqual([a.messages[i]["payload"] for i in a.order], [b.messages[i]["payload"] for i in b.order])
+
+    def test_history_records_changes_and_expires(self):
+        box = SyntheticMailbox(size=5)
+        start = box.history_id
+        msg = box.add_message("x@example.com")
+        box.modify(msg["id"], add=["STARRED"])
+
+        history = box.history_since(start)
+
+        self.assertEqual([list(h)[1] for h in history], ["messagesAdded", "labelsAdded"])
+        self.assertIsNone(box.history_since(box.history_floor - 1))
+
+
+class TestFakeGmailServer(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeGmailServer(SyntheticMailbox(size=120)).start()
+        self.addCleanup(self.server.stop)
+        self.client = GmailClient(
+            "", "", [], rate_limiter=fast_limiter(), base_url=self.server.base_url, auth_disabled=True
+        )
+
+    def test_list_and_batch_get(self):
+        ids = [m["id"] for m in self.client.list_messages(max_results=110)]
+
+        msgs = self.client.get_messages_metadata(ids)
+
+        self.assertEqual(ids, self.server.mailbox.order[:110])
+        self.assertEqual([m["id"] for m in msgs], ids)
+        self.assertEqual({h["name"] for h in msgs[0]["payload"]["headers"]}, {"From", "To", "Subject", "Date"})
+        self.assertEqual(self.server.api.calls["batch"], 2)
+
+    def test_batch_modify_and_history(self):
+        start = self.client.get_profile()["historyId"]
+        ids = self.server.mailbox.order[:3]
+
+        self.client.batch_modify(ids, add_label_ids=["STARRED"])
+        history = list(self.client.iter_history(start))
+
+        self.assertTrue(all("STARRED" in self.server.mailbox.messages[i]["labelIds"] for i in ids))
+        self.assertEqual(len(history[0]["history"]), 3)
+
+    def test_expired_history_raises(self):
+        with self.assertRaises(HistoryExpiredError):
+            list(self.client.iter_history("1"))
+
+    def test_retries_injected_rate_limits(self):
+        self.server.api.error_rate = 0.5
+
+        msgs = self.client.list_messages(max_results=20)
+
+        self.assertEqual(len(msgs), 20)
+        self.assertGreater(self.client.rate_limit_stats()["retries"], 0)
+
+    def test_async_client(self):
+        async def _run():
+            async with AsyncGmailClient(
+                "", "", [], rate_limiter=fast_limiter(), base_url=self.server.base_url, auth_disabled=True
+            ) as client:
+                ids = [m["id"] for m in await client.list_messages(max_results=10)]
+                return ids, await client.get_messages_metadata(ids)
+
+        ids, msgs = asyncio.run(_run())
+
+        self.assertEqual([m["id"] for m in msgs], ids)